@@ -0,0 +1,1255 @@
+# Module containing functions for comparing conformer geometries, used to find redundant conformers by the maximum
+# atom deviation (MAD) between aligned geometries. Used for conformers from output files and from .xyz/.sdf files.
+
+# Import modules
+
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from hashlib import blake2b
+from itertools import permutations
+from multiprocessing import cpu_count, shared_memory
+from multiprocessing.util import Finalize
+from os import makedirs, path as os_path, replace
+from re import split
+import sqlite3
+from time import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial import cKDTree
+from rdkit import Chem
+from rdkit.Chem import rdDetermineBonds
+
+
+# Define all 8 axis reflections (x, y and z signs) considered when comparing aligned conformers
+
+axis_reflections = np.array([[i, j, k] for i in (1, -1) for j in (1, -1) for k in (1, -1)])
+
+# Define the MAD calculation methods stored with cached MADs (cached MADs are only reused for the same method), and the
+# maximum number of conformer pairs kept in the MAD cache file
+
+mad_cache_mode = "principal axes, 8 axis reflections, Hungarian atom mapping, Kabsch fit (same atom order)"
+symmetry_mad_cache_mode = "heavy atom centroids, bonding symmetry permutations, Kabsch fit"
+mad_cache_max_entries = 1000000
+
+# Define the elements written first in conformer library file names (Hill order, other elements follow alphabetically)
+
+library_formula_order = ["C", "H"]
+
+# Define the maximum number of graph automorphisms (atom permutations) considered when comparing conformers by bonding
+# symmetry, and the cache of these permutations (one entry per topology and set of compared atoms)
+
+maximum_symmetry_permutations = 1000
+symmetry_permutation_cache = {}
+
+
+def mad_atom_indices(element_list, settings):
+    """Returns the indices of the atoms used to align and compare conformers, from the "MAD atoms" setting: all
+    atoms, heavy atoms only, or an element subset (from the "MAD elements" setting, e.g. "C, N, O"). All atoms are
+    used if no atoms match."""
+
+    all_atoms = list(range(len(element_list[0])))
+    if settings["MAD atoms"] == "All atoms":
+        return all_atoms
+    if settings["MAD atoms"] == "Heavy atoms":
+        chosen_elements = {element for element in element_list[0] if element != "H"}
+    else:
+        chosen_elements = {element.capitalize() for element in split(r"[,;\s]+", settings["MAD elements"]) if element}
+    atom_indices = [atom for atom, element in enumerate(element_list[0]) if element in chosen_elements]
+    return atom_indices or all_atoms
+
+
+def mad_atom_subset(element_list, x_coords, y_coords, z_coords, settings):
+    """Selects the atoms used to align and compare conformers (from mad_atom_indices). Leaving out hydrogens makes
+    MAD calculations much faster for large molecules, and stops methyl/hydroxyl rotamers counting as different
+    conformers. Returns the element and coordinate lists of the selected atoms (all atoms if none match)."""
+
+    if not element_list:
+        return element_list, x_coords, y_coords, z_coords
+    atom_indices = mad_atom_indices(element_list, settings)
+    if len(atom_indices) == len(element_list[0]):
+        return element_list, x_coords, y_coords, z_coords
+    return (
+        [[conformer[atom] for atom in atom_indices] for conformer in element_list],
+        np.array(x_coords, dtype=np.float64)[:, atom_indices],
+        np.array(y_coords, dtype=np.float64)[:, atom_indices],
+        np.array(z_coords, dtype=np.float64)[:, atom_indices],
+    )
+
+
+def bonded_molecule(element_list, x_coords, y_coords, z_coords):
+    """Perceives bonds (connectivity only, no bond orders) from the first conformer with RDKit (rdDetermineBonds), as
+    all conformers of an ensemble share the same bonding. Returns an RDKit molecule with ring information, or None if
+    bonds can't be determined."""
+
+    xyz_block = "{}\n\n".format(len(element_list[0])) + "".join(
+        "{} {:.6f} {:.6f} {:.6f}\n".format(element, float(x), float(y), float(z))
+        for element, x, y, z in zip(element_list[0], x_coords[0], y_coords[0], z_coords[0])
+    )
+    try:
+        mol = Chem.MolFromXYZBlock(xyz_block)
+        rdDetermineBonds.DetermineConnectivity(mol)
+        mol.UpdatePropertyCache(strict=False)
+        Chem.FastFindRings(mol)
+    except:
+        return None
+    return mol
+
+
+def symmetry_permutation_store(element_list, x_coords, y_coords, z_coords, settings):
+    """Finds the atom permutations allowed when comparing conformers by bonding symmetry ("MAD atom mapping" setting).
+    1) Perceives bonds once from the first conformer with RDKit (rdDetermineBonds).
+    2) Finds the automorphisms of the heavy atom graph by matching it to itself (at most
+    maximum_symmetry_permutations, for very symmetric molecules), only swapping heavy atoms bonded to the same number
+    of hydrogens. Each automorphism maps the hydrogens of a heavy atom onto the hydrogens of its image (in atom order).
+    3) Restricts these permutations to the compared atoms (from mad_atom_indices), in the atom order of
+    aligned_geometry_store. Hydrogens bonded to the same heavy atom (e.g. methyl hydrogens) are always equivalent, so
+    these are returned as groups of interchangeable atoms instead of multiplying the number of permutations.
+    Results are cached per topology, as they are the same for every ensemble of the same compound.
+    Returns (permutations, one row per permutation with the identity permutation first, and a list of
+    interchangeable atom groups), or None if bonds or automorphisms can't be found (atoms are then mapped by
+    element)."""
+
+    if not element_list:
+        return None
+    atom_indices = mad_atom_indices(element_list, settings)
+    mol = bonded_molecule(element_list, x_coords, y_coords, z_coords)
+    if mol is None:
+        return None
+    bonds = tuple(sorted((bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()) for bond in mol.GetBonds()))
+    cache_key = (tuple(element_list[0]), bonds, tuple(atom_indices))
+    if cache_key in symmetry_permutation_cache:
+        return symmetry_permutation_cache[cache_key]
+
+    # Find automorphisms of the heavy atom graph
+
+    heavy_atoms = [atom.GetIdx() for atom in mol.GetAtoms() if atom.GetAtomicNum() != 1]
+    if not heavy_atoms:
+        return None
+    bonded_hydrogens = {atom: [] for atom in heavy_atoms}
+    for bond in mol.GetBonds():
+        for atom, neighbour in ((bond.GetBeginAtom(), bond.GetEndAtom()), (bond.GetEndAtom(), bond.GetBeginAtom())):
+            if atom.GetAtomicNum() != 1 and neighbour.GetAtomicNum() == 1:
+                bonded_hydrogens[atom.GetIdx()].append(neighbour.GetIdx())
+    try:
+        heavy_atom_graph = Chem.RWMol(mol)
+        for atom in sorted(set(range(mol.GetNumAtoms())) - set(heavy_atoms), reverse=True):
+            heavy_atom_graph.RemoveAtom(atom)
+        heavy_atom_graph = heavy_atom_graph.GetMol()
+        heavy_atom_graph.UpdatePropertyCache(strict=False)
+        matches = heavy_atom_graph.GetSubstructMatches(
+            heavy_atom_graph, uniquify=False, useChirality=False, maxMatches=maximum_symmetry_permutations
+        )
+    except:
+        return None
+
+    # Extend each automorphism to hydrogens (hydrogens not bonded to a heavy atom are kept in place)
+
+    automorphisms = []
+    for match in matches:
+        automorphism = {atom: atom for atom in range(mol.GetNumAtoms())}
+        for atom, matched_atom in zip(heavy_atoms, match):
+            matched_atom = heavy_atoms[matched_atom]
+            if len(bonded_hydrogens[atom]) != len(bonded_hydrogens[matched_atom]):
+                break
+            automorphism[atom] = matched_atom
+            automorphism.update(zip(bonded_hydrogens[atom], bonded_hydrogens[matched_atom]))
+        else:
+            if len(set(automorphism.values())) == mol.GetNumAtoms():
+                automorphisms.append(automorphism)
+    if not automorphisms:
+        return None
+
+    # Convert to permutations of the compared atoms, in aligned_geometry_store order (grouped by element)
+
+    compared_elements = [element_list[0][atom] for atom in atom_indices]
+    aligned_order = [
+        atom
+        for element in sorted(set(compared_elements))
+        for atom, atom_element in zip(atom_indices, compared_elements)
+        if atom_element == element
+    ]
+    aligned_positions = {atom: position for position, atom in enumerate(aligned_order)}
+    if any(automorphism[atom] not in aligned_positions for automorphism in automorphisms for atom in aligned_order):
+        return None
+    interchangeable_groups = [
+        np.array(sorted(aligned_positions[hydrogen] for hydrogen in hydrogens))
+        for hydrogens in bonded_hydrogens.values()
+        if len(hydrogens) > 1 and all(hydrogen in aligned_positions for hydrogen in hydrogens)
+    ]
+    atom_permutations = np.array(
+        [[aligned_positions[automorphism[atom]] for atom in aligned_order] for automorphism in automorphisms]
+    )
+    for group in interchangeable_groups:
+        atom_permutations[:, group] = np.sort(atom_permutations[:, group], axis=1)
+    identity = np.arange(len(aligned_order))
+    atom_permutations = np.unique(atom_permutations, axis=0)
+    atom_permutations = np.concatenate(
+        (identity[None, :], atom_permutations[~(atom_permutations == identity).all(axis=1)])
+    )
+    symmetry_permutation_cache[cache_key] = atom_permutations, interchangeable_groups
+    return atom_permutations, interchangeable_groups
+
+
+def aligned_geometry_store(element_list, x_coords, y_coords, z_coords):
+    """Aligns all conformers by principal coordinates (based on their moments of inertia) in one batch, then stores
+    each conformer's atom coordinates as one array per chemical element. Returns a list with one entry per conformer,
+    so that conformer pairs can later be compared without rebuilding or realigning either conformer.
+    As with RDKit's CanonicalizeMol, the centroid and principal axes are calculated from heavy atoms only."""
+
+    if not element_list:
+        return []
+    coords = np.stack(
+        (
+            np.array(x_coords, dtype=np.float64),
+            np.array(y_coords, dtype=np.float64),
+            np.array(z_coords, dtype=np.float64),
+        ),
+        axis=-1,
+    )
+    elements = np.array(element_list[0])
+    heavy_atoms = elements != "H"
+    if not heavy_atoms.any():
+        heavy_atoms[:] = True
+
+    # Centre all conformers on their (heavy atom) centroids, then find principal axes with one batched eigh call
+
+    coords -= coords[:, heavy_atoms].mean(axis=1, keepdims=True)
+    inertia_tensors = np.einsum("cai,caj->cij", coords[:, heavy_atoms], coords[:, heavy_atoms])
+    principal_axes = np.linalg.eigh(inertia_tensors)[1][:, :, ::-1]  # Largest principal moment first (x axis)
+
+    # Rotate all conformers onto their principal axes, then split aligned atom coordinates by element
+
+    aligned_coords = np.einsum("cai,cij->caj", coords, principal_axes)
+    element_indices = [np.flatnonzero(elements == element) for element in sorted(set(element_list[0]))]
+    return [[conformer[indices] for indices in element_indices] for conformer in aligned_coords]
+
+
+def mad_lower_bound_store(element_list, aligned_geometries):
+    """Calculates rotation- and reflection-invariant descriptors for all aligned conformers (from
+    aligned_geometry_store), used by mad_lower_bound to rule out conformer pairs without a full MAD calculation.
+    Descriptors are: per-element sorted distances to the centroid, radius of gyration, principal moments
+    (heavy atoms), sums of absolute principal coordinates (heavy atoms) and root mean square principal coordinates
+    (heavy atoms). Each descriptor is stored as one array, with one row per conformer."""
+
+    if not aligned_geometries:
+        return np.zeros((0, 0)), np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3)), np.zeros((0, 3))
+    heavy_atom_elements = [element != "H" for element in sorted(set(element_list[0]))]
+    if not any(heavy_atom_elements):
+        heavy_atom_elements = [True] * len(heavy_atom_elements)
+    sorted_radii = []
+    heavy_atom_coords = []
+    for conformer in aligned_geometries:
+        sorted_radii.append(
+            np.concatenate([np.sort(np.sqrt((element_coords ** 2).sum(axis=1))) for element_coords in conformer])
+        )
+        heavy_atom_coords.append(
+            np.concatenate([element_coords for element_coords, heavy in zip(conformer, heavy_atom_elements) if heavy])
+        )
+    sorted_radii = np.array(sorted_radii)
+    heavy_atom_coords = np.array(heavy_atom_coords)
+    radii_of_gyration = np.sqrt((sorted_radii ** 2).mean(axis=1))
+    principal_moments = (heavy_atom_coords ** 2).sum(axis=1)
+    absolute_coord_sums = np.abs(heavy_atom_coords).sum(axis=1)
+    root_mean_square_coords = np.sqrt(principal_moments / heavy_atom_coords.shape[1])
+    return sorted_radii, radii_of_gyration, principal_moments, absolute_coord_sums, root_mean_square_coords
+
+
+def mad_lower_bound(lower_bound_descriptors, conf_number_a, conf_numbers_b, any_orientation=False):
+    """Returns lower bound(s) on the MAD between aligned conformer A and conformer(s) B, from their invariant
+    descriptors (from mad_lower_bound_store). conf_numbers_b can be a single conformer index or an array of indices
+    (conf_number_a can also be an array of indices of the same length, giving one lower bound per pair).
+    Conformers are always centred on their centroids and only axis reflections are considered, so for any atom
+    mapping with a maximum atom deviation of MAD:
+    1) |radius of gyration A - radius of gyration B| <= MAD (Minkowski inequality).
+    2) |sorted distance to centroid A - sorted distance to centroid B| <= MAD, for each element (triangle inequality,
+    sorted order being the best 1D mapping).
+    3) |principal moment A - principal moment B| <= MAD * (sum |coordinate A| + sum |coordinate B|), for each axis.
+    If conformer B can be fitted in any orientation (any_orientation, used for symmetry-corrected fits), bound 3 is
+    replaced by |root mean square principal coordinate A - root mean square principal coordinate B| <= MAD, for
+    each axis (these are singular values of the heavy atom coordinates divided by the square root of their number,
+    which change by no more than the root mean square atom deviation under any rotation and atom permutation)."""
+
+    sorted_radii, radii_of_gyration, principal_moments, absolute_coord_sums, root_mean_square_coords = (
+        lower_bound_descriptors
+    )
+    lower_bounds = np.abs(radii_of_gyration[conf_number_a] - radii_of_gyration[conf_numbers_b])
+    lower_bounds = np.maximum(
+        lower_bounds, np.abs(sorted_radii[conf_number_a] - sorted_radii[conf_numbers_b]).max(axis=-1)
+    )
+    if any_orientation:
+        moment_bounds = np.abs(root_mean_square_coords[conf_number_a] - root_mean_square_coords[conf_numbers_b])
+    else:
+        moment_bounds = np.abs(principal_moments[conf_number_a] - principal_moments[conf_numbers_b]) / np.maximum(
+            absolute_coord_sums[conf_number_a] + absolute_coord_sums[conf_numbers_b], 1e-12
+        )
+    lower_bounds = np.maximum(lower_bounds, moment_bounds.max(axis=-1))
+    if np.ndim(lower_bounds) == 0:
+        return float(lower_bounds)
+    return lower_bounds
+
+
+def geometry_hash_duplicate_finder(
+    aligned_geometries, hash_tolerance, mad_threshold, energies=None, energy_threshold=None
+):
+    """Quickly finds exact and near-exact duplicate conformers by hashing aligned geometries (from
+    aligned_geometry_store), before any MAD calculations. Each geometry is given canonical axis directions (positive
+    third moment along each principal axis) and atom order (grouped by element), then its coordinates are rounded to
+    grid cells of width hash_tolerance. Two grids are used (the second offset by half a cell), so that geometries
+    lying either side of a cell boundary can still collide. Conformers are checked in order of appearance, and a
+    conformer colliding with an earlier kept conformer is a duplicate if all their atom deviations (in this atom
+    order) are below the MAD threshold, which guarantees a MAD below the threshold. If energies are given, their
+    energy difference must also be below the energy threshold. Returns a list of (conf_number_a, conf_number_b,
+    maximum atom deviation) for these duplicates, in linear time."""
+
+    duplicate_pairs = []
+    if not aligned_geometries or hash_tolerance <= 0:
+        return duplicate_pairs
+    aligned_coords = np.array([np.concatenate(conformer) for conformer in aligned_geometries])
+    third_moments = (aligned_coords ** 3).sum(axis=1)
+    aligned_coords *= np.where(third_moments < 0, -1.0, 1.0)[:, None, :]
+    grid_keys = [
+        [cell.tobytes() for cell in np.floor(aligned_coords / hash_tolerance + offset).astype(np.int64)]
+        for offset in (0.0, 0.5)
+    ]
+    hashed_confs = [{}, {}]
+    for conf_number in range(len(aligned_coords)):
+        is_duplicate = False
+        for grid in range(2):
+            kept_conf_number = hashed_confs[grid].get(grid_keys[grid][conf_number])
+            if kept_conf_number is None:
+                continue
+            if energies is not None and abs(energies[kept_conf_number] - energies[conf_number]) >= energy_threshold:
+                continue
+            maximum_atom_deviation = float(
+                np.sqrt(((aligned_coords[kept_conf_number] - aligned_coords[conf_number]) ** 2).sum(axis=1)).max()
+            )
+            if maximum_atom_deviation < mad_threshold:
+                duplicate_pairs.append((kept_conf_number, conf_number, maximum_atom_deviation))
+                is_duplicate = True
+                break
+        if not is_duplicate:  # Only kept conformers are hashed, so duplicates are always matched to a kept conformer
+            for grid in range(2):
+                hashed_confs[grid].setdefault(grid_keys[grid][conf_number], conf_number)
+    return duplicate_pairs
+
+
+def geometry_fingerprint_store(element_list, lower_bound_descriptors, number_of_radius_quantiles=8):
+    """Builds a short, alignment-invariant fingerprint vector for each conformer from its invariant descriptors (from
+    mad_lower_bound_store): radius of gyration, root mean square principal coordinates (heavy atoms, one per axis) and
+    evenly spaced quantiles of the sorted distances to the centroid. Each of these values changes by no more than
+    the MAD between two conformers, so conformers with a MAD below a threshold are always within this threshold of
+    each other in every fingerprint dimension (Chebyshev distance)."""
+
+    sorted_radii, radii_of_gyration, principal_moments, absolute_coord_sums, root_mean_square_coords = (
+        lower_bound_descriptors
+    )
+    if len(sorted_radii) == 0:
+        return np.zeros((0, 0))
+    quantile_columns = np.unique(np.linspace(0, sorted_radii.shape[1] - 1, number_of_radius_quantiles).round())
+    return np.column_stack(
+        (
+            radii_of_gyration,
+            root_mean_square_coords,
+            sorted_radii[:, quantile_columns.astype(int)],
+        )
+    )
+
+
+def fingerprint_candidate_pairs(lower_bound_descriptors, fingerprints, mad_threshold, any_orientation=False):
+    """Finds candidate conformer pairs for MAD calculations with a KD-tree over geometry fingerprints (from
+    geometry_fingerprint_store), so that not all conformer pairs need to be considered. Only fingerprints within the
+    MAD threshold of each other are returned by the KD-tree, then pairs are checked with the full lower bound on
+    their MADs. Returns an array of [conf_number_a, conf_number_b] rows (conf_number_a < conf_number_b), sorted in
+    order of appearance."""
+
+    if len(fingerprints) < 2:
+        return np.zeros((0, 2), dtype=int)
+    candidate_pairs = cKDTree(fingerprints).query_pairs(r=mad_threshold, p=np.inf, output_type="ndarray")
+    candidate_pairs = candidate_pairs[np.lexsort((candidate_pairs[:, 1], candidate_pairs[:, 0]))]
+    lower_bounds = pair_mad_lower_bounds(lower_bound_descriptors, candidate_pairs, any_orientation)
+    return candidate_pairs[lower_bounds < mad_threshold]
+
+
+def pair_mad_lower_bounds(lower_bound_descriptors, candidate_pairs, any_orientation=False):
+    """Returns lower bounds on the MADs of many conformer pairs (an array of [conf_number_a, conf_number_b] rows)
+    from mad_lower_bound, calculated in chunks to limit memory use."""
+
+    candidate_pairs = np.asarray(candidate_pairs, dtype=int).reshape(-1, 2)
+    lower_bounds = np.zeros(len(candidate_pairs))
+    for start in range(0, len(candidate_pairs), 100000):
+        chunk = candidate_pairs[start:start + 100000]
+        lower_bounds[start:start + 100000] = mad_lower_bound(
+            lower_bound_descriptors, chunk[:, 0], chunk[:, 1], any_orientation
+        )
+    return lower_bounds
+
+
+def maximum_atom_deviation_calculator(conf_a_coords, conf_b_coords, mad_threshold=None):
+    """Finds the maximum atom deviation between two aligned conformers (from aligned_geometry_store).
+    1) Builds per-element distance matrices for all 8 axis reflections of conformer B at once.
+    2) Finds optimal atom mapping (lowest atom deviations) for each reflection using the Hungarian algorithm,
+    trying the most promising reflections first and skipping reflections that can't give a lower MAD.
+    3) Returns the lowest maximum atom deviation over all reflections. If a MAD threshold is given, returns as soon
+    as any reflection gives a MAD below this threshold (so the returned MAD may then be above the lowest MAD)."""
+
+    # Calculate per-element distance matrices between conformer A and all 8 reflections of conformer B
+
+    distance_matrices = []
+    lower_bounds = np.zeros(len(axis_reflections))
+    for element_coords_a, element_coords_b in zip(conf_a_coords, conf_b_coords):
+        reflected_coords_b = element_coords_b[None, :, :] * axis_reflections[:, None, :]
+        distance_matrix = np.sqrt(
+            ((element_coords_a[None, :, None, :] - reflected_coords_b[:, None, :, :]) ** 2).sum(axis=3)
+        )
+        distance_matrices.append(distance_matrix)
+        # Any atom mapping moves each atom at least as far as its nearest same-element atom in the other conformer
+
+        lower_bounds = np.maximum(lower_bounds, distance_matrix.min(axis=2).max(axis=1))
+        lower_bounds = np.maximum(lower_bounds, distance_matrix.min(axis=1).max(axis=1))
+
+    # Find optimal atom mappings with the Hungarian algorithm, starting with the reflection with the lowest bound
+
+    lowest_mad = np.inf
+    for reflection in np.argsort(lower_bounds, kind="stable"):
+        if lower_bounds[reflection] >= lowest_mad:
+            break  # This and all remaining reflections can't give a lower MAD
+        mad = 0.0
+        for distance_matrix in distance_matrices:
+            row_ind, col_ind = linear_sum_assignment(distance_matrix[reflection])
+            mad = max(mad, distance_matrix[reflection][row_ind, col_ind].max())
+            if mad >= lowest_mad:
+                break
+        lowest_mad = min(lowest_mad, mad)
+        if mad_threshold is not None and lowest_mad < mad_threshold:
+            break
+    return float(lowest_mad)
+
+
+def kabsch_maximum_atom_deviation(conf_a_coords, conf_b_coords):
+    """Finds the maximum atom deviation between two conformers (from aligned_geometry_store) keeping their atom order,
+    after superimposing them with the Kabsch algorithm (least-squares fit over all atoms). Only the rotation is fitted:
+    both conformers stay centred on their heavy atom centroids, as in every other MAD check, so MAD lower bounds also
+    bound this MAD. As with the 8 axis reflections used for MADs, the fit can include a reflection. Takes time
+    proportional to the number of atoms."""
+
+    coords_a = np.concatenate(conf_a_coords)
+    coords_b = np.concatenate(conf_b_coords)
+    u, singular_values, vt = np.linalg.svd(coords_b.T @ coords_a)
+    fitted_coords_b = coords_b @ (u @ vt)
+    return float(np.sqrt(((coords_a - fitted_coords_b) ** 2).sum(axis=1)).max())
+
+
+def torsion_fingerprint_store(element_list, x_coords, y_coords, z_coords):
+    """Calculates a rotatable torsion fingerprint for every conformer, used to compare conformers by torsion angles
+    ("Redundant conformer comparison" setting) instead of aligned geometries.
+    1) Perceives bonds once (bonded_molecule) and finds rotatable bonds: bonds outside rings between two heavy atoms
+    that are each bonded to at least one other heavy atom (so methyl/hydroxyl rotamers aren't compared).
+    2) Defines one torsion per rotatable bond, from the lowest-numbered other heavy atom bonded to each end.
+    3) Calculates all torsion angles (degrees, -180 to 180) for all conformers at once.
+    Returns an array with one row per conformer and one column per torsion, or None if bonds can't be determined or
+    there are no rotatable bonds (conformers are then compared by aligned geometries)."""
+
+    if not element_list:
+        return None
+    mol = bonded_molecule(element_list, x_coords, y_coords, z_coords)
+    if mol is None:
+        return None
+    torsion_atoms = []
+    for bond in mol.GetBonds():
+        if bond.IsInRing():
+            continue
+        atom_b = bond.GetBeginAtom()
+        atom_c = bond.GetEndAtom()
+        bond_start = bond.GetBeginAtomIdx()
+        bond_end = bond.GetEndAtomIdx()
+        neighbours_b = [
+            atom.GetIdx() for atom in atom_b.GetNeighbors() if atom.GetAtomicNum() != 1 and atom.GetIdx() != bond_end
+        ]
+        neighbours_c = [
+            atom.GetIdx() for atom in atom_c.GetNeighbors() if atom.GetAtomicNum() != 1 and atom.GetIdx() != bond_start
+        ]
+        if atom_b.GetAtomicNum() == 1 or atom_c.GetAtomicNum() == 1 or not neighbours_b or not neighbours_c:
+            continue
+        torsion_atoms.append((min(neighbours_b), bond_start, bond_end, min(neighbours_c)))
+    if not torsion_atoms:
+        return None
+
+    # Calculate torsion angles for all conformers and torsions at once
+
+    coords = np.stack(
+        (
+            np.array(x_coords, dtype=np.float64),
+            np.array(y_coords, dtype=np.float64),
+            np.array(z_coords, dtype=np.float64),
+        ),
+        axis=-1,
+    )
+    torsion_atoms = np.array(torsion_atoms)
+    bond_vectors_1 = coords[:, torsion_atoms[:, 1]] - coords[:, torsion_atoms[:, 0]]
+    bond_vectors_2 = coords[:, torsion_atoms[:, 2]] - coords[:, torsion_atoms[:, 1]]
+    bond_vectors_3 = coords[:, torsion_atoms[:, 3]] - coords[:, torsion_atoms[:, 2]]
+    normal_1 = np.cross(bond_vectors_1, bond_vectors_2)
+    normal_2 = np.cross(bond_vectors_2, bond_vectors_3)
+    sines = (np.cross(normal_1, normal_2) * bond_vectors_2).sum(axis=2) / np.linalg.norm(bond_vectors_2, axis=2)
+    cosines = (normal_1 * normal_2).sum(axis=2)
+    return np.degrees(np.arctan2(sines, cosines))
+
+
+def pair_torsion_differences(torsion_angles, candidate_pairs):
+    """Returns the largest circular torsion angle difference (degrees, 0 to 180) of many conformer pairs (an array of
+    [conf_number_a, conf_number_b] rows), from torsion fingerprints (from torsion_fingerprint_store). Calculated in
+    chunks to limit memory use."""
+
+    candidate_pairs = np.asarray(candidate_pairs, dtype=int).reshape(-1, 2)
+    torsion_differences = np.zeros(len(candidate_pairs))
+    for start in range(0, len(candidate_pairs), 100000):
+        chunk = candidate_pairs[start:start + 100000]
+        angle_differences = np.abs(torsion_angles[chunk[:, 0]] - torsion_angles[chunk[:, 1]]) % 360
+        torsion_differences[start:start + 100000] = np.minimum(angle_differences, 360 - angle_differences).max(axis=1)
+    return torsion_differences
+
+
+def torsion_candidate_pairs(torsion_angles, torsion_threshold):
+    """Finds conformer pairs with all torsion angles within the torsion threshold (degrees) of each other, from
+    torsion fingerprints (from torsion_fingerprint_store). Torsion angles are placed on the unit circle (cosine and
+    sine), where a circular difference below the threshold changes each coordinate by no more than
+    2 sin(threshold / 2), so a KD-tree can find all such pairs without looping over all conformer pairs. Pairs are
+    then checked with their exact circular torsion differences. Returns an array of [conf_number_a, conf_number_b]
+    rows (conf_number_a < conf_number_b), sorted in order of appearance, and their largest torsion differences."""
+
+    if len(torsion_angles) < 2 or torsion_threshold <= 0:
+        return np.zeros((0, 2), dtype=int), np.zeros(0)
+    torsion_radians = np.radians(torsion_angles)
+    circle_coords = np.hstack((np.cos(torsion_radians), np.sin(torsion_radians)))
+    candidate_pairs = cKDTree(circle_coords).query_pairs(
+        r=2 * np.sin(np.radians(min(torsion_threshold, 180)) / 2) + 1e-12, p=np.inf, output_type="ndarray"
+    )
+    candidate_pairs = candidate_pairs[np.lexsort((candidate_pairs[:, 1], candidate_pairs[:, 0]))]
+    torsion_differences = pair_torsion_differences(torsion_angles, candidate_pairs)
+    below_threshold = torsion_differences < torsion_threshold
+    return candidate_pairs[below_threshold], torsion_differences[below_threshold]
+
+
+@lru_cache(maxsize=None)
+def interchangeable_atom_mappings(number_of_atoms):
+    """Returns all orders in which a group of interchangeable atoms can be mapped onto each other."""
+
+    return [np.array(mapping) for mapping in permutations(range(number_of_atoms))]
+
+
+def symmetry_corrected_mad(conf_a_coords, conf_b_coords, symmetry_permutations, mad_threshold=None):
+    """Finds the maximum atom deviation between two aligned conformers (from aligned_geometry_store), only mapping
+    atoms onto bonding-equivalent atoms (symmetry permutations from symmetry_permutation_store).
+    1) Finds a lower bound on the MAD for each permutation from atom distances to the (heavy atom) centroid, which
+    don't change on rotation, and tries permutations in order of these lower bounds.
+    2) Superimposes conformer B onto conformer A with the Kabsch algorithm, keeping both conformers centred on their
+    heavy atom centroids (as with the 8 axis reflections, fits can include a reflection). Interchangeable atoms (e.g.
+    methyl hydrogens) are then mapped onto each other with the lowest maximum deviation, and the fit is repeated.
+    3) Returns the lowest maximum atom deviation over all permutations, skipping permutations that can't give a lower
+    MAD. If a MAD threshold is given, returns as soon as any permutation gives a MAD below this threshold (so the
+    returned MAD may then be above the lowest MAD)."""
+
+    atom_permutations, interchangeable_groups = symmetry_permutations
+    coords_a = np.concatenate(conf_a_coords)
+    coords_b = np.concatenate(conf_b_coords)
+    radii_a = np.sqrt((coords_a ** 2).sum(axis=1))
+    radii_b = np.sqrt((coords_b ** 2).sum(axis=1))
+    radius_deviations = np.abs(radii_a[None, :] - radii_b[atom_permutations])
+    for group in interchangeable_groups:  # Interchangeable atoms can be mapped in any order
+        radius_deviations[:, group] = np.abs(
+            np.sort(radii_a[group])[None, :] - np.sort(radii_b[atom_permutations[:, group]], axis=1)
+        )
+    lower_bounds = radius_deviations.max(axis=1)
+    fixed_atoms = np.setdiff1d(np.arange(len(coords_a)), np.concatenate([[]] + interchangeable_groups).astype(int))
+    if len(fixed_atoms) < 3:
+        fixed_atoms = slice(None)
+    lowest_mad = np.inf
+    for permutation in np.argsort(lower_bounds, kind="stable"):
+        if lower_bounds[permutation] >= lowest_mad:
+            break  # This and all remaining permutations can't give a lower MAD
+        permuted_coords_b = coords_b[atom_permutations[permutation]]
+        fitted_atoms = fixed_atoms  # The first fit leaves out interchangeable atoms, as these aren't mapped yet
+        for refinement in range(2 if interchangeable_groups else 0):
+            u, singular_values, vt = np.linalg.svd(permuted_coords_b[fitted_atoms].T @ coords_a[fitted_atoms])
+            fitted_coords_b = permuted_coords_b @ (u @ vt)
+            for group in interchangeable_groups:
+                group_mapping = min(
+                    interchangeable_atom_mappings(len(group)),
+                    key=lambda mapping: ((coords_a[group] - fitted_coords_b[group[mapping]]) ** 2).sum(axis=1).max(),
+                )
+                permuted_coords_b[group] = permuted_coords_b[group[group_mapping]]
+            fitted_atoms = slice(None)
+        u, singular_values, vt = np.linalg.svd(permuted_coords_b.T @ coords_a)
+        fitted_coords_b = permuted_coords_b @ (u @ vt)
+        lowest_mad = min(lowest_mad, float(np.sqrt(((coords_a - fitted_coords_b) ** 2).sum(axis=1)).max()))
+        if mad_threshold is not None and lowest_mad < mad_threshold:
+            break
+    return lowest_mad
+
+
+def duplicate_pair_mad_calculator(
+    conf_a_coords, conf_b_coords, mad_threshold, early_exit_mad_threshold=None, symmetry_permutations=None
+):
+    """Finds the MAD between two aligned conformers (from aligned_geometry_store) and which check decided it.
+    Conformers from the same workflow usually keep their atom order, so the conformers are first superimposed
+    keeping this order (Kabsch fit). If all atom deviations are then below the MAD threshold, the pair is a duplicate
+    without any atom mapping (unless no early exit MAD threshold is given, i.e. exact MADs are needed). Otherwise, the
+    full MAD calculation (all reflections, Hungarian atom mapping) is used, returning the lower of the two maximum atom
+    deviations. If symmetry permutations are given (from
+    symmetry_permutation_store), atoms are only mapped onto bonding-equivalent atoms instead (symmetry_corrected_mad).
+    Returns the MAD and the check that decided it."""
+
+    if symmetry_permutations is not None:
+        return (
+            symmetry_corrected_mad(conf_a_coords, conf_b_coords, symmetry_permutations, early_exit_mad_threshold),
+            "Symmetry-corrected fit (bonding)",
+        )
+    kabsch_mad = kabsch_maximum_atom_deviation(conf_a_coords, conf_b_coords)
+    if kabsch_mad < mad_threshold and early_exit_mad_threshold is not None:
+        return kabsch_mad, "Kabsch fit (same atom order)"
+    maximum_atom_deviation = maximum_atom_deviation_calculator(conf_a_coords, conf_b_coords, early_exit_mad_threshold)
+    if kabsch_mad < mad_threshold:
+        return min(kabsch_mad, maximum_atom_deviation), "Kabsch fit (same atom order)"
+    return min(kabsch_mad, maximum_atom_deviation), "MAD calculation"
+
+
+def geometry_content_hashes(element_list, x_coords, y_coords, z_coords):
+    """Returns a content hash for each conformer geometry (elements and unaligned coordinates), used to look up MADs
+    calculated in previous runs."""
+
+    content_hashes = []
+    for elements, x, y, z in zip(element_list, x_coords, y_coords, z_coords):
+        geometry_hash = blake2b(" ".join(elements).encode(), digest_size=16)
+        geometry_hash.update(np.array([x, y, z], dtype=np.float64).tobytes())
+        content_hashes.append(geometry_hash.hexdigest())
+    return content_hashes
+
+
+def mad_cache_opener(mad_cache_path):
+    """Opens (or creates) the MAD cache file, an SQLite database of MADs calculated in previous runs. Returns None if
+    the cache file can't be used, in which case all MADs are calculated as normal."""
+
+    try:
+        mad_cache = sqlite3.connect(mad_cache_path)
+        mad_cache.execute(
+            "CREATE TABLE IF NOT EXISTS mads (geometry_a TEXT, geometry_b TEXT, mode TEXT, mad REAL, exact INTEGER, "
+            "last_used REAL, PRIMARY KEY (geometry_a, geometry_b, mode))"
+        )
+        mad_cache.execute("CREATE INDEX IF NOT EXISTS mads_last_used ON mads (last_used)")
+        return mad_cache
+    except sqlite3.Error:
+        return None
+
+
+def mad_cache_lookup(mad_cache, geometry_hash_a, geometry_hash_b, cache_mode=mad_cache_mode):
+    """Returns the cached MAD between two conformer geometries and whether it is exact (False if the MAD calculation
+    stopped early, below the MAD threshold used at the time), or None if this pair isn't in the cache. Keys are
+    symmetric, so the order of the two geometries doesn't matter."""
+
+    geometry_hash_a, geometry_hash_b = sorted((geometry_hash_a, geometry_hash_b))
+    try:
+        cached_mad = mad_cache.execute(
+            "SELECT mad, exact FROM mads WHERE geometry_a = ? AND geometry_b = ? AND mode = ?",
+            (geometry_hash_a, geometry_hash_b, cache_mode),
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    if cached_mad is None:
+        return None
+    return cached_mad[0], bool(cached_mad[1])
+
+
+def mad_cache_updater(mad_cache, new_mads, reused_mads, cache_mode=mad_cache_mode):
+    """Saves newly calculated MADs (a list of (geometry_hash_a, geometry_hash_b, MAD, exact)) to the MAD cache and
+    marks reused MADs (a list of (geometry_hash_a, geometry_hash_b)) as recently used. If the cache holds more than
+    mad_cache_max_entries MADs, the least recently used MADs are removed. Closes the cache file."""
+
+    last_used = time()
+    try:
+        mad_cache.executemany(
+            "INSERT OR REPLACE INTO mads VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (*sorted((geometry_hash_a, geometry_hash_b)), cache_mode, mad, int(exact), last_used)
+                for geometry_hash_a, geometry_hash_b, mad, exact in new_mads
+            ],
+        )
+        mad_cache.executemany(
+            "UPDATE mads SET last_used = ? WHERE geometry_a = ? AND geometry_b = ? AND mode = ?",
+            [
+                (last_used, *sorted((geometry_hash_a, geometry_hash_b)), cache_mode)
+                for geometry_hash_a, geometry_hash_b in reused_mads
+            ],
+        )
+        number_of_cached_mads = mad_cache.execute("SELECT COUNT(*) FROM mads").fetchone()[0]
+        if number_of_cached_mads > mad_cache_max_entries:
+            mad_cache.execute(
+                "DELETE FROM mads WHERE rowid IN (SELECT rowid FROM mads ORDER BY last_used LIMIT ?)",
+                (number_of_cached_mads - mad_cache_max_entries,),
+            )
+        mad_cache.commit()
+    except sqlite3.Error:
+        pass
+    mad_cache.close()
+
+
+def ordinal_conformer_number(conformer_number):
+    """Returns a conformer number with its ordinal suffix (e.g. 1st, 12th, 23rd), for naming redundant conformers."""
+
+    if str(conformer_number).endswith("1") and not str(conformer_number).endswith("11"):
+        return str(conformer_number) + "st"
+    elif str(conformer_number).endswith("2") and not str(conformer_number).endswith("12"):
+        return str(conformer_number) + "nd"
+    elif str(conformer_number).endswith("3") and not str(conformer_number).endswith("13"):
+        return str(conformer_number) + "rd"
+    else:
+        return str(conformer_number) + "th"
+
+
+def duplicate_cluster_store(conformer_labels):
+    """Creates a union-find structure for grouping redundant conformers, keyed by original conformer index (before
+    any conformers are removed). conformer_labels gives the name of each conformer (e.g. 3rd, or a conformer suffix).
+    Duplicates are mapped to the representative (kept) conformer of their cluster, with their MADs, (for
+    conformers from output files) energy differences in kcal/mol and the check that found them (geometry hash or
+    MAD calculation)."""
+
+    return {
+        "number of conformers": len(conformer_labels),
+        "parents": list(range(len(conformer_labels))),
+        "labels": list(conformer_labels),
+        "representatives": {},
+        "MADs": {},
+        "energy differences": {},
+        "stages": {},
+    }
+
+
+def conformer_cluster_root(duplicate_clusters, conf_number):
+    """Returns the index of the representative conformer of a conformer's cluster (with path halving)."""
+
+    parents = duplicate_clusters["parents"]
+    while parents[conf_number] != conf_number:
+        parents[conf_number] = parents[parents[conf_number]]
+        conf_number = parents[conf_number]
+    return conf_number
+
+
+def duplicate_cluster_merger(
+    duplicate_clusters,
+    conf_number_a,
+    conf_number_b,
+    maximum_atom_deviation,
+    energy_difference=None,
+    duplicate_check_stage="MAD calculation",
+):
+    """Merges conformer B (and its cluster) into the cluster of conformer A, as a duplicate of A's representative.
+    Pairs should be merged in order of appearance, so that the first conformer of each cluster is kept."""
+
+    root_a = conformer_cluster_root(duplicate_clusters, conf_number_a)
+    root_b = conformer_cluster_root(duplicate_clusters, conf_number_b)
+    if root_a == root_b:
+        return
+    duplicate_clusters["parents"][root_b] = root_a
+    duplicate_clusters["representatives"][conf_number_b] = root_a
+    duplicate_clusters["MADs"][conf_number_b] = maximum_atom_deviation
+    duplicate_clusters["stages"][conf_number_b] = duplicate_check_stage
+    if energy_difference is not None:
+        duplicate_clusters["energy differences"][conf_number_b] = energy_difference
+
+
+def kept_conformer_numbers(duplicate_clusters):
+    """Returns the original indices of all conformers that are not duplicates (the representative conformers)."""
+
+    parents = duplicate_clusters["parents"]
+    return [
+        conf_number
+        for conf_number in range(duplicate_clusters["number of conformers"])
+        if parents[conf_number] == conf_number
+    ]
+
+
+def library_conformer_adder(duplicate_clusters, library_label):
+    """Adds a conformer from the conformer library (not part of the current ensemble) to the union-find structure,
+    so that conformers of the ensemble can be recorded as its duplicates. Returns its index."""
+
+    duplicate_clusters["parents"].append(len(duplicate_clusters["parents"]))
+    duplicate_clusters["labels"].append(library_label)
+    return len(duplicate_clusters["parents"]) - 1
+
+
+def duplicate_conformer_summary(duplicate_clusters):
+    """Returns the number of duplicate conformers, their names (in the order they were found) and a plural suffix,
+    for status bar messages. Returns an empty list if no duplicates were found."""
+
+    duplicate_names = [
+        duplicate_clusters["labels"][conf_number].removesuffix(".out").removesuffix(".log")
+        for conf_number in duplicate_clusters["representatives"]
+    ]
+    if not duplicate_names:
+        return []
+    plural = "s" if len(duplicate_names) > 1 else ""
+    return [str(len(duplicate_names)), ", ".join(duplicate_names), plural]
+
+
+def available_cpu_count():
+    """Returns the number of CPUs this process can run on. This respects CPU affinity (e.g. limits set by job
+    schedulers or containers) where the operating system reports it, unlike multiprocessing.cpu_count."""
+
+    try:
+        from os import sched_getaffinity  # Not available on Windows or macOS
+    except ImportError:
+        return cpu_count() or 1
+    return len(sched_getaffinity(0)) or 1
+
+
+def shared_coordinates_attacher(shared_memory_name, shape, element_sizes):
+    """Process pool initializer. Attaches a worker process to the shared memory block holding all aligned
+    conformer coordinates (zero-copy), and splits these coordinates by element for MAD calculations. The shared
+    memory block is closed when the worker process exits (shared_coordinates_detacher)."""
+
+    global worker_shared_memory, worker_aligned_geometries
+    worker_shared_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    Finalize(None, shared_coordinates_detacher, exitpriority=10)
+    aligned_coords = np.ndarray(shape, dtype=np.float64, buffer=worker_shared_memory.buf)
+    element_boundaries = np.cumsum([0] + list(element_sizes))
+    worker_aligned_geometries = [
+        [conformer[start:end] for start, end in zip(element_boundaries[:-1], element_boundaries[1:])]
+        for conformer in aligned_coords
+    ]
+
+
+def shared_coordinates_detacher():
+    """Closes a worker process's handle to the shared memory block of aligned coordinates (the main process unlinks
+    the block). Arrays viewing the block are removed first, as the block can't be closed while these exist."""
+
+    global worker_aligned_geometries
+    worker_aligned_geometries = None
+    worker_shared_memory.close()
+
+
+def pair_chunk_mad_calculator(
+    candidate_pairs, mad_threshold, early_exit_mad_threshold, symmetry_permutations=None, aligned_geometries=None
+):
+    """Calculates MADs for a chunk of candidate conformer pairs and returns only pairs with MADs below the MAD
+    threshold (with the check that decided each MAD). In worker processes, uses the aligned coordinates attached by
+    shared_coordinates_attacher."""
+
+    if aligned_geometries is None:
+        aligned_geometries = worker_aligned_geometries
+    duplicate_pairs = []
+    for conf_number_a, conf_number_b in candidate_pairs:
+        maximum_atom_deviation, duplicate_check_stage = duplicate_pair_mad_calculator(
+            aligned_geometries[conf_number_a],
+            aligned_geometries[conf_number_b],
+            mad_threshold,
+            early_exit_mad_threshold,
+            symmetry_permutations,
+        )
+        if maximum_atom_deviation < mad_threshold:
+            duplicate_pairs.append(
+                (int(conf_number_a), int(conf_number_b), maximum_atom_deviation, duplicate_check_stage)
+            )
+    return duplicate_pairs
+
+
+def parallel_duplicate_pair_finder(
+    aligned_geometries,
+    candidate_pairs,
+    mad_threshold,
+    early_exit_mad_threshold,
+    number_of_processes,
+    symmetry_permutations=None,
+):
+    """Calculates MADs for all candidate conformer pairs (an array of [conf_number_a, conf_number_b] rows),
+    split across a process pool. Aligned coordinates are shared with worker processes through one shared memory
+    block, and only pairs with MADs below the MAD threshold are sent back. Returns these pairs as a sorted list of
+    (conf_number_a, conf_number_b, MAD, duplicate check stage), so results don't depend on the number of processes."""
+
+    if number_of_processes < 1:
+        number_of_processes = available_cpu_count()
+    number_of_processes = min(number_of_processes, max(1, len(candidate_pairs) // 500))
+    if number_of_processes == 1:  # Small jobs aren't worth the cost of starting worker processes
+        return pair_chunk_mad_calculator(
+            candidate_pairs, mad_threshold, early_exit_mad_threshold, symmetry_permutations, aligned_geometries
+        )
+
+    # Copy aligned coordinates into a shared memory block
+
+    element_sizes = [len(element_coords) for element_coords in aligned_geometries[0]]
+    aligned_coords = np.array([np.concatenate(conformer) for conformer in aligned_geometries], dtype=np.float64)
+    coords_shared_memory = shared_memory.SharedMemory(create=True, size=aligned_coords.nbytes)
+    try:
+        shared_aligned_coords = np.ndarray(aligned_coords.shape, dtype=np.float64, buffer=coords_shared_memory.buf)
+        shared_aligned_coords[:] = aligned_coords
+
+        # Split candidate pairs into chunks (several per process, to balance the load), then calculate MADs
+
+        chunks = np.array_split(candidate_pairs, number_of_processes * 8)
+        duplicate_pairs = []
+        with ProcessPoolExecutor(
+            max_workers=number_of_processes,
+            initializer=shared_coordinates_attacher,
+            initargs=(coords_shared_memory.name, aligned_coords.shape, element_sizes),
+        ) as executor:
+            for chunk_duplicate_pairs in executor.map(
+                pair_chunk_mad_calculator,
+                chunks,
+                [mad_threshold] * len(chunks),
+                [early_exit_mad_threshold] * len(chunks),
+                [symmetry_permutations] * len(chunks),
+            ):
+                duplicate_pairs.extend(chunk_duplicate_pairs)
+        del shared_aligned_coords
+    finally:
+        coords_shared_memory.close()
+        coords_shared_memory.unlink()
+    duplicate_pairs.sort()
+    return duplicate_pairs
+
+
+def condensed_matrix_rows(distance_matrix, number_of_confs, conf_numbers):
+    """Returns full rows (one per conformer in conf_numbers, with zeros on the diagonal) of a condensed pairwise
+    distance matrix (upper triangle stored row by row, as used by SciPy), without building the square matrix."""
+
+    conf_numbers = np.asarray(conf_numbers, dtype=np.int64).reshape(-1)
+    other_conf_numbers = np.arange(number_of_confs, dtype=np.int64)
+    first = np.minimum(conf_numbers[:, None], other_conf_numbers[None, :])
+    second = np.maximum(conf_numbers[:, None], other_conf_numbers[None, :])
+    diagonal = first == second
+    matrix_indices = number_of_confs * first - first * (first + 1) // 2 + second - first - 1
+    matrix_indices[diagonal] = 0
+    rows = np.asarray(distance_matrix[matrix_indices.ravel()], dtype=np.float64).reshape(matrix_indices.shape)
+    rows[diagonal] = 0.0
+    return rows
+
+
+def mad_matrix_row_calculator(conf_numbers, mad_matrix_path, symmetry_permutations=None, aligned_geometries=None):
+    """Calculates exact MADs between each conformer in conf_numbers and all later conformers, and writes them
+    straight into the memory-mapped condensed MAD matrix file. In worker processes, uses the aligned coordinates
+    attached by shared_coordinates_attacher."""
+
+    if aligned_geometries is None:
+        aligned_geometries = worker_aligned_geometries
+    number_of_confs = len(aligned_geometries)
+    mad_matrix = np.load(mad_matrix_path, mmap_mode="r+")
+    for conf_number_a in conf_numbers:
+        row_start = number_of_confs * conf_number_a - conf_number_a * (conf_number_a + 1) // 2
+        for conf_number_b in range(conf_number_a + 1, number_of_confs):
+            mad_matrix[row_start + conf_number_b - conf_number_a - 1] = duplicate_pair_mad_calculator(
+                aligned_geometries[conf_number_a], aligned_geometries[conf_number_b], 0.0, None, symmetry_permutations
+            )[0]
+    mad_matrix.flush()
+    del mad_matrix
+
+
+def pairwise_mad_matrix(aligned_geometries, mad_matrix_path, number_of_processes, symmetry_permutations=None):
+    """Calculates the MADs between all pairs of aligned conformers (from aligned_geometry_store) as a condensed
+    matrix (SciPy order), stored as float32 in a memory-mapped .npy file so that large ensembles don't need to fit in
+    memory. Rows are split across a process pool (interleaved, as earlier rows hold more pairs), with aligned
+    coordinates shared through one shared memory block, and each worker process writes its rows straight into the
+    file. Returns the memory-mapped matrix (read only)."""
+
+    number_of_confs = len(aligned_geometries)
+    mad_matrix = np.lib.format.open_memmap(
+        mad_matrix_path, mode="w+", dtype=np.float32, shape=(number_of_confs * (number_of_confs - 1) // 2,)
+    )
+    mad_matrix.flush()
+    del mad_matrix
+    if number_of_processes < 1:
+        number_of_processes = available_cpu_count()
+    number_of_processes = min(number_of_processes, max(1, number_of_confs * (number_of_confs - 1) // 1000))
+    if number_of_processes == 1:  # Small jobs aren't worth the cost of starting worker processes
+        mad_matrix_row_calculator(range(number_of_confs), mad_matrix_path, symmetry_permutations, aligned_geometries)
+        return np.load(mad_matrix_path, mmap_mode="r")
+
+    # Copy aligned coordinates into a shared memory block, then calculate rows of the MAD matrix
+
+    element_sizes = [len(element_coords) for element_coords in aligned_geometries[0]]
+    aligned_coords = np.array([np.concatenate(conformer) for conformer in aligned_geometries], dtype=np.float64)
+    coords_shared_memory = shared_memory.SharedMemory(create=True, size=aligned_coords.nbytes)
+    try:
+        shared_aligned_coords = np.ndarray(aligned_coords.shape, dtype=np.float64, buffer=coords_shared_memory.buf)
+        shared_aligned_coords[:] = aligned_coords
+        number_of_chunks = number_of_processes * 8
+        chunks = [range(chunk, number_of_confs, number_of_chunks) for chunk in range(number_of_chunks)]
+        with ProcessPoolExecutor(
+            max_workers=number_of_processes,
+            initializer=shared_coordinates_attacher,
+            initargs=(coords_shared_memory.name, aligned_coords.shape, element_sizes),
+        ) as executor:
+            list(
+                executor.map(
+                    mad_matrix_row_calculator,
+                    chunks,
+                    [mad_matrix_path] * len(chunks),
+                    [symmetry_permutations] * len(chunks),
+                )
+            )
+        del shared_aligned_coords
+    finally:
+        coords_shared_memory.close()
+        coords_shared_memory.unlink()
+    return np.load(mad_matrix_path, mmap_mode="r")
+
+
+def cluster_medoid(distance_matrix, number_of_confs, members):
+    """Returns the medoid of a cluster of conformers (the member with the lowest sum of distances to all other
+    members), from a condensed pairwise distance matrix."""
+
+    members = np.asarray(members)
+    member_distances = condensed_matrix_rows(distance_matrix, number_of_confs, members)[:, members]
+    return int(members[np.argmin(member_distances.sum(axis=1))])
+
+
+def k_medoids_clustering(distance_matrix, number_of_confs, number_of_clusters, max_iterations=100):
+    """Splits conformers into clusters around representative conformers (medoids) with the k-medoids method, from a
+    condensed pairwise distance matrix (e.g. from pairwise_mad_matrix).
+    1) Chooses starting medoids greedily (PAM BUILD), each lowering the total distance of all conformers to their
+    nearest medoid as much as possible. Candidate rows are read from the matrix in blocks.
+    2) Alternates between assigning each conformer to its nearest medoid and moving each medoid to its cluster's
+    medoid, until the medoids no longer change.
+    Returns the medoids (in order of appearance) and the medoid of each conformer."""
+
+    number_of_clusters = min(number_of_clusters, number_of_confs)
+    nearest_distances = np.full(number_of_confs, np.inf)
+    medoids = []
+    for cluster in range(number_of_clusters):
+        total_distances = np.zeros(number_of_confs)
+        for start in range(0, number_of_confs, 256):
+            candidates = range(start, min(start + 256, number_of_confs))
+            rows = condensed_matrix_rows(distance_matrix, number_of_confs, candidates)
+            total_distances[start:start + len(rows)] = np.minimum(rows, nearest_distances[None, :]).sum(axis=1)
+        total_distances[medoids] = np.inf
+        medoids.append(int(np.argmin(total_distances)))
+        nearest_distances = np.minimum(
+            nearest_distances, condensed_matrix_rows(distance_matrix, number_of_confs, medoids[-1:])[0]
+        )
+
+    # Alternate between assignment and medoid updates
+
+    for iteration in range(max_iterations):
+        assignments = np.argmin(condensed_matrix_rows(distance_matrix, number_of_confs, medoids), axis=0)
+        new_medoids = [
+            cluster_medoid(distance_matrix, number_of_confs, np.flatnonzero(assignments == cluster))
+            for cluster in range(len(medoids))
+        ]
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+    medoids = sorted(medoids)
+    assignments = np.argmin(condensed_matrix_rows(distance_matrix, number_of_confs, medoids), axis=0)
+    return medoids, [medoids[cluster] for cluster in assignments]
+
+
+def hierarchical_clustering(distance_matrix, number_of_confs, number_of_clusters):
+    """Splits conformers into clusters with agglomerative hierarchical clustering (average linkage), from a condensed
+    pairwise distance matrix (e.g. from pairwise_mad_matrix), then picks the medoid of each cluster as its
+    representative conformer. Returns the medoids (in order of appearance) and the medoid of each conformer."""
+
+    number_of_clusters = min(number_of_clusters, number_of_confs)
+    if number_of_confs < 2:
+        return list(range(number_of_confs)), list(range(number_of_confs))
+    cluster_labels = fcluster(
+        linkage(np.asarray(distance_matrix, dtype=np.float64), method="average"), number_of_clusters, "maxclust"
+    )
+    cluster_medoids = {
+        cluster_label: cluster_medoid(distance_matrix, number_of_confs, np.flatnonzero(cluster_labels == cluster_label))
+        for cluster_label in np.unique(cluster_labels)
+    }
+    return sorted(cluster_medoids.values()), [cluster_medoids[cluster_label] for cluster_label in cluster_labels]
+
+
+def conformer_library_file(conformer_library_folder, element_list, x_coords, y_coords, z_coords):
+    """Returns the conformer library file path for a compound, named by its molecular formula and a short hash of its
+    bonding (bonded element pairs and atom degrees, from bonded_molecule), which doesn't depend on atom order."""
+
+    element_counts = {element: element_list[0].count(element) for element in element_list[0]}
+    formula = "".join(
+        element + (str(element_counts[element]) if element_counts[element] > 1 else "")
+        for element in [element for element in library_formula_order if element in element_counts]
+        + sorted(element for element in element_counts if element not in library_formula_order)
+    )
+    bonding = []
+    mol = bonded_molecule(element_list, x_coords, y_coords, z_coords)
+    if mol is not None:
+        bonding = sorted(
+            "-".join(sorted((bond.GetBeginAtom().GetSymbol(), bond.GetEndAtom().GetSymbol())))
+            for bond in mol.GetBonds()
+        ) + sorted(atom.GetSymbol() + str(atom.GetDegree()) for atom in mol.GetAtoms())
+    bonding_hash = blake2b(" ".join(bonding).encode(), digest_size=6).hexdigest()
+    return os_path.join(conformer_library_folder, formula + "_" + bonding_hash + ".npz")
+
+
+def conformer_library_geometries(library_elements, library_coords, settings):
+    """Aligns conformer library geometries (one array of original coordinates per conformer) for MAD calculations
+    with the current "MAD atoms" settings, as done for new conformers. Returns the aligned geometries (split by
+    element), their lower bound descriptors and their geometry fingerprints."""
+
+    element_list = [list(library_elements)] * len(library_coords)
+    mad_elements, mad_x_coords, mad_y_coords, mad_z_coords = mad_atom_subset(
+        element_list, library_coords[:, :, 0], library_coords[:, :, 1], library_coords[:, :, 2], settings
+    )
+    aligned_geometries = aligned_geometry_store(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+    lower_bound_descriptors = mad_lower_bound_store(mad_elements, aligned_geometries)
+    fingerprints = geometry_fingerprint_store(mad_elements, lower_bound_descriptors)
+    return aligned_geometries, lower_bound_descriptors, fingerprints
+
+
+def conformer_library_loader(library_file, element_list, settings):
+    """Loads a compound's conformer library (.npz file): original coordinates and labels of all library conformers,
+    their aligned geometries (in aligned_geometry_store atom order) and their geometry fingerprints. Aligned
+    geometries and fingerprints are stored with the MAD settings used to calculate them, and are only recalculated if
+    these settings have changed. Returns the library (None if there is no library for this compound yet), an error
+    status and an error message. A library file that can't be read or has a different atom order gives an error, so
+    that it isn't mistaken for a missing library and replaced."""
+
+    if not os_path.isfile(library_file):
+        return None, "", ""
+    library_name = os_path.basename(library_file)
+    try:
+        with np.load(library_file) as library_data:
+            library = {key: library_data[key] for key in library_data.files}
+        if list(library["elements"]) != list(element_list[0]):
+            return (
+                None,
+                "Error detected",
+                "The conformer library file for this compound ("
+                + library_name
+                + ") has a different atom order, so it can't be used.",
+            )
+        coordinates = library["coordinates"]
+        labels = library["labels"]
+        stored_geometries_current = str(library["mode"]) == conformer_library_mode(settings)
+        if stored_geometries_current:
+            aligned_elements = list(library["aligned elements"])
+            aligned_coordinates = library["aligned coordinates"]
+            fingerprints = library["fingerprints"]
+    except (OSError, ValueError, KeyError):
+        return (
+            None,
+            "Error detected",
+            "Unable to read the conformer library file for this compound (" + library_name + ").",
+        )
+    if stored_geometries_current:
+        # Split stored aligned geometries by element (as in aligned_geometry_store), then calculate descriptors
+
+        element_boundaries = np.cumsum(
+            [0] + [aligned_elements.count(element) for element in sorted(set(aligned_elements))]
+        )
+        aligned_geometries = [
+            [conformer[start:end] for start, end in zip(element_boundaries[:-1], element_boundaries[1:])]
+            for conformer in aligned_coordinates
+        ]
+        lower_bound_descriptors = mad_lower_bound_store([aligned_elements], aligned_geometries)
+    else:
+        aligned_geometries, lower_bound_descriptors, fingerprints = conformer_library_geometries(
+            library["elements"], coordinates, settings
+        )
+    library["coordinates"] = coordinates
+    library["labels"] = labels
+    library["aligned geometries"] = aligned_geometries
+    library["lower bound descriptors"] = lower_bound_descriptors
+    library["fingerprints"] = fingerprints
+    return library, "", ""
+
+
+def conformer_library_mode(settings):
+    """Returns the MAD settings that conformer library aligned geometries and fingerprints depend on."""
+
+    return settings["MAD atoms"] + ", " + settings["MAD elements"]
+
+
+def library_duplicate_finder(
+    library, aligned_geometries, lower_bound_descriptors, fingerprints, mad_threshold, symmetry_permutations=None
+):
+    """Finds new conformers (aligned geometries, descriptors and fingerprints as for duplicate checks) that are
+    duplicates of conformers in a conformer library (from conformer_library_loader). Library conformers near each
+    new conformer are found with a KD-tree over library fingerprints (built once per run, so each new conformer is
+    only compared with nearby library conformers), then ruled out by lower bounds on their MADs or checked with MAD
+    calculations, nearest first. Returns a list of (conf_number, library_conf_number, MAD, duplicate check stage)."""
+
+    library_duplicates = []
+    if len(library["fingerprints"]) == 0 or len(fingerprints) == 0:
+        return library_duplicates
+    combined_descriptors = [
+        np.concatenate((new_descriptor, library_descriptor))
+        for new_descriptor, library_descriptor in zip(lower_bound_descriptors, library["lower bound descriptors"])
+    ]
+    any_orientation = symmetry_permutations is not None
+    library_tree = cKDTree(library["fingerprints"])
+    for conf_number, library_conf_numbers in enumerate(
+        library_tree.query_ball_point(fingerprints, r=mad_threshold, p=np.inf)
+    ):
+        if not library_conf_numbers:
+            continue
+        library_conf_numbers = np.array(sorted(library_conf_numbers))
+        lower_bounds = mad_lower_bound(
+            combined_descriptors, conf_number, len(fingerprints) + library_conf_numbers, any_orientation
+        )
+        nearest_first = np.argsort(lower_bounds, kind="stable")
+        for library_conf_number, lower_bound in zip(library_conf_numbers[nearest_first], lower_bounds[nearest_first]):
+            if lower_bound >= mad_threshold:
+                break  # This and all remaining library conformers are certainly different
+            maximum_atom_deviation, duplicate_check_stage = duplicate_pair_mad_calculator(
+                aligned_geometries[conf_number],
+                library["aligned geometries"][library_conf_number],
+                mad_threshold,
+                mad_threshold,
+                symmetry_permutations,
+            )
+            if maximum_atom_deviation < mad_threshold:
+                library_duplicates.append(
+                    (conf_number, int(library_conf_number), maximum_atom_deviation, duplicate_check_stage)
+                )
+                break
+    return library_duplicates
+
+
+def conformer_library_updater(conformer_library_folder, element_list, x_coords, y_coords, z_coords, labels, settings):
+    """Adds conformers (e.g. those just written to input files) to their compound's conformer library, with labels
+    naming where they came from. Aligned geometries and fingerprints of all library conformers are saved with the
+    current MAD settings. The library file is replaced in one step, so an interrupted save can't corrupt it, and an
+    existing library file that can't be used is left unchanged. Returns an error status and message (both empty if
+    the library was saved)."""
+
+    if not element_list:
+        return "", ""
+    library_file = conformer_library_file(conformer_library_folder, element_list, x_coords, y_coords, z_coords)
+    new_coords = np.stack(
+        (
+            np.array(x_coords, dtype=np.float64),
+            np.array(y_coords, dtype=np.float64),
+            np.array(z_coords, dtype=np.float64),
+        ),
+        axis=-1,
+    )
+    library, library_error_check, error_message = conformer_library_loader(library_file, element_list, settings)
+    if library_error_check == "Error detected":
+        return library_error_check, error_message + " It has not been updated."
+    if library is not None:
+        new_coords = np.concatenate((library["coordinates"], new_coords))
+        labels = list(library["labels"]) + list(labels)
+    aligned_geometries, lower_bound_descriptors, fingerprints = conformer_library_geometries(
+        element_list[0], new_coords, settings
+    )
+    mad_elements = mad_atom_subset(element_list[:1], x_coords[:1], y_coords[:1], z_coords[:1], settings)[0][0]
+    try:
+        makedirs(conformer_library_folder, exist_ok=True)
+        with open(library_file + ".tmp", "wb") as file:
+            np.savez(
+                file,
+                elements=np.array(element_list[0]),
+                coordinates=new_coords,
+                labels=np.array(labels),
+                mode=np.array(conformer_library_mode(settings)),
+                **{
+                    "aligned elements": np.array(sorted(mad_elements)),
+                    "aligned coordinates": np.array([np.concatenate(conformer) for conformer in aligned_geometries]),
+                    "fingerprints": fingerprints,
+                }
+            )
+        replace(library_file + ".tmp", library_file)
+    except OSError:
+        return "Error detected", "Unable to save the conformer library file for this compound."
+    return "", ""
@@ -0,0 +1,290 @@
+# Module containing the containers for conformer data from Gaussian/ORCA output files. Each per-conformer quantity is
+# stored as one NumPy array column with one row per conformer, so conformers are removed with boolean masks and
+# reordered with index arrays (instead of deleting from, or reordering, many parallel lists). Also contains the
+# container for conformer geometries from .xyz/.sdf files (or generated with RDKit), used for input file creation.
+
+# Import modules
+
+
+from dataclasses import dataclass, field, replace
+import numpy as np
+from conformer_comparison import duplicate_cluster_store
+
+
+# Define the spectroscopic properties of each conformer, stored as arrays of shape (conformers, values). Properties
+# that were not calculated have no values (shape (conformers, 0)).
+
+spectroscopic_properties = (
+    "frequencies",
+    "ir_intensities",
+    "wavelengths",
+    "rotatory_strengths",
+    "oscillator_strengths",
+    "shielding_tensors",
+    "frequency_rotatory_strengths",
+    "frequency_dipole_strengths",
+    "optrot_wavelengths",
+    "optrot_strengths",
+)
+
+# Define the percentiles reported for Boltzmann-averaged data sampled with conformer energy errors (a 95% band and the
+# median)
+
+uncertainty_percentiles = (2.5, 50.0, 97.5)
+
+# Define all columns with one row per conformer. Optional columns (e.g. conformer suffixes) are empty if not present.
+
+conformer_columns = (
+    "energies",
+    "electronic_energies",
+    "coordinates",
+    "conformer_numbers",
+    "conformer_suffixes",
+    "chk_conformer_suffixes",
+    "implausible_geometries",
+    "relative_energies",
+    "boltzmann_weights",
+) + spectroscopic_properties
+
+
+@dataclass
+class ConformerEnsemble:
+    """Conformer data parsed from output files. All conformers share one element array (parse checks that every
+    conformer has the same atom order). Per-conformer columns (conformer_columns) are in order of appearance in the
+    selected files, until reordered with subset."""
+
+    energies: np.ndarray  # Hartrees, shape (conformers,)
+    electronic_energies: np.ndarray  # Hartrees, if Gibbs free energies are recomputed by analyse (quasi-RRHO)
+    elements: np.ndarray  # Shape (atoms,)
+    coordinates: np.ndarray  # Angstroms, shape (conformers, atoms, 3)
+    frequencies: np.ndarray
+    ir_intensities: np.ndarray
+    wavelengths: np.ndarray
+    rotatory_strengths: np.ndarray
+    oscillator_strengths: np.ndarray
+    shielding_tensors: np.ndarray
+    frequency_rotatory_strengths: np.ndarray
+    frequency_dipole_strengths: np.ndarray
+    optrot_wavelengths: np.ndarray
+    optrot_strengths: np.ndarray
+    conformer_numbers: np.ndarray  # Order of appearance in the selected files (from 0)
+    conformer_suffixes: np.ndarray  # From filenames (e.g. conf-12.out)
+    chk_conformer_suffixes: np.ndarray  # From .chk filenames in Gaussian output files
+    implausible_geometries: np.ndarray  # Atom clashes or broken bonds (from geometry_checker)
+    relative_energies: np.ndarray  # In the "Relative energy unit" setting (calculated by analyse)
+    boltzmann_weights: np.ndarray  # Calculated by analyse
+    value_counts: dict  # Number of values of each spectroscopic property found for each conformer
+    decimal_places: dict  # Decimal places of spectroscopic properties parsed as text (None if parsed as numbers)
+    theory_levels: dict  # Calculation type -> functional and basis set, solvent, dispersion correction
+    results_directory: str
+    calc_software: str
+    file_contents: list
+
+    def __len__(self):
+        return len(self.energies)
+
+    def subset(self, conf_numbers):
+        """Returns an ensemble containing only the selected conformers, given as a boolean mask or as an array of
+        row numbers (which may reorder conformers). Every per-conformer column is indexed once. Spectroscopic
+        properties are trimmed to the largest number of values of the selected conformers, so conformers with
+        consistent numbers of values give arrays without padding."""
+
+        columns = {}
+        for column_name in conformer_columns:
+            column = getattr(self, column_name)
+            if len(column):
+                columns[column_name] = column[conf_numbers]
+        value_counts = {
+            property_name: counts[conf_numbers] for property_name, counts in self.value_counts.items()
+        }
+        for property_name in spectroscopic_properties:
+            columns[property_name] = columns[property_name][:, : value_counts[property_name].max(initial=0)]
+        return replace(self, value_counts=value_counts, **columns)
+
+    def has_property(self, property_name):
+        """Checks if a spectroscopic property was calculated."""
+
+        return getattr(self, property_name).shape[1] > 0
+
+    def element_lists(self):
+        """Returns the element list of each conformer, for functions shared with .xyz/.sdf files (which take one
+        element list per conformer)."""
+
+        return [self.elements.tolist()] * len(self)
+
+    def reported_values(self, property_name):
+        """Returns the values of a spectroscopic property for each conformer as they appeared in the output files
+        (values parsed as text are rewritten with the same number of decimal places)."""
+
+        decimal_places = self.decimal_places[property_name]
+        values = getattr(self, property_name).tolist()
+        if decimal_places is None:
+            return values
+        return [[f"{value:.{decimal_places}f}" for value in conformer] for conformer in values]
+
+
+@dataclass
+class EnsembleAnalysis:
+    """Results of analyse: the kept conformers (in order of increasing energy, with relative energies and Boltzmann
+    weights), Boltzmann-averaged spectroscopic properties, and details of excluded conformers. If a temperature sweep
+    was selected, Boltzmann weights and averages are also stored for each sweep temperature (one row per
+    temperature)."""
+
+    ensemble: ConformerEnsemble
+    boltzmann_averages: dict  # Spectroscopic property -> Boltzmann-averaged values
+    c_nmr: list  # Rows for the NMR .csv file (atom labels, shielding tensor and, if calculated, chemical shift)
+    h_nmr: list
+    duplicate_clusters: dict
+    duplicate_conformers: list
+    mad_pair_statistics: list
+    imaginary_frequency_removals: int
+    geometry_issue_removals: int
+    sweep_temperatures: np.ndarray = field(default_factory=lambda: np.empty(0))  # Kelvin, shape (temperatures,)
+    sweep_boltzmann_weights: np.ndarray = field(default_factory=lambda: np.empty((0, 0)))  # (temperatures, conformers)
+    sweep_relative_energies: np.ndarray = field(default_factory=lambda: np.empty((0, 0)))  # (temperatures, conformers)
+    sweep_boltzmann_averages: dict = field(default_factory=dict)  # Property -> averages, (temperatures, values)
+    sweep_c_nmr: list = field(default_factory=list)  # NMR .csv file rows for each sweep temperature
+    sweep_h_nmr: list = field(default_factory=list)
+    energy_uncertainty: dict = field(default_factory=dict)  # Property -> statistics of sampled averages
+    energy_sensitivity: dict = field(default_factory=dict)  # Property -> derivatives and contribution shares
+
+    def conformers_in_order_of_appearance(self):
+        """Returns the kept conformers in their order of appearance in the selected files (e.g. for input files)."""
+
+        return self.ensemble.subset(np.argsort(self.ensemble.conformer_numbers, kind="stable"))
+
+    def sweep_temperature_analysis(self, temperature_number):
+        """Returns the results at one temperature of a temperature sweep, in the same form as results at the
+        "Temperature (K)" setting, so the same writers can be used. The temperature is added to the results name
+        (e.g. "Compound 253.15 K"), so each temperature gets its own files."""
+
+        temperature = self.sweep_temperatures[temperature_number]
+        ensemble = replace(
+            self.ensemble,
+            relative_energies=self.sweep_relative_energies[temperature_number],
+            boltzmann_weights=self.sweep_boltzmann_weights[temperature_number],
+            results_directory=f"{self.ensemble.results_directory} {temperature:g} K",
+        )
+        return replace(
+            self,
+            ensemble=ensemble,
+            boltzmann_averages={
+                property_name: averages[temperature_number]
+                for property_name, averages in self.sweep_boltzmann_averages.items()
+            },
+            c_nmr=self.sweep_c_nmr[temperature_number] if self.sweep_c_nmr else [],
+            h_nmr=self.sweep_h_nmr[temperature_number] if self.sweep_h_nmr else [],
+            sweep_temperatures=np.empty(0),
+            sweep_boltzmann_weights=np.empty((0, 0)),
+            sweep_relative_energies=np.empty((0, 0)),
+            sweep_boltzmann_averages={},
+            sweep_c_nmr=[],
+            sweep_h_nmr=[],
+            energy_uncertainty={},
+            energy_sensitivity={},
+        )
+
+
+@dataclass
+class GeometryEnsemble:
+    """Conformer geometries from .xyz/.sdf files (or generated with RDKit) for input file creation: the kept
+    conformers (in order of appearance, one element and coordinate list per conformer) and details of excluded
+    redundant conformers."""
+
+    elements: list
+    x_coords: list  # Angstroms
+    y_coords: list
+    z_coords: list
+    results_directory: str  # Input files are saved next to this path, and named by the user
+    duplicate_clusters: dict = field(default_factory=lambda: duplicate_cluster_store([]))
+    duplicate_conformers: list = field(default_factory=list)  # Summary from duplicate_conformer_summary
+    mad_pair_statistics: list = field(default_factory=list)  # Compared and pruned conformer pairs
+    unconverged_conformers: int = 0  # RDKit conformers excluded because their MMFF optimisation didn't converge
+
+
+def conformer_value_array(values_by_conformer, number_of_confs):
+    """Converts a spectroscopic property (one list of numbers or number strings per conformer) to an array of shape
+    (conformers, values), padded with NaN for conformers with fewer values. Returns the array, the number of values of
+    each conformer and the decimal places of values parsed as text (None for values parsed as numbers)."""
+
+    if not values_by_conformer:
+        return np.empty((number_of_confs, 0)), np.zeros(number_of_confs, dtype=int), None
+    value_counts = np.array([len(values) for values in values_by_conformer])
+    value_array = np.full((len(values_by_conformer), value_counts.max(initial=0)), np.nan)
+    decimal_places = None
+    for conf_number, values in enumerate(values_by_conformer):
+        value_array[conf_number, : len(values)] = np.array(values, dtype=np.float64)
+        text_values = [value for value in values if isinstance(value, str)]
+        if text_values:
+            decimal_places = max([decimal_places or 0] + [len(value.partition(".")[2]) for value in text_values])
+    return value_array, value_counts, decimal_places
+
+
+def conformer_ensemble_builder(
+    energies,
+    element_list,
+    x_coords,
+    y_coords,
+    z_coords,
+    property_values,
+    conformer_suffixes,
+    chk_conformer_suffixes,
+    theory_levels,
+    results_directory,
+    calc_software,
+    file_contents,
+):
+    """Builds a ConformerEnsemble from parsed data lists (one entry per conformer). property_values maps each
+    spectroscopic property to its per-conformer value lists (empty if not calculated)."""
+
+    number_of_confs = len(energies)
+    columns = {}
+    value_counts = {}
+    decimal_places = {}
+    for property_name in spectroscopic_properties:
+        columns[property_name], value_counts[property_name], decimal_places[property_name] = conformer_value_array(
+            property_values.get(property_name, []), number_of_confs
+        )
+    return ConformerEnsemble(
+        energies=np.array(energies, dtype=np.float64),
+        electronic_energies=np.empty(0),
+        elements=np.array(element_list[0] if element_list else [], dtype=str),
+        coordinates=np.stack(
+            (
+                np.array(x_coords, dtype=np.float64),
+                np.array(y_coords, dtype=np.float64),
+                np.array(z_coords, dtype=np.float64),
+            ),
+            axis=-1,
+        ).reshape(number_of_confs, -1, 3),
+        conformer_numbers=np.arange(number_of_confs),
+        conformer_suffixes=np.array(conformer_suffixes, dtype=str),
+        chk_conformer_suffixes=np.array(chk_conformer_suffixes, dtype=str),
+        implausible_geometries=np.zeros(number_of_confs, dtype=bool),
+        relative_energies=np.empty(0),
+        boltzmann_weights=np.empty(0),
+        value_counts=value_counts,
+        decimal_places=decimal_places,
+        theory_levels=theory_levels,
+        results_directory=results_directory,
+        calc_software=calc_software,
+        file_contents=file_contents,
+        **columns,
+    )
+
+
+def unanalysed_ensemble(ensemble):
+    """Wraps a parsed ensemble as analysis results without any conformers excluded, relative energies or averages
+    (used to write input files for all parsed conformers)."""
+
+    return EnsembleAnalysis(
+        ensemble=ensemble,
+        boltzmann_averages={},
+        c_nmr=[],
+        h_nmr=[],
+        duplicate_clusters=duplicate_cluster_store([]),
+        duplicate_conformers=[],
+        mad_pair_statistics=[],
+        imaginary_frequency_removals=0,
+        geometry_issue_removals=0,
+    )
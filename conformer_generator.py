@@ -0,0 +1,168 @@
+# Module containing a function for generating conformers with RDKit (ETKDG embedding, optional MMFF optimisation),
+# from a SMILES string or a single-structure .sdf/.smi file. Generated conformers are returned as a GeometryEnsemble,
+# as for conformers parsed from .xyz/.sdf files, so they can be used directly for input file creation.
+
+
+from re import sub
+from rdkit import Chem
+from rdkit.Chem import rdDistGeom, rdForceFieldHelpers
+from parsers import (
+    duplicate_conformer_remover,
+    library_duplicate_remover,
+    representative_conformer_selector,
+    redundant_conformer_settings_checker,
+)
+from conformer_comparison import duplicate_conformer_summary
+from conformer_ensemble import GeometryEnsemble
+
+
+# Generates conformers for a single compound with RDKit, then checks for redundant conformers
+
+
+def rdkit_conformer_generator(structure, results_directory, settings, conformer_library_folder=""):
+    """Embeds conformers for a compound (given as a SMILES string, or as a path to a .smi or single-structure .sdf
+    file) with ETKDG, optionally optimises them with MMFF (excluding conformers whose optimisation didn't converge),
+    then removes redundant conformers (and conformers already in the conformer library, if used).
+    Embedding and optimisation are multithreaded, and conformer coordinates are kept in memory as arrays.
+    Returns a GeometryEnsemble (None if an error was detected), an error status and an error message."""
+    # Set default value for error status
+
+    parser_error_check = "No error detected"
+    error_message = ""
+
+    # Read in structure from SMILES string or file
+
+    try:
+        if structure.endswith(".sdf"):
+            supplier = Chem.SDMolSupplier(structure, removeHs=False)
+            molecules = [molecule for molecule in supplier if molecule is not None]
+            if len(molecules) != 1:
+                parser_error_check = "Error detected"
+                error_message = (
+                    "Conformer generation needs an .sdf file containing exactly one structure.\nFor .sdf files "
+                    "containing multiple conformers, drag and drop the file instead."
+                )
+                return None, parser_error_check, error_message
+            mol = molecules[0]
+        else:
+            smiles = structure
+            if structure.endswith(".smi"):
+                with open(structure, "r") as f:
+                    smiles = f.read().strip().split()[0]
+                f.close()
+            mol = Chem.MolFromSmiles(smiles)
+    except:
+        return None, "Error detected", "Unable to read structure for conformer generation."
+    if mol is None:
+        parser_error_check = "Error detected"
+        error_message = "Unable to read structure for conformer generation.\nPlease check the SMILES string/file."
+        return None, parser_error_check, error_message
+    if results_directory == "":
+        results_directory = sub(r"\.sdf$|\.smi$", "", structure)
+
+    # Check conformer generation settings
+
+    number_of_confs = settings["RDKit number of conformers"]
+    number_of_threads = settings["RDKit threads"]
+    if not number_of_confs.isdigit() or int(number_of_confs) < 1:
+        parser_error_check = "Error detected"
+        error_message = "Number of conformers to generate must be a positive whole number."
+        return None, parser_error_check, error_message
+    if not number_of_threads.isdigit():
+        parser_error_check = "Error detected"
+        error_message = "Number of threads must be a whole number (0 uses all available CPU cores)."
+        return None, parser_error_check, error_message
+    if settings["Check for dup confs in XYZ/SDF files"] is True:
+        parser_error_check, error_message = redundant_conformer_settings_checker(settings)
+        if parser_error_check == "Error detected":
+            return None, parser_error_check, error_message
+
+    # Embed conformers with ETKDG (multithreaded)
+
+    mol = Chem.AddHs(mol, addCoords=True)
+    params = rdDistGeom.ETKDGv3()
+    params.randomSeed = 0xF00D  # For reproducible conformer ensembles
+    params.numThreads = int(number_of_threads)
+    conf_ids = list(rdDistGeom.EmbedMultipleConfs(mol, int(number_of_confs), params))
+    if not conf_ids:
+        parser_error_check = "Error detected"
+        error_message = "RDKit was unable to embed any conformers for this structure."
+        return None, parser_error_check, error_message
+
+    # Optimise conformers with MMFF (multithreaded), then order conformers by MMFF energy, so that the lowest-energy
+    # conformer of any redundant pair is kept. Conformers whose optimisation didn't converge aren't minima, so these
+    # are excluded
+
+    unconverged_conformers = 0
+    if settings["RDKit MMFF optimisation"] is True and rdForceFieldHelpers.MMFFHasAllMoleculeParams(mol):
+        results = rdForceFieldHelpers.MMFFOptimizeMoleculeConfs(mol, numThreads=int(number_of_threads), maxIters=2000)
+        converged_confs = [
+            (energy, conf_id) for (not_converged, energy), conf_id in zip(results, conf_ids) if not_converged == 0
+        ]
+        unconverged_conformers = len(conf_ids) - len(converged_confs)
+        if not converged_confs:
+            parser_error_check = "Error detected"
+            error_message = (
+                "MMFF optimisation did not converge for any generated conformer.\nTry turning off MMFF "
+                "optimisation."
+            )
+            return None, parser_error_check, error_message
+        conf_ids = [conf_id for energy, conf_id in sorted(converged_confs)]
+
+    # Extract conformer geometries as arrays
+
+    atom_elements = [atom.GetSymbol() for atom in mol.GetAtoms()]
+    elements = []
+    x_coords = []
+    y_coords = []
+    z_coords = []
+    for conf_id in conf_ids:
+        positions = mol.GetConformer(conf_id).GetPositions()
+        elements.append(list(atom_elements))
+        x_coords.append(positions[:, 0])
+        y_coords.append(positions[:, 1])
+        z_coords.append(positions[:, 2])
+
+    # Check for redundant conformers (purely based on Cartesian coordinates, energies not considered).
+
+    if settings["Check for dup confs in XYZ/SDF files"] is True:
+        (
+            elements,
+            x_coords,
+            y_coords,
+            z_coords,
+            duplicate_clusters,
+            duplicate_conformers,
+            mad_pair_statistics,
+        ) = duplicate_conformer_remover(elements, x_coords, y_coords, z_coords, settings)
+        elements, x_coords, y_coords, z_coords = library_duplicate_remover(
+            elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, conformer_library_folder
+        )
+        duplicate_conformers = duplicate_conformer_summary(duplicate_clusters)
+        parser_error_check, error_message, elements, x_coords, y_coords, z_coords = representative_conformer_selector(
+            elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, results_directory
+        )
+        if parser_error_check == "Error detected":
+            return None, parser_error_check, error_message
+        return (
+            GeometryEnsemble(
+                elements,
+                x_coords,
+                y_coords,
+                z_coords,
+                results_directory,
+                duplicate_clusters,
+                duplicate_conformers,
+                mad_pair_statistics,
+                unconverged_conformers,
+            ),
+            parser_error_check,
+            error_message,
+        )
+    return (
+        GeometryEnsemble(
+            elements, x_coords, y_coords, z_coords, results_directory, unconverged_conformers=unconverged_conformers
+        ),
+        parser_error_check,
+        error_message,
+    )
@@ -3,109 +3,302 @@
 # Import modules
 
 
-from math import exp
-from rdkit.Chem import MolFromXYZBlock, rdMolTransforms  # Version 2025.9.3
+from bisect import bisect_right
+from dataclasses import replace
+from re import fullmatch
 import numpy as np  # Version 2.2.6
-from scipy.optimize import linear_sum_assignment  # Version 1.15.3
-from scipy.spatial import distance as scipy_distance
+from conformer_comparison import (
+    mad_atom_subset,
+    symmetry_permutation_store,
+    aligned_geometry_store,
+    mad_lower_bound_store,
+    geometry_hash_duplicate_finder,
+    geometry_content_hashes,
+    mad_cache_opener,
+    mad_cache_lookup,
+    mad_cache_updater,
+    mad_cache_mode,
+    symmetry_mad_cache_mode,
+    pair_mad_lower_bounds,
+    torsion_fingerprint_store,
+    pair_torsion_differences,
+    duplicate_pair_mad_calculator,
+    ordinal_conformer_number,
+    duplicate_cluster_store,
+    conformer_cluster_root,
+    duplicate_cluster_merger,
+    kept_conformer_numbers,
+    duplicate_conformer_summary,
+)
+from conformer_ensemble import spectroscopic_properties, uncertainty_percentiles, EnsembleAnalysis
+from thermochemistry import quasi_rrho_free_energy_corrections
+
+
+def analyse(ensemble, settings, mad_cache_path=""):
+    """Analyses a ConformerEnsemble parsed from output files. Finds and excludes erroneous and redundant conformers,
+    orders the kept conformers by increasing energy (e.g. for supplementary information in a .docx file) and
+    calculates Boltzmann-weighted averaged spectroscopic data. Returns an EnsembleAnalysis.
+    If a MAD cache file path is given, MADs of conformer pairs are reused from (and saved for) other runs.
+    The analysis runs in stages (conformer_deduplicator, boltzmann_analyser, then chemical_shift_scaler), so that
+    later stages can be rerun on their own when only their settings change."""
+
+    deduplicated_data, data_analysis_error_check, error_message = conformer_deduplicator(
+        ensemble, settings, mad_cache_path
+    )
+    if data_analysis_error_check == "Error detected":
+        return None, data_analysis_error_check, error_message
+    return boltzmann_analyser(deduplicated_data, settings)
 
 
-def analyse(parsed_data, settings):
-    """Analyses parsed data from output files. Finds and excludes erroneous conformers and arranges data in a convenient
-    format for writing to new files (e.g. supplementary information in a .docx file, where conformer data is arranged
-    in order of increasing conformer energy). Also calculates Boltzmann-weighted averaged spectroscopic data."""
+def conformer_deduplicator(ensemble, settings, mad_cache_path=""):
+    """First stage of analyse: finds and excludes conformers with imaginary frequencies, implausible geometries, and
+    redundant conformers. If selected, Gibbs free energies are recomputed at the set temperature first (quasi-RRHO).
+    Returns an EnsembleAnalysis of the kept conformers (in order of appearance) without relative energies or
+    Boltzmann-averaged data."""
 
     # Define input data
 
-    energies = parsed_data[0]
-    element_list = parsed_data[1]
-    x_cartesian_coords_list = parsed_data[2]
-    y_cartesian_coords_list = parsed_data[3]
-    z_cartesian_coords_list = parsed_data[4]
-    wavelength_list = parsed_data[5]
-    rotatory_strength_list = parsed_data[6]
-    shielding_tensors = parsed_data[7]
-    frequencies_list = parsed_data[8]
-    sp_functional_and_basis_set = parsed_data[10]
-    sp_solvent = parsed_data[11]
-    sp_dispersion = parsed_data[12]
-    opt_freq_functional_and_basis_set = parsed_data[13]
-    opt_freq_solvent = parsed_data[14]
-    opt_freq_dispersion = parsed_data[15]
-    nmr_functional_and_basis_set = parsed_data[16]
-    nmr_solvent = parsed_data[17]
-    nmr_dispersion = parsed_data[18]
-    tddft_functional_and_basis_set = parsed_data[19]
-    tddft_solvent = parsed_data[20]
-    tddft_dispersion = parsed_data[21]
-    results_directory = parsed_data[23]
-    oscillator_strength_list = parsed_data[24]
-    list_of_conformer_suffixes = parsed_data[25]
-    frequency_rotatory_strengths = parsed_data[29]
-    optrot_wavelengths = parsed_data[30]
-    optrot_strengths = parsed_data[31]
-    frequency_dipole_strengths = parsed_data[32]
-    or_functional_and_basis_set = parsed_data[33]
-    or_solvent = parsed_data[34]
-    or_dispersion = parsed_data[35]
-    ir_intensities_list = parsed_data[36]
-    chk_conf_suffixes = parsed_data[37]
-    calc_software = parsed_data[39]
-
     energy_threshold = float(settings["Energy cutoff (kcal/mol)"])
     mad_threshold = float(settings["MAD cutoff (A)"])
-    c_slope = settings["C slope"]
-    c_intercept = settings["C intercept"]
-    h_slope = settings["H slope"]
-    h_intercept = settings["H intercept"]
+    hash_tolerance = float(settings["Geometry hash tolerance (A)"])
     temperature = float(settings["Temperature (K)"])
 
+    # Define variables
+
+    data_analysis_error_check = "No error detected"
+
+    # Remove conformers with imaginary frequency/ies or implausible geometries (atom clashes, broken bonds), if present
+
+    imaginary_frequencies = np.nanmin(ensemble.frequencies, axis=1) < 0
+    geometry_issues = ensemble.implausible_geometries & ~imaginary_frequencies
+    number_imag_freq_confs_removed = int(imaginary_frequencies.sum())
+    geometry_issue_removals = int(geometry_issues.sum())
+    ensemble = ensemble.subset(~(imaginary_frequencies | geometry_issues))
+
+    # Check confs have same number of frequencies and IR intensities after removing confs with imaginary frequencies
+
+    if len(np.unique(ensemble.value_counts["frequencies"])) > 1:
+        data_analysis_error_check = "Error detected"
+        error_message = "Inconsistent number of vibrational frequencies found\nfor conformers in file(s)."
+        return None, data_analysis_error_check, error_message
+    if len(np.unique(ensemble.value_counts["ir_intensities"])) > 1:
+        data_analysis_error_check = "Error detected"
+        error_message = "Inconsistent number of IR intensities found for conformers in file(s)."
+        return None, data_analysis_error_check, error_message
+    # If selected, recompute Gibbs free energies at the set temperature from the electronic energies, geometries and
+    # vibrational frequencies (quasi-RRHO thermochemistry), instead of using those calculated at the temperature of the
+    # frequency calculations
+
+    if settings["Boltz energy type"] == "Quasi-RRHO free energy":
+        free_energy_corrections = quasi_rrho_free_energy_corrections(
+            ensemble.elements, ensemble.coordinates, ensemble.frequencies, [temperature]
+        )[0]
+        ensemble = replace(
+            ensemble, electronic_energies=ensemble.energies, energies=ensemble.energies + free_energy_corrections
+        )
+    energies = ensemble.energies.tolist()
+    element_list = ensemble.element_lists()
+    x_cartesian_coords_list = ensemble.coordinates[:, :, 0]
+    y_cartesian_coords_list = ensemble.coordinates[:, :, 1]
+    z_cartesian_coords_list = ensemble.coordinates[:, :, 2]
+    list_of_conformer_suffixes = ensemble.conformer_suffixes.tolist()
+    # Find pairs of conformers with similar or identical energies. Conformers are sorted by energy once, then a window
+    # of width equal to the energy threshold is swept along the sorted energies to find candidate pairs.
+
+    energy_threshold = energy_threshold / 627.5094740631  # Convert energy threshold from kcal/mol to hartrees
+    number_of_confs = len(energies)
+    number_of_compared_pairs = 0
+    number_of_pruned_pairs = 0
+    if list_of_conformer_suffixes:
+        duplicate_clusters = duplicate_cluster_store(list_of_conformer_suffixes)
+    else:
+        duplicate_clusters = duplicate_cluster_store(
+            [ordinal_conformer_number(conf_number + 1) for conf_number in range(number_of_confs)]
+        )
+    if settings["Skip excluding duplicate conformers from input files made from output files"] is False:
+        # Align each conformer once (using only the atoms chosen for MAD calculations), and store its atom coordinates
+        # by element for MAD calculations
+
+        mad_elements, mad_x_coords, mad_y_coords, mad_z_coords = mad_atom_subset(
+            element_list, x_cartesian_coords_list, y_cartesian_coords_list, z_cartesian_coords_list, settings
+        )
+        aligned_geometries = aligned_geometry_store(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+        lower_bound_descriptors = mad_lower_bound_store(mad_elements, aligned_geometries)
+        symmetry_permutations = None
+        cache_mode = mad_cache_mode
+        if settings["MAD atom mapping"] == "By bonding symmetry":
+            symmetry_permutations = symmetry_permutation_store(
+                element_list, x_cartesian_coords_list, y_cartesian_coords_list, z_cartesian_coords_list, settings
+            )
+        if symmetry_permutations is not None:
+            cache_mode = symmetry_mad_cache_mode
+
+        # Remove exact and near-exact duplicates (e.g. from restarted calculations) first with a geometry hash, so
+        # these don't need MAD calculations
+
+        for conf_number_a, conf_number_b, maximum_atom_deviation in geometry_hash_duplicate_finder(
+            aligned_geometries, hash_tolerance, mad_threshold, energies, energy_threshold
+        ):
+            duplicate_cluster_merger(
+                duplicate_clusters,
+                conf_number_a,
+                conf_number_b,
+                maximum_atom_deviation,
+                (energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631,
+                "geometry hash",
+            )
+        early_exit_mad_threshold = None  # Exact MADs are only needed for the redundant conformer .txt file
+        if settings["Duplicate conformer details"] is False:
+            early_exit_mad_threshold = mad_threshold
+        energy_order = sorted(range(number_of_confs), key=lambda conf_number: energies[conf_number])
+        sorted_energies = [energies[conf_number] for conf_number in energy_order]
+        candidate_pairs = []
+        for position, conf_number in enumerate(energy_order):
+            window_end = bisect_right(sorted_energies, sorted_energies[position] + energy_threshold, lo=position + 1)
+            for other_conf_number in energy_order[position + 1:window_end]:
+                if abs(energies[conf_number] - energies[other_conf_number]) < energy_threshold:
+                    candidate_pairs.append((min(conf_number, other_conf_number), max(conf_number, other_conf_number)))
+        candidate_pairs.sort()  # Compare pairs in order of appearance, so that the first conformer of a pair is kept
+
+        # If conformers are compared by rotatable torsions, only pairs with similar torsion fingerprints can be
+        # duplicates (confirmed by MAD calculations if chosen)
+
+        torsion_angles = None
+        if settings["Redundant conformer comparison"] == "Torsion fingerprint":
+            torsion_angles = torsion_fingerprint_store(
+                element_list, x_cartesian_coords_list, y_cartesian_coords_list, z_cartesian_coords_list
+            )
+        if torsion_angles is not None:
+            candidate_torsion_differences = pair_torsion_differences(torsion_angles, candidate_pairs)
+        else:
+            candidate_torsion_differences = [0.0] * len(candidate_pairs)
+        torsion_threshold = float(settings["Torsion cutoff (degrees)"])
+        confirm_torsion_duplicates = torsion_angles is None or settings["Confirm torsion duplicates with MAD"] is True
+
+        # Open the MAD cache, so that MADs calculated in previous runs (e.g. with different thresholds) can be reused
+
+        mad_cache = None
+        if (
+            mad_cache_path
+            and settings["Reuse MADs from previous runs"] is True
+            and candidate_pairs
+            and confirm_torsion_duplicates
+        ):
+            mad_cache = mad_cache_opener(mad_cache_path)
+        if mad_cache is not None:
+            geometry_hashes = geometry_content_hashes(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+        new_mads = []
+        reused_mads = []
+
+        candidate_lower_bounds = pair_mad_lower_bounds(
+            lower_bound_descriptors, candidate_pairs, symmetry_permutations is not None
+        )
+        for (conf_number_a, conf_number_b), lower_bound, torsion_difference in zip(
+            candidate_pairs, candidate_lower_bounds, candidate_torsion_differences
+        ):
+            if (
+                conformer_cluster_root(duplicate_clusters, conf_number_a) != conf_number_a
+                or conformer_cluster_root(duplicate_clusters, conf_number_b) != conf_number_b
+            ):  # One of these conformers has already been found to be a duplicate
+                continue
+            if torsion_angles is not None and torsion_difference >= torsion_threshold:
+                continue  # Torsion angles differ, so these conformers are different
+            if not confirm_torsion_duplicates:
+                duplicate_cluster_merger(
+                    duplicate_clusters,
+                    conf_number_a,
+                    conf_number_b,
+                    float(torsion_difference),
+                    (energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631,
+                    "torsion fingerprint",
+                )
+                continue
+            number_of_compared_pairs += 1
+            if lower_bound >= mad_threshold:  # Conformers are certainly different, so skip the MAD calculation
+                number_of_pruned_pairs += 1
+                continue
+            maximum_atom_deviation = None
+            duplicate_check_stage = "MAD cache (previous run)"
+            if mad_cache is not None:
+                cached_mad = mad_cache_lookup(
+                    mad_cache, geometry_hashes[conf_number_a], geometry_hashes[conf_number_b], cache_mode
+                )
+                # MADs from calculations that stopped early are only reused if no exact MAD is needed
+
+                if cached_mad is not None and (
+                    cached_mad[1] or (cached_mad[0] < mad_threshold and early_exit_mad_threshold is not None)
+                ):
+                    maximum_atom_deviation = cached_mad[0]
+                    reused_mads.append((geometry_hashes[conf_number_a], geometry_hashes[conf_number_b]))
+            if maximum_atom_deviation is None:
+                maximum_atom_deviation, duplicate_check_stage = duplicate_pair_mad_calculator(
+                    aligned_geometries[conf_number_a],
+                    aligned_geometries[conf_number_b],
+                    mad_threshold,
+                    early_exit_mad_threshold,
+                    symmetry_permutations,
+                )
+                if mad_cache is not None:  # MADs below the threshold from early exits may be above the exact MAD
+                    new_mads.append(
+                        (
+                            geometry_hashes[conf_number_a],
+                            geometry_hashes[conf_number_b],
+                            maximum_atom_deviation,
+                            early_exit_mad_threshold is None or maximum_atom_deviation >= mad_threshold,
+                        )
+                    )
+            if maximum_atom_deviation < mad_threshold:
+                # Record which conformer(s) were duplicates, by their original conformer numbers
+
+                duplicate_cluster_merger(
+                    duplicate_clusters,
+                    conf_number_a,
+                    conf_number_b,
+                    maximum_atom_deviation,
+                    (energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631,
+                    duplicate_check_stage,
+                )
+        if mad_cache is not None:
+            mad_cache_updater(mad_cache, new_mads, reused_mads, cache_mode)
+
+    # Remove duplicate conformers from data
+
+    ensemble = ensemble.subset(kept_conformer_numbers(duplicate_clusters))
+    mad_pair_statistics = [number_of_compared_pairs, number_of_pruned_pairs]
+    duplicate_conformers = duplicate_conformer_summary(duplicate_clusters)
+    deduplicated_data = EnsembleAnalysis(
+        ensemble=ensemble,
+        boltzmann_averages={},
+        c_nmr=[],
+        h_nmr=[],
+        duplicate_clusters=duplicate_clusters,
+        duplicate_conformers=duplicate_conformers,
+        mad_pair_statistics=mad_pair_statistics,
+        imaginary_frequency_removals=number_imag_freq_confs_removed,
+        geometry_issue_removals=geometry_issue_removals,
+    )
+    return deduplicated_data, data_analysis_error_check, ""
+
+
+def boltzmann_analyser(deduplicated_data, settings):
+    """Second stage of analyse: finds relative energies and Boltzmann weights of the kept conformers from
+    conformer_deduplicator, Boltzmann-averages spectroscopic data (and, if selected, finds the temperature sweep,
+    energy uncertainty and energy sensitivity results), orders conformers by increasing energy, then scales chemical
+    shifts with chemical_shift_scaler. Returns an EnsembleAnalysis."""
+
+    # Define input data
+
+    ensemble = deduplicated_data.ensemble
+    temperature = float(settings["Temperature (K)"])
+    sweep_temperatures = np.array(sweep_temperature_list(settings["Temperature sweep (K)"]) or [], dtype=np.float64)
+
     # Define new lists
 
-    ordered_energies = []
-    ordered_relative_energies = []
-    ordered_boltz_weights = []
-    ordered_population_contributions = []
-    ordered_element_list = []
-    ordered_x_cartesian_coords_list = []
-    ordered_y_cartesian_coords_list = []
-    ordered_z_cartesian_coords_list = []
-    ordered_frequencies_list = []
-    ordered_ir_intensities_list = []
-    ordered_frequency_rotatory_strengths_list = []
-    ordered_frequency_dipole_strengths_list = []
-    ordered_optrot_list = []
-    ordered_optrot_wavelengths_list = []
-    ordered_wavelength_list = []
-    ordered_rotatory_strengths = []
-    ordered_oscillator_strengths = []
-    ordered_shielding_tensors = []
-    duplicate_conformers = []
-    dup_conf_numbers = []
-    duplicate_conf_details = []
-    relative_energies = []
-    population_contributions = []
-    boltz_weights = []
-    boltz_c_tensors = []
-    boltz_h_tensors = []
-    boltz_shielding_tensors = []
-    shielding_tensor_components = []
-    frequency_components = []
-    ir_intensity_components = []
-    boltz_frequencies = []
-    boltz_ir_intensities = []
-    wavelength_components = []
-    boltz_wavelengths = []
-    rotatory_strength_components = []
-    boltz_rotatory_strengths = []
-    oscillator_strength_components = []
-    boltz_oscillator_strengths = []
-    frequency_rotatory_strength_components = []
-    boltz_frequency_rotatory_strengths = []
-    frequency_dipole_strength_components = []
-    boltz_frequency_dipole_strengths = []
-    optrot_strength_components = []
-    boltz_optrot_strengths = []
+    sweep_boltz_weights = np.empty((0, 0))
+    sweep_relative_energies = np.empty((0, 0))
+    energy_uncertainty = {}
+    energy_sensitivity = {}
+    sweep_boltzmann_averages = {}
 
     # Define variables
 
@@ -121,663 +314,410 @@ def analyse(parsed_data, settings):
         boltz_constant = boltz_constant_kJmol
     elif settings["Relative energy unit"] == "kcal/mol":
         boltz_constant = boltz_constant_kcalmol
-    # Remove conformers with imaginary frequency/ies, if present
-
-    removals = 0
-    for index in range(len(frequencies_list)):
-        index = index - removals
-        if min(frequencies_list[index]) < 0:
-            # Remove non-converged conformer from data
-
-            del energies[index]
-            del element_list[index]
-            del frequencies_list[index]
-            del ir_intensities_list[index]
-            del x_cartesian_coords_list[index]
-            del y_cartesian_coords_list[index]
-            del z_cartesian_coords_list[index]
-            if list_of_conformer_suffixes:
-                del list_of_conformer_suffixes[index]
-            if chk_conf_suffixes:
-                del chk_conf_suffixes[index]
-            if wavelength_list:
-                del wavelength_list[index]
-                del rotatory_strength_list[index]
-                del oscillator_strength_list[index]
-            if shielding_tensors:
-                del shielding_tensors[index]
-            if frequency_rotatory_strengths:
-                del frequency_rotatory_strengths[index]
-                del frequency_dipole_strengths[index]
-            if optrot_wavelengths:
-                del optrot_strengths[index]
-                del optrot_wavelengths[index]
-            removals += 1  # This is because indices of remaining conformers are now reduced by 1, by removing the
-            # last conformer
-    number_imag_freq_confs_removed = removals
-
-    # Check confs have same number of frequencies and IR intensities after removing confs with imaginary frequencies
+    # Find relative energies of conformers in kJ/mol
 
-    for conf in frequencies_list:
-        a = len(frequencies_list[0])
-        if len(conf) != a:
-            data_analysis_error_check = "Error detected"
-            error_message = "Inconsistent number of vibrational frequencies found\nfor conformers in file(s)."
-            return (
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                data_analysis_error_check,
-                error_message,
+    if settings["Relative energy unit"] == "kcal/mol":
+        hartree_to_energy_unit = hartree_to_kcalmol
+    elif settings["Relative energy unit"] == "kJ/mol":
+        hartree_to_energy_unit = hartree_to_kJmol
+    relative_energies = (ensemble.energies - ensemble.energies.min()) * hartree_to_energy_unit
+    # Find Boltzmann-weighted population contributions of each conformer as a proportion, then calculate
+    # Boltzmann-averaged spectroscopic properties (frequencies, IR intensities, and if present, excited state
+    # wavelengths and rotatory/oscillator strengths, shielding tensors, VCD and optical rotation strengths).
+
+    boltz_weights = boltzmann_weight_calculator(relative_energies, boltz_constant * temperature)
+    ensemble = replace(ensemble, relative_energies=relative_energies, boltzmann_weights=boltz_weights)
+    boltzmann_averages = boltzmann_averager(ensemble, boltz_weights)
+
+    # If a temperature sweep is selected, find Boltzmann weights at every sweep temperature at once (one row per
+    # temperature), then Boltzmann-average each property at every temperature with one matrix product. Recomputed
+    # Gibbs free energies (quasi-RRHO) are found at every sweep temperature too.
+
+    if len(sweep_temperatures):
+        if settings["Boltz energy type"] == "Quasi-RRHO free energy":
+            sweep_energies = ensemble.electronic_energies + quasi_rrho_free_energy_corrections(
+                ensemble.elements, ensemble.coordinates, ensemble.frequencies, sweep_temperatures
             )
-    for conf in ir_intensities_list:
-        a = len(ir_intensities_list[0])
-        if len(conf) != a:
+        else:
+            sweep_energies = np.tile(ensemble.energies, (len(sweep_temperatures), 1))
+        sweep_relative_energies = (sweep_energies - sweep_energies.min(axis=1, keepdims=True)) * hartree_to_energy_unit
+        sweep_boltz_weights = boltzmann_weight_calculator(
+            sweep_relative_energies, boltz_constant * sweep_temperatures[:, np.newaxis]
+        )
+        sweep_boltzmann_averages = boltzmann_averager(ensemble, sweep_boltz_weights)
+    # If selected, estimate the uncertainty of Boltzmann-averaged data caused by errors in conformer energies (Monte
+    # Carlo sampling of energy errors, in kcal/mol)
+
+    if int(settings["Energy uncertainty samples"]) > 0:
+        energy_uncertainty_unit = float(settings["Energy uncertainty (kcal/mol)"])
+        if settings["Relative energy unit"] == "kJ/mol":
+            energy_uncertainty_unit *= 4.184
+        energy_uncertainty = energy_uncertainty_sampler(
+            ensemble,
+            relative_energies,
+            boltz_constant * temperature,
+            energy_uncertainty_unit,
+            int(settings["Energy uncertainty samples"]),
+            settings["Energy uncertainty distribution"],
+            float(settings["Energy uncertainty memory budget (MB)"]) * 1e6,
+        )
+        if energy_uncertainty is None:
             data_analysis_error_check = "Error detected"
-            error_message = "Inconsistent number of IR intensities found for conformers in file(s)."
-            return (
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                "",
-                data_analysis_error_check,
-                error_message,
+            error_message = (
+                "The energy uncertainty samples need more memory than the memory budget setting.\nTry fewer "
+                "samples or a larger memory budget."
             )
-    # Define function for building XYZ file format strings for a given conformer number, then creating an RDKit molecule
-
-    def RDKitMoleculeMaker(conformer_number):
-        """Function for building XYZ file format strings for a given conformer number,
-        then creating an RDKit molecule."""
-        xyz_block = ""
-        for i in range(-2, len(element_list[conformer_number])):
-            if i == -2:
-                xyz_block += str(len(element_list[conformer_number]))
-            elif i == -1:
-                xyz_block += "\nMolecule"
-            elif i > -1:
-                if float(x_cartesian_coords_list[conformer_number][i]) >= 0:
-                    x = "      " + str(x_cartesian_coords_list[conformer_number][i])
-                else:
-                    x = "     " + str(x_cartesian_coords_list[conformer_number][i])
-                if float(y_cartesian_coords_list[conformer_number][i]) >= 0:
-                    y = "      " + str(y_cartesian_coords_list[conformer_number][i])
-                else:
-                    y = "     " + str(y_cartesian_coords_list[conformer_number][i])
-                if float(z_cartesian_coords_list[conformer_number][i]) >= 0:
-                    z = "      " + str(z_cartesian_coords_list[conformer_number][i])
-                else:
-                    z = "     " + str(z_cartesian_coords_list[conformer_number][i])
-                x += "0" * abs(18 - len(x))
-                y += "0" * abs(18 - len(y))
-                z += "0" * abs(18 - len(z))
-                xyz_block += "\n  " + str(element_list[conformer_number][i]) + x + y + z
-        mol = MolFromXYZBlock(xyz_block)
-        return mol
-
-    # Define function for finding optimal atom mapping for aligned conformers, using the Hungarian algorithm
-
-
-    def maximum_atom_deviation_calculator(conf_a, conf_b):
-        """Function to find the maximum atom deviation between two conformers.
-        1) Aligns conformers by principal coordinates, based on their moments of inertia.
-        2) Finds optimal atom mapping (lowest atom deviations) for two aligned conformers
-        (considering all 8 axis reflections), using the Hungarian algorithm.
-        3) Returns the maximum atom deviation for this optimal atom mapping."""
-        # Align conformers by principal coordinates, based on their moments of inertia
-
-        mol_a = RDKitMoleculeMaker(conf_number_a)
-        mol_b = RDKitMoleculeMaker(conf_number_b)
-        rdMolTransforms.CanonicalizeMol(mol_a)
-        rdMolTransforms.CanonicalizeMol(mol_b)
-
-        # Construct a list of lists of atom coordinates for conformer A - one list per element.
-
-        unique_elements = set(atom.GetSymbol() for atom in mol_a.GetAtoms())
-        mol_a_all_element_coords_list = []
-        for element in unique_elements:
-            element_coords_list = []
-            for l, atom in enumerate(mol_a.GetAtoms()):
-                position = mol_a.GetConformer().GetAtomPosition(l)
-                if atom.GetSymbol() == element:
-                    element_coords_list.append([position.x, position.y, position.z])
-            mol_a_all_element_coords_list.append(element_coords_list)
-
-        # Calculate atomic distances between aligned geometries using Hungarian algorithm, considering axis reflections
-
-        all_mads = []
-        for i in range(1, -2, -2):
-            for j in range(1, -2, -2):
-                for k in range(1, -2, -2):
-                    aligned_conformer_atom_deviations = []
-                    for x, element in enumerate(unique_elements):
-                        mol_b_coords_list = []
-                        for l, atom in enumerate(mol_b.GetAtoms()):
-                            position = mol_b.GetConformer().GetAtomPosition(l)
-                            if atom.GetSymbol() == element:
-                                mol_b_coords_list.append([(position.x * i), (position.y * j), (position.z * k)])
-                        mol_a_coords_array = np.array(mol_a_all_element_coords_list[x])
-                        mol_b_coords_array = np.array(mol_b_coords_list)
-                        distance_matrix = scipy_distance.cdist(mol_a_coords_array, mol_b_coords_array, 'euclidean')
-                        row_ind, col_ind = linear_sum_assignment(distance_matrix)
-                        atom_deviations = distance_matrix[row_ind, col_ind]
-                        aligned_conformer_atom_deviations.extend(atom_deviations.tolist())
-                    all_mads.append(max(aligned_conformer_atom_deviations))
-        return min(all_mads)
-
-    # Find pairs of conformers with similar or identical energies
+            return None, data_analysis_error_check, error_message
+    # Order conformers by ascending energy (conformers with identical energies stay in order of appearance)
+
+    energy_order = np.argsort(ensemble.energies, kind="stable")
+    ensemble = ensemble.subset(energy_order)
+    if len(sweep_temperatures):
+        sweep_boltz_weights = sweep_boltz_weights[:, energy_order]
+        sweep_relative_energies = sweep_relative_energies[:, energy_order]
+    # If selected, find the sensitivity of Boltzmann-averaged data to each conformer's relative energy
+
+    if settings["Energy sensitivity files"] is True:
+        energy_sensitivity = energy_sensitivity_calculator(ensemble, boltzmann_averages, boltz_constant * temperature)
+    analysed_data = replace(
+        deduplicated_data,
+        ensemble=ensemble,
+        boltzmann_averages=boltzmann_averages,
+        sweep_temperatures=sweep_temperatures,
+        sweep_boltzmann_weights=sweep_boltz_weights,
+        sweep_relative_energies=sweep_relative_energies,
+        sweep_boltzmann_averages=sweep_boltzmann_averages,
+        energy_uncertainty=energy_uncertainty,
+        energy_sensitivity=energy_sensitivity,
+    )
+    return chemical_shift_scaler(analysed_data, settings), data_analysis_error_check, ""
 
-    energy_threshold = energy_threshold / 627.5094740631  # Convert energy threshold from kcal/mol to hartrees
-    number_of_confs = len(energies)
-    if settings["Skip excluding duplicate conformers from input files made from output files"] is False:
-        for conf_number_a, energy_a in enumerate(energies):
-            removals = 0
-            for conf_number_b in range(number_of_confs):
-                conf_number_b = conf_number_b - removals
-                if conf_number_b + 1 > len(energies):
-                    break
-                if conf_number_a < conf_number_b:
-                    if abs(energy_a - energies[conf_number_b]) < energy_threshold:
-                        maximum_atom_deviation = maximum_atom_deviation_calculator(conf_number_a, conf_number_b)
-                        if maximum_atom_deviation < mad_threshold:
-                            # Record which conformer(s) were duplicates
-
-                            if list_of_conformer_suffixes:
-                                dup_conf_name = list_of_conformer_suffixes[conf_number_b]
-                                duplicate_conformers.append(dup_conf_name)
-                                duplicated_conf_name = list_of_conformer_suffixes[conf_number_a]
-                            else:
-                                restart_loop = True  # Count the number of removed confs with lower conf numbers
-                                new_dup_conf_number = conf_number_b + 1
-                                y = []
-                                while restart_loop is True:
-                                    x = 0
-                                    for number in dup_conf_numbers:
-                                        if number not in y and number <= new_dup_conf_number:
-                                            y.append(number)
-                                            new_dup_conf_number += 1
-                                            x += 1
-                                            restart_loop = True
-                                            break
-                                    if x == 0:
-                                        restart_loop = False
-                                restart_loop = True  # Count the number of removed confs with lower conf numbers
-                                new_duplicated_conf_number = conf_number_a + 1
-                                y = []
-                                while restart_loop is True:
-                                    x = 0
-                                    for number in dup_conf_numbers:
-                                        if number not in y and number <= new_duplicated_conf_number:
-                                            y.append(number)
-                                            new_duplicated_conf_number += 1
-                                            x += 1
-                                            restart_loop = True
-                                            break
-                                    if x == 0:
-                                        restart_loop = False
-                                dup_conf_name = new_dup_conf_number
-                                dup_conf_numbers.append(dup_conf_name)
-                                duplicated_conf_name = new_duplicated_conf_number
-                                if str(dup_conf_name).endswith("1") and not str(dup_conf_name).endswith("11"):
-                                    dup_conf_name = str(dup_conf_name) + "st"
-                                elif str(dup_conf_name).endswith("2") and not str(dup_conf_name).endswith("12"):
-                                    dup_conf_name = str(dup_conf_name) + "nd"
-                                elif str(dup_conf_name).endswith("3") and not str(dup_conf_name).endswith("13"):
-                                    dup_conf_name = str(dup_conf_name) + "rd"
-                                else:
-                                    dup_conf_name = str(dup_conf_name) + "th"
-                                if str(duplicated_conf_name).endswith("1") and not str(duplicated_conf_name).endswith(
-                                    "11"
-                                ):
-                                    duplicated_conf_name = str(duplicated_conf_name) + "st"
-                                elif str(duplicated_conf_name).endswith("2") and not str(duplicated_conf_name).endswith(
-                                    "12"
-                                ):
-                                    duplicated_conf_name = str(duplicated_conf_name) + "nd"
-                                elif str(duplicated_conf_name).endswith("3") and not str(duplicated_conf_name).endswith(
-                                    "13"
-                                ):
-                                    duplicated_conf_name = str(duplicated_conf_name) + "rd"
-                                else:
-                                    duplicated_conf_name = str(duplicated_conf_name) + "th"
-                                duplicate_conformers.append(dup_conf_name)
-                            if settings["Duplicate conformer details"] is True:
-                                if list_of_conformer_suffixes:
-                                    if settings["Boltz energy type"] == "Gibbs free energy":
-                                        dup_conf_text = (
-                                            str(dup_conf_name)
-                                            + " is a duplicate of "
-                                            + str(duplicated_conf_name)
-                                            + ":\nΔG = "
-                                            + str((energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631)
-                                            + " kcal/mol\nMAD = "
-                                            + str(maximum_atom_deviation)
-                                            + " angstroms\n"
-                                        )
-                                    else:
-                                        dup_conf_text = (
-                                                str(dup_conf_name)
-                                                + " is a duplicate of "
-                                                + str(duplicated_conf_name)
-                                                + ":\nΔE = "
-                                                + str(
-                                            (energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631)
-                                                + " kcal/mol\nMAD = "
-                                                + str(maximum_atom_deviation)
-                                                + " angstroms\n"
-                                        )
-                                else:
-                                    if settings["Boltz energy type"] == "Gibbs free energy":
-                                        dup_conf_text = (
-                                            str(dup_conf_name)
-                                            + " conformer is a duplicate of "
-                                            + str(duplicated_conf_name)
-                                            + " conformer:\nΔG = "
-                                            + str((energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631)
-                                            + " kcal/mol\nMAD = "
-                                            + str(maximum_atom_deviation)
-                                            + " angstroms\n"
-                                        )
-                                    else:
-                                        dup_conf_text = (
-                                                str(dup_conf_name)
-                                                + " conformer is a duplicate of "
-                                                + str(duplicated_conf_name)
-                                                + " conformer:\nΔE = "
-                                                + str(
-                                            (energies[conf_number_a] - energies[conf_number_b]) * 627.5094740631)
-                                                + " kcal/mol\nMAD = "
-                                                + str(maximum_atom_deviation)
-                                                + " angstroms\n"
-                                        )
-                                duplicate_conf_details.append(dup_conf_text)
-                            # Remove duplicate conformer from data
-
-                            del energies[conf_number_b]
-                            del element_list[conf_number_b]
-                            del frequencies_list[conf_number_b]
-                            del ir_intensities_list[conf_number_b]
-                            del x_cartesian_coords_list[conf_number_b]
-                            del y_cartesian_coords_list[conf_number_b]
-                            del z_cartesian_coords_list[conf_number_b]
-                            if list_of_conformer_suffixes:
-                                del list_of_conformer_suffixes[conf_number_b]
-                            if chk_conf_suffixes:
-                                del chk_conf_suffixes[conf_number_b]
-                            if wavelength_list:
-                                del wavelength_list[conf_number_b]
-                                del rotatory_strength_list[conf_number_b]
-                                del oscillator_strength_list[conf_number_b]
-                            if shielding_tensors:
-                                del shielding_tensors[conf_number_b]
-                            if frequency_rotatory_strengths:
-                                del frequency_rotatory_strengths[conf_number_b]
-                                del frequency_dipole_strengths[conf_number_b]
-                            if optrot_wavelengths:
-                                del optrot_strengths[conf_number_b]
-                                del optrot_wavelengths[conf_number_b]
-                            removals += 1  # This is because indices of remaining conformers are now reduced by 1,
-                            # by removing the last conformer
-    a = len(duplicate_conformers)
-    if a > 0:
-        b = ""
-        c = ""
-        for i, dup in enumerate(duplicate_conformers):
-            dup = dup.removesuffix(".out")
-            dup = dup.removesuffix(".log")
-            b += dup
-            if i + 1 != a:
-                b += ", "
-        if a > 1:
-            c = "s"
-        duplicate_conformers = [str(a), b, c]
-    # Find relative energies of conformers in kJ/mol
 
-    contributions_total = 0
-    for conformer_number, conformer in enumerate(energies):
-        if settings["Relative energy unit"] == "kcal/mol":
-            relative_energy = (energies[conformer_number] - min(energies)) * hartree_to_kcalmol
-        elif settings["Relative energy unit"] == "kJ/mol":
-            relative_energy = (energies[conformer_number] - min(energies)) * hartree_to_kJmol
-        if relative_energy == 0:
-            relative_energy = int(relative_energy)
-        relative_energies.insert(conformer_number, relative_energy)
-        # Find Boltzmann-weighted population contributions of each conformer at room temperature
-
-        population_contribution = exp(-1 * relative_energy / (boltz_constant * temperature))
-        population_contributions.append(population_contribution)
-        contributions_total += population_contribution
-    # Calculate these population contributions as a percentage
-
-    for contribution in population_contributions:
-        weighting = contribution / contributions_total
-        boltz_weights.append(weighting)
-    # Calculate Boltzmann-averaged shielding tensors, if shielding tensors are present
-
-    if shielding_tensors:
-        # Calculate the shielding tensor component for each atom of each conformer
-
-        for conformer in range(len(shielding_tensors)):
-            components = []
-            for shielding_tensor in shielding_tensors[conformer]:
-                component = float(shielding_tensor) * boltz_weights[conformer]
-                components.append(component)
-            shielding_tensor_components.append(components)
-        # Add together the shielding tensor components for each atom to produce Boltzmann-averaged shielding tensors
-
-        for atom in range(len(shielding_tensor_components[0])):
-            boltz_shielding_tensor = 0
-            for conformer in range(len(shielding_tensor_components)):
-                boltz_shielding_tensor += shielding_tensor_components[conformer][atom]
-            boltz_shielding_tensors.append(boltz_shielding_tensor)
-        # Pull out carbon and hydrogen shielding tensors into separate lists and calculate chemical shifts if selected
+def chemical_shift_scaler(analysed_data, settings):
+    """Last stage of analyse: pulls out carbon and hydrogen Boltzmann-averaged shielding tensors into rows for the NMR
+    .csv file and, if NMR scaling factors are given, scales these to chemical shifts (also for each sweep temperature,
+    and for energy uncertainty and sensitivity results). Chemical shifts are a linear function of shielding tensors,
+    so this stage is fast to rerun when only the scaling factors change. Returns an EnsembleAnalysis."""
 
-        row = []
-        number_Cs = 0
-        number_Hs = 0
-        for atom in range(len(boltz_shielding_tensors)):
-            if element_list[0][atom] == "C":
-                number_Cs += 1
-                label1 = label2 = "C"
-                label1 += str(atom + 1)
-                row.append(label1)
-                label2 += str(number_Cs)
-                row.append(label2)
-                row.append(str(boltz_shielding_tensors[atom]))
-                if c_slope and c_intercept is not None:
-                    c_slope = float(c_slope)
-                    c_intercept = float(c_intercept)
-                    chemical_shift = (c_intercept - boltz_shielding_tensors[atom]) / -c_slope
-                    row.append(str(chemical_shift))
-                boltz_c_tensors.append(row)
-            elif element_list[0][atom] == "H":
-                number_Hs += 1
-                label1 = label2 = "H"
-                label1 += str(atom + 1)
-                row.append(label1)
-                label2 += str(number_Hs)
-                row.append(label2)
-                row.append(str(boltz_shielding_tensors[atom]))
-                if h_slope and h_intercept is not None:
-                    h_slope = float(h_slope)
-                    h_intercept = float(h_intercept)
-                    chemical_shift = (h_intercept - boltz_shielding_tensors[atom]) / -h_slope
-                    row.append(str(chemical_shift))
-                boltz_h_tensors.append(row)
-            row = []
-    # Calculate Boltzmann-averaged frequencies
-
-    for conformer in range(len(frequencies_list)):
-        components = []
-        for frequency in frequencies_list[conformer]:
-            component = float(frequency) * boltz_weights[conformer]
-            components.append(component)
-        frequency_components.append(components)
-    # Add together the components for each frequency to produce Boltzmann-averaged frequencies
-
-    for frequency in range(len(frequency_components[0])):
-        boltz_frequency = 0
-        for conformer in range(len(frequency_components)):
-            boltz_frequency += frequency_components[conformer][frequency]
-        boltz_frequencies.append(boltz_frequency)
-    # Calculate Boltzmann-averaged IR intensities
-
-    for conformer in range(len(ir_intensities_list)):
-        components = []
-        for ir_intensity in ir_intensities_list[conformer]:
-            component = float(ir_intensity) * boltz_weights[conformer]
-            components.append(component)
-        ir_intensity_components.append(components)
-    # Add together the components for each IR intensity to produce Boltzmann-averaged IR intensities
-
-    for ir_intensity in range(len(ir_intensity_components[0])):
-        boltz_ir_intensity = 0
-        for conformer in range(len(ir_intensity_components)):
-            boltz_ir_intensity += ir_intensity_components[conformer][ir_intensity]
-        boltz_ir_intensities.append(boltz_ir_intensity)
-    # If TD-DFT data present, calculate Boltzmann-averages
-
-    if wavelength_list:
-        # Calculate the wavelength component for each excited state of each conformer
-
-        for conformer in range(len(wavelength_list)):
-            components = []
-            for excited_state in wavelength_list[conformer]:
-                component = float(excited_state) * boltz_weights[conformer]
-                components.append(component)
-            wavelength_components.append(components)
-        # Calculate the rotatory strength component for each excited state of each conformer
-
-        for conformer in range(len(rotatory_strength_list)):
-            components = []
-            for excited_state in rotatory_strength_list[conformer]:
-                component = float(excited_state) * boltz_weights[conformer]
-                components.append(component)
-            rotatory_strength_components.append(components)
-        # Calculate the oscillator strength component for each excited state of each conformer
-
-        for conformer in range(len(oscillator_strength_list)):
-            components = []
-            for excited_state in oscillator_strength_list[conformer]:
-                component = float(excited_state) * boltz_weights[conformer]
-                components.append(component)
-            oscillator_strength_components.append(components)
-        # Add together the components for each excited state to produce Boltzmann-averaged wavelengths
-
-        for excited_state in range(len(wavelength_components[0])):
-            boltz_wavelength = 0
-            boltz_rotatory_strength = 0
-            boltz_oscillator_strength = 0
-            for conformer in range(len(wavelength_components)):
-                boltz_wavelength += wavelength_components[conformer][excited_state]
-                boltz_rotatory_strength += rotatory_strength_components[conformer][excited_state]
-                boltz_oscillator_strength += oscillator_strength_components[conformer][excited_state]
-            boltz_wavelengths.append(boltz_wavelength)
-            boltz_rotatory_strengths.append(boltz_rotatory_strength)
-            boltz_oscillator_strengths.append(boltz_oscillator_strength)
-    # If VCD data present, calculate Boltzmann-averages
-
-    if frequency_rotatory_strengths:
-        # Calculate the (VCD) frequency rotatory strength component for each frequency of each conformer #
-
-        for conformer in range(len(frequency_rotatory_strengths)):
-            components = []
-            for frequency in frequency_rotatory_strengths[conformer]:
-                component = float(frequency) * boltz_weights[conformer]
-                components.append(component)
-            frequency_rotatory_strength_components.append(components)
-        # Calculate the IR frequency dipole strength component for each frequency of each conformer
-
-        for conformer in range(len(frequency_dipole_strengths)):
-            components = []
-            for frequency in frequency_dipole_strengths[conformer]:
-                component = float(frequency) * boltz_weights[conformer]
-                components.append(component)
-            frequency_dipole_strength_components.append(components)
-        # Add together the components for each frequency to produce Boltzmann-averaged frequencies
-
-        for frequency in range(len(frequency_rotatory_strength_components[0])):
-            boltz_frequency_rotatory_strength = 0
-            boltz_frequency_dipole_strength = 0
-            for conformer in range(len(frequency_components)):
-                boltz_frequency_rotatory_strength += frequency_rotatory_strength_components[conformer][frequency]
-                boltz_frequency_dipole_strength += frequency_dipole_strength_components[conformer][frequency]
-            boltz_frequency_rotatory_strengths.append(boltz_frequency_rotatory_strength)
-            boltz_frequency_dipole_strengths.append(boltz_frequency_dipole_strength)
-    # If optical rotation data present, calculate Boltzmann-averages
-
-    if optrot_wavelengths:
-        # Calculate the optical rotation strength component for each excited state of each conformer
-        #  consider wavelengths
-
-        for conformer in range(len(optrot_strengths)):
-            components = []
-            for strength in optrot_strengths[conformer]:
-                component = float(strength) * boltz_weights[conformer]
-                components.append(component)
-            optrot_strength_components.append(components)
-        # Add together the components for each optical rotation strength to produce Boltzmann-averaged optical
-        # rotation strengths
-
-        for optrot_strength in range(len(optrot_strength_components[0])):
-            boltz_optrot_strength = 0
-            for conformer in range(len(optrot_strength_components)):
-                boltz_optrot_strength += optrot_strength_components[conformer][optrot_strength]
-            boltz_optrot_strengths.append(boltz_optrot_strength)
-    # Find order of conformers ordered by ascending energy, dealing with spatially different conformers of
-    # identical energies, if present
-
-    energies_in_order = energies.copy()
-    energies_in_order.sort()
-    conformer_order = []
-    previous_energy = 42  # I chose an arbitrary positive number here.
-    for energy in energies_in_order:
-        if energy != previous_energy:
-            conformer_order.append(energies.index(energy))
-            a = 1
-        elif energy == previous_energy:
-            start_at = energies.index(previous_energy) + a
-            conformer_order.append(energies.index(energy, start_at))
-            a += 1
-        previous_energy = energy
-    # Order the conformers in the data lists
-
-    for conformer in conformer_order:
-        ordered_energies.append(energies[conformer])
-        ordered_relative_energies.append(relative_energies[conformer])
-        ordered_boltz_weights.append(boltz_weights[conformer])
-        ordered_population_contributions.append(population_contributions[conformer])
-        ordered_element_list.append(element_list[conformer])
-        ordered_x_cartesian_coords_list.append(x_cartesian_coords_list[conformer])
-        ordered_y_cartesian_coords_list.append(y_cartesian_coords_list[conformer])
-        ordered_z_cartesian_coords_list.append(z_cartesian_coords_list[conformer])
-        ordered_frequencies_list.append(frequencies_list[conformer])
-        ordered_ir_intensities_list.append(ir_intensities_list[conformer])
-        if wavelength_list:
-            ordered_wavelength_list.append(wavelength_list[conformer])
-            ordered_rotatory_strengths.append(rotatory_strength_list[conformer])
-            ordered_oscillator_strengths.append(oscillator_strength_list[conformer])
-        if shielding_tensors:
-            ordered_shielding_tensors.append(shielding_tensors[conformer])
-        if frequency_rotatory_strengths:
-            ordered_frequency_rotatory_strengths_list.append(frequency_rotatory_strengths[conformer])
-            ordered_frequency_dipole_strengths_list.append(frequency_dipole_strengths[conformer])
-        if optrot_wavelengths:
-            ordered_optrot_list.append(optrot_strengths[conformer])
-            ordered_optrot_wavelengths_list.append(optrot_wavelengths[conformer])
-    return (
-        ordered_energies,
-        ordered_relative_energies,
-        ordered_boltz_weights,
-        ordered_element_list,
-        ordered_x_cartesian_coords_list,
-        ordered_y_cartesian_coords_list,
-        ordered_z_cartesian_coords_list,
-        ordered_wavelength_list,
-        ordered_rotatory_strengths,
-        ordered_shielding_tensors,
-        boltz_shielding_tensors,
-        boltz_c_tensors,
-        boltz_h_tensors,
-        boltz_wavelengths,
-        boltz_rotatory_strengths,
-        sp_functional_and_basis_set,
-        sp_solvent,
-        sp_dispersion,
-        opt_freq_functional_and_basis_set,
-        opt_freq_solvent,
-        opt_freq_dispersion,
-        nmr_functional_and_basis_set,
-        nmr_solvent,
-        nmr_dispersion,
-        tddft_functional_and_basis_set,
-        tddft_solvent,
-        tddft_dispersion,
-        results_directory,
-        boltz_oscillator_strengths,
-        boltz_frequencies,
-        ordered_frequencies_list,
-        ordered_oscillator_strengths,
-        duplicate_conformers,
-        data_analysis_error_check,
-        ordered_frequency_rotatory_strengths_list,
-        boltz_frequency_rotatory_strengths,
-        ordered_optrot_wavelengths_list,
-        ordered_optrot_list,
-        boltz_optrot_strengths,
-        ordered_frequency_dipole_strengths_list,
-        boltz_frequency_dipole_strengths,
-        or_functional_and_basis_set,
-        or_solvent,
-        or_dispersion,
-        duplicate_conf_details,
-        relative_energies,
-        element_list,
-        x_cartesian_coords_list,
-        y_cartesian_coords_list,
-        z_cartesian_coords_list,
-        list_of_conformer_suffixes,
-        boltz_ir_intensities,
-        ordered_ir_intensities_list,
-        number_imag_freq_confs_removed,
-        chk_conf_suffixes,
-        calc_software,
+    # Define input data
+
+    ensemble = analysed_data.ensemble
+    c_slope = settings["C slope"]
+    c_intercept = settings["C intercept"]
+    h_slope = settings["H slope"]
+    h_intercept = settings["H intercept"]
+    shift_scaling = chemical_shift_scaling(ensemble.elements, c_slope, c_intercept, h_slope, h_intercept)
+
+    # Define new lists
+
+    boltz_c_tensors = []
+    boltz_h_tensors = []
+    sweep_c_tensors = []
+    sweep_h_tensors = []
+    energy_uncertainty = {
+        property_name: statistics
+        for property_name, statistics in analysed_data.energy_uncertainty.items()
+        if property_name != "chemical_shifts"
+    }
+    energy_sensitivity = {
+        property_name: sensitivity
+        for property_name, sensitivity in analysed_data.energy_sensitivity.items()
+        if property_name != "chemical_shifts"
+    }
+
+    # Pull out carbon and hydrogen shielding tensors into separate lists and calculate chemical shifts if selected
+
+    if ensemble.has_property("shielding_tensors"):
+        boltz_c_tensors, boltz_h_tensors = nmr_data_rows(
+            ensemble.elements,
+            analysed_data.boltzmann_averages["shielding_tensors"],
+            c_slope,
+            c_intercept,
+            h_slope,
+            h_intercept,
+        )
+        for sweep_shielding_tensors in analysed_data.sweep_boltzmann_averages.get("shielding_tensors", []):
+            c_rows, h_rows = nmr_data_rows(
+                ensemble.elements, sweep_shielding_tensors, c_slope, c_intercept, h_slope, h_intercept
+            )
+            sweep_c_tensors.append(c_rows)
+            sweep_h_tensors.append(h_rows)
+    if shift_scaling is not None:
+        if "shielding_tensors" in energy_uncertainty:
+            energy_uncertainty["chemical_shifts"] = chemical_shift_statistics(
+                energy_uncertainty["shielding_tensors"], shift_scaling
+            )
+        if "shielding_tensors" in energy_sensitivity:
+            energy_sensitivity["chemical_shifts"] = chemical_shift_sensitivity(
+                energy_sensitivity["shielding_tensors"], ensemble.boltzmann_weights, shift_scaling
+            )
+    return replace(
+        analysed_data,
+        c_nmr=boltz_c_tensors,
+        h_nmr=boltz_h_tensors,
+        sweep_c_nmr=sweep_c_tensors,
+        sweep_h_nmr=sweep_h_tensors,
+        energy_uncertainty=energy_uncertainty,
+        energy_sensitivity=energy_sensitivity,
+    )
+
+
+def boltzmann_weight_calculator(relative_energies, thermal_energy):
+    """Calculates Boltzmann weights (as proportions) from relative energies and the thermal energy (kT), in the same
+    energy unit. Uses the log-sum-exp trick: log-populations are shifted so the most populated conformer has a
+    population of 1 before exponentiating, so the partition function is at least 1 and never underflows to zero
+    (even for very large ensembles or energy ranges). Conformers with negligible populations get weights of zero."""
+
+    log_populations = -np.asarray(relative_energies, dtype=np.float64) / thermal_energy
+    populations = np.exp(log_populations - log_populations.max(axis=-1, keepdims=True))
+    return populations / populations.sum(axis=-1, keepdims=True)
+
+
+def boltzmann_averager(ensemble, boltz_weights):
+    """Boltzmann-averages every calculated spectroscopic property of a ConformerEnsemble (except optical rotation
+    wavelengths, which are the same for all conformers). Each property is averaged with one matrix product of the
+    weights (a vector, or one row per temperature) and the (conformers, values) property array. Returns a dictionary
+    of property name -> averages."""
+
+    boltzmann_averages = {}
+    for property_name in spectroscopic_properties:
+        if ensemble.has_property(property_name) and property_name != "optrot_wavelengths":
+            boltzmann_averages[property_name] = boltz_weights @ getattr(ensemble, property_name)
+    return boltzmann_averages
+
+
+def energy_uncertainty_sampler(
+    ensemble, relative_energies, thermal_energy, energy_uncertainty, number_of_samples, distribution, memory_budget
+):
+    """Propagates errors in conformer relative energies to Boltzmann-averaged spectroscopic properties by Monte Carlo
+    sampling. Each sample adds a random error to every conformer's relative energy (from a normal distribution with a
+    standard deviation of energy_uncertainty, or a uniform distribution of +/- energy_uncertainty), then finds the
+    Boltzmann weights and averages again. To fit within the memory budget (bytes), sampled averages are found for a
+    block of values at a time (all properties' values side by side), and only that block's statistics are kept.
+    Within a block, samples are processed in chunks, with each chunk's weights found in place in one reused array
+    and its averages found with one matrix product. Samples are drawn again (with the same seed) for each block, so
+    every block sees the same samples. Returns a dictionary of property name -> dictionary of the mean, standard
+    deviation and percentiles of the sampled averages, or None if one sample of one value doesn't fit within the
+    memory budget."""
+
+    property_values = {
+        property_name: getattr(ensemble, property_name)
+        for property_name in spectroscopic_properties
+        if ensemble.has_property(property_name) and property_name != "optrot_wavelengths"
+    }
+    if not property_values:
+        return {}
+    number_of_confs = len(relative_energies)
+    number_of_values = sum(values.shape[1] for values in property_values.values())
+
+    # Find the memory needed for all values side by side and their statistics, for each sample of each value in a
+    # block (sampled averages, and up to two temporary copies made while finding statistics), and for each sample in
+    # a chunk (one row of sampled energies, which becomes the row of weights, and its maximum and sum). Blocks are as
+    # wide as possible, so that samples are drawn as few times as possible, then chunks use the remaining memory.
+
+    available_memory = memory_budget - 8 * number_of_values * (number_of_confs + 2 + len(uncertainty_percentiles))
+    bytes_per_sample = 8 * (number_of_confs + 2)
+    bytes_per_block_value = 24 * number_of_samples
+    block_width = int(min((available_memory - bytes_per_sample) // bytes_per_block_value, number_of_values))
+    if block_width < 1:
+        return None
+    all_values = np.concatenate(list(property_values.values()), axis=1)
+    chunk_size = int(
+        min((available_memory - bytes_per_block_value * block_width) // bytes_per_sample, number_of_samples)
+    )
+    chunk_weights_store = np.empty((chunk_size, number_of_confs))
+    block_averages_store = np.empty((number_of_samples, block_width))
+    means = np.empty(number_of_values)
+    standard_deviations = np.zeros(number_of_values)
+    percentiles = np.empty((len(uncertainty_percentiles), number_of_values))
+    for block_start in range(0, number_of_values, block_width):
+        block_end = min(block_start + block_width, number_of_values)
+        block_averages = block_averages_store[:, : block_end - block_start]
+        random_number_generator = np.random.default_rng(0)  # Fixed seed, so repeated analyses give the same results
+        for chunk_start in range(0, number_of_samples, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, number_of_samples)
+            sample_weights = chunk_weights_store[: chunk_end - chunk_start]
+            if distribution == "Uniform":
+                random_number_generator.random(out=sample_weights)
+                sample_weights *= 2.0 * energy_uncertainty
+                sample_weights -= energy_uncertainty
+            else:
+                random_number_generator.standard_normal(out=sample_weights)
+                sample_weights *= energy_uncertainty
+
+            # Turn sampled energies into Boltzmann weights in place (as in boltzmann_weight_calculator)
+
+            sample_weights += relative_energies
+            sample_weights /= -thermal_energy
+            sample_weights -= sample_weights.max(axis=1, keepdims=True)
+            np.exp(sample_weights, out=sample_weights)
+            sample_weights /= sample_weights.sum(axis=1, keepdims=True)
+            np.matmul(sample_weights, all_values[:, block_start:block_end], out=block_averages[chunk_start:chunk_end])
+        means[block_start:block_end] = block_averages.mean(axis=0)
+        if number_of_samples > 1:
+            standard_deviations[block_start:block_end] = block_averages.std(axis=0, ddof=1)
+        np.percentile(  # Last use of this block's averages, so they can be partially sorted in place
+            block_averages,
+            uncertainty_percentiles,
+            axis=0,
+            out=percentiles[:, block_start:block_end],
+            overwrite_input=True,
+        )
+
+    # Split statistics by property
+
+    sampled_statistics = {}
+    value_boundaries = np.cumsum([0] + [values.shape[1] for values in property_values.values()])
+    for property_name, start, end in zip(property_values, value_boundaries[:-1], value_boundaries[1:]):
+        sampled_statistics[property_name] = {
+            "mean": means[start:end],
+            "standard deviation": standard_deviations[start:end],
+            "percentiles": percentiles[:, start:end],
+        }
+    return sampled_statistics
+
+
+def energy_sensitivity_calculator(ensemble, boltzmann_averages, thermal_energy):
+    """Calculates how sensitive each Boltzmann-averaged value is to each conformer's relative energy, analytically
+    from the Boltzmann weights and per-conformer values. For an average A = sum_i w_i * V_i, the derivative with
+    respect to the relative energy of conformer k is dA/dE_k = -w_k * (V_k - A) / kT, so raising the energy of a
+    conformer moves the average away from that conformer's value. Also finds each conformer's contribution (w_k * V_k)
+    and contribution share (contribution divided by the sum of absolute contributions, so shares stay meaningful for
+    averages close to zero, e.g. ECD signs). Returns a dictionary of property name -> dictionary of arrays of shape
+    (conformers, values), with conformers in the same order as the ensemble."""
+
+    boltz_weights = ensemble.boltzmann_weights[:, np.newaxis]
+    energy_sensitivity = {}
+    for property_name, averages in boltzmann_averages.items():
+        values = getattr(ensemble, property_name)
+        contributions = boltz_weights * values
+        energy_sensitivity[property_name] = {
+            "jacobian": -boltz_weights * (values - averages) / thermal_energy,
+            "contributions": contributions,
+            "contribution shares": contribution_share_calculator(contributions),
+        }
+    return energy_sensitivity
+
+
+def contribution_share_calculator(contributions):
+    """Divides conformer contributions to Boltzmann-averaged values (shape (conformers, values)) by the sum of their
+    absolute values. Values without contributions have shares of zero (or NaN, for NaN values)."""
+
+    absolute_contributions = np.abs(contributions).sum(axis=0)
+    return np.divide(
+        contributions, absolute_contributions, out=np.zeros_like(contributions), where=absolute_contributions != 0
     )
+
+
+def chemical_shift_statistics(shielding_statistics, shift_scaling):
+    """Converts statistics of sampled Boltzmann-averaged shielding tensors (from energy_uncertainty_sampler) to
+    statistics of scaled chemical shifts. Chemical shifts are a linear function of shielding tensors, so the reported
+    percentiles (symmetric about the median) are reversed for atoms with negative scaling slopes."""
+
+    shift_slopes, shift_intercepts = shift_scaling
+    percentiles = shielding_statistics["percentiles"]
+    return {
+        "mean": (shift_intercepts - shielding_statistics["mean"]) / -shift_slopes,
+        "standard deviation": shielding_statistics["standard deviation"] / np.abs(shift_slopes),
+        "percentiles": (shift_intercepts - np.where(shift_slopes < 0, percentiles[::-1], percentiles)) / -shift_slopes,
+    }
+
+
+def chemical_shift_sensitivity(shielding_sensitivity, boltzmann_weights, shift_scaling):
+    """Converts the energy sensitivity of Boltzmann-averaged shielding tensors (from energy_sensitivity_calculator) to
+    that of scaled chemical shifts, which are a linear function of shielding tensors."""
+
+    shift_slopes, shift_intercepts = shift_scaling
+    contributions = (
+        boltzmann_weights[:, np.newaxis] * shift_intercepts - shielding_sensitivity["contributions"]
+    ) / -shift_slopes
+    return {
+        "jacobian": shielding_sensitivity["jacobian"] / shift_slopes,
+        "contributions": contributions,
+        "contribution shares": contribution_share_calculator(contributions),
+    }
+
+
+def chemical_shift_scaling(elements, c_slope, c_intercept, h_slope, h_intercept):
+    """Returns the slope and intercept used to scale each atom's shielding tensor to a chemical shift (NaN for atoms
+    without scaling factors), or None if no NMR scaling factors are given."""
+
+    shift_slopes = np.full(len(elements), np.nan)
+    shift_intercepts = np.full(len(elements), np.nan)
+    if c_slope and c_intercept is not None:
+        shift_slopes[elements == "C"] = float(c_slope)
+        shift_intercepts[elements == "C"] = float(c_intercept)
+    if h_slope and h_intercept is not None:
+        shift_slopes[elements == "H"] = float(h_slope)
+        shift_intercepts[elements == "H"] = float(h_intercept)
+    if np.isnan(shift_slopes).all():
+        return None
+    return shift_slopes, shift_intercepts
+
+
+def nmr_data_rows(elements, boltz_shielding_tensors, c_slope, c_intercept, h_slope, h_intercept):
+    """Pulls out carbon and hydrogen Boltzmann-averaged shielding tensors into separate rows for the NMR .csv file
+    (atom labels, shielding tensor and, if scaling factors are given, the scaled chemical shift)."""
+
+    boltz_c_tensors = []
+    boltz_h_tensors = []
+    boltz_shielding_tensors = boltz_shielding_tensors.tolist()
+    row = []
+    number_Cs = 0
+    number_Hs = 0
+    for atom in range(len(boltz_shielding_tensors)):
+        if elements[atom] == "C":
+            number_Cs += 1
+            label1 = label2 = "C"
+            label1 += str(atom + 1)
+            row.append(label1)
+            label2 += str(number_Cs)
+            row.append(label2)
+            row.append(str(boltz_shielding_tensors[atom]))
+            if c_slope and c_intercept is not None:
+                c_slope = float(c_slope)
+                c_intercept = float(c_intercept)
+                chemical_shift = (c_intercept - boltz_shielding_tensors[atom]) / -c_slope
+                row.append(str(chemical_shift))
+            boltz_c_tensors.append(row)
+        elif elements[atom] == "H":
+            number_Hs += 1
+            label1 = label2 = "H"
+            label1 += str(atom + 1)
+            row.append(label1)
+            label2 += str(number_Hs)
+            row.append(label2)
+            row.append(str(boltz_shielding_tensors[atom]))
+            if h_slope and h_intercept is not None:
+                h_slope = float(h_slope)
+                h_intercept = float(h_intercept)
+                chemical_shift = (h_intercept - boltz_shielding_tensors[atom]) / -h_slope
+                row.append(str(chemical_shift))
+            boltz_h_tensors.append(row)
+        row = []
+    return boltz_c_tensors, boltz_h_tensors
+
+
+def sweep_temperature_list(sweep_text):
+    """Reads the temperatures (K) of a temperature sweep, written as comma-separated temperatures and/or ranges
+    written as start-end:step (e.g. "253.15, 273.15, 298.15" or "250-350:25", which includes 350 K). Returns a list of
+    temperatures (empty if no sweep is selected), or None if the text is not valid."""
+
+    temperatures = []
+    for item in sweep_text.replace(" ", "").split(","):
+        if item == "":
+            continue
+        temperature_range = fullmatch(r"(\d+\.?\d*)-(\d+\.?\d*):(\d+\.?\d*)", item)
+        if temperature_range is not None:
+            start, end, step = (float(value) for value in temperature_range.groups())
+            if step <= 0 or end < start:
+                return None
+            number_of_steps = int((end - start) / step + 1e-9)
+            temperatures += [round(start + step * step_number, 6) for step_number in range(number_of_steps + 1)]
+        elif fullmatch(r"\d+\.?\d*", item) is not None:
+            temperatures.append(float(item))
+        else:
+            return None
+    if any(temperature <= 0 for temperature in temperatures):
+        return None
+    return temperatures
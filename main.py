@@ -4,6 +4,10 @@
 #   DATA_ANALYSIS contains a function which accepts this list of lists of parsed data and returns a list of lists of
 #   analysed data by conformer.
 #   WRITERS accepts this list of lists of analysed data and writes file(s) containing analysed data.
+#   CONFORMER_COMPARISON contains functions for aligning conformers and calculating the maximum atom deviation (MAD)
+#   between conformer geometries, used by PARSERS and DATA_ANALYSIS to find redundant conformers.
+#   CONFORMER_GENERATOR contains a function which generates conformers with RDKit from a SMILES string or .sdf file,
+#   and returns them in the same format as conformers parsed from .xyz/.sdf files (for input file creation).
 #   MAIN contains the GUI and uses functions imported from the above modules. MAIN also reads/writes user settings
 #   from/to a settings text file.
 
@@ -15,6 +19,7 @@
 
 
 import sys
+from multiprocessing import freeze_support
 from os import path as os_path, system as os_system
 from re import search, findall, sub, IGNORECASE, DOTALL
 from tkinter import (
@@ -37,8 +42,13 @@ from tkinter import (
 )
 from webbrowser import open_new
 from tkinterdnd2 import DND_FILES, TkinterDnD  # Version 0.4.3
-from data_analysis import analyse
-from parsers import parse, xyz_sdf_parser
+from dataclasses import replace
+import numpy as np  # Version 2.2.6
+from data_analysis import conformer_deduplicator, boltzmann_analyser, chemical_shift_scaler
+from parsers import parse, xyz_sdf_parser, settings_checker
+from conformer_generator import rdkit_conformer_generator
+from conformer_comparison import kept_conformer_numbers, conformer_library_updater
+from conformer_ensemble import EnsembleAnalysis, GeometryEnsemble, unanalysed_ensemble
 from writers import (
     nmr_csv_writer,
     ir_csv_writer,
@@ -47,13 +57,96 @@ from writers import (
     vc_bil_writer,
     ir_bil_writer,
     or_bil_writer,
+    sweep_temperature_file_writer,
+    temperature_sweep_csv_writer,
+    energy_uncertainty_csv_writer,
+    energy_sensitivity_writer,
     docx_writer,
     xyz_writer,
     dup_conf_txt_writer,
+    mad_pair_pruning_text,
     input_file_writer,
 )
 
 
+# Define the analysis stage affected by each setting. Stages run in this order, so after output files are analysed,
+# File --> Recompute only reruns the earliest stage affected by changed settings and later stages (using data from
+# earlier stages kept in memory). Settings not listed don't affect the analysis of output files.
+
+analysis_stages = ("parse", "deduplicate", "boltzmann", "nmr", "output")
+setting_stages = {
+    "Boltz energy type": "parse",
+    "Energy cutoff (kcal/mol)": "deduplicate",
+    "MAD cutoff (A)": "deduplicate",
+    "MAD atoms": "deduplicate",
+    "MAD elements": "deduplicate",
+    "MAD atom mapping": "deduplicate",
+    "Redundant conformer comparison": "deduplicate",
+    "Torsion cutoff (degrees)": "deduplicate",
+    "Confirm torsion duplicates with MAD": "deduplicate",
+    "Geometry hash tolerance (A)": "deduplicate",
+    "Duplicate conformer details": "deduplicate",
+    "Temperature (K)": "boltzmann",  # Or deduplicate, for quasi-RRHO free energies (recomputed at this temperature)
+    "Temperature sweep (K)": "boltzmann",
+    "Relative energy unit": "boltzmann",
+    "Energy uncertainty samples": "boltzmann",
+    "Energy uncertainty (kcal/mol)": "boltzmann",
+    "Energy uncertainty distribution": "boltzmann",
+    "Energy uncertainty memory budget (MB)": "boltzmann",
+    "Energy sensitivity files": "boltzmann",
+    "C slope": "nmr",
+    "C intercept": "nmr",
+    "H slope": "nmr",
+    "H intercept": "nmr",
+    "IR freq scaling factor": "output",
+    "NMR csv file": "output",
+    "Freq csv file": "output",
+    "SpecDis .cd.bil file": "output",
+    "SpecDis .uv.bil file": "output",
+    "SpecDis .vc.bil file": "output",
+    "SpecDis .ir.bil file": "output",
+    "SpecDis .or.bil file": "output",
+    "Write .xyz file": "output",
+    "Energies and coordinates table": "output",
+    "NMR/ECD/VCD/OR table": "output",
+    "UV in ECD table": "output",
+}
+
+# Define the output files written after analysis. Rerunning the nmr stage only rewrites files with NMR data, and
+# changing an output setting only rewrites the files it affects.
+
+analysis_outputs = (
+    "NMR csv file",
+    "Freq csv file",
+    "SpecDis .cd.bil file",
+    "SpecDis .uv.bil file",
+    "SpecDis .vc.bil file",
+    "SpecDis .ir.bil file",
+    "SpecDis .or.bil file",
+    "Temperature sweep files",
+    "Energy uncertainty file",
+    "Energy sensitivity files",
+    "Write .xyz file",
+    "Duplicate conformer details",
+    "Word document",
+)
+nmr_stage_outputs = ("NMR csv file", "Temperature sweep files", "Energy uncertainty file", "Energy sensitivity files")
+output_setting_files = {
+    "IR freq scaling factor": ("Freq csv file", "Temperature sweep files"),
+    "NMR csv file": ("NMR csv file", "Temperature sweep files"),
+    "Freq csv file": ("Freq csv file", "Temperature sweep files"),
+    "SpecDis .cd.bil file": ("SpecDis .cd.bil file", "Temperature sweep files"),
+    "SpecDis .uv.bil file": ("SpecDis .uv.bil file", "Temperature sweep files"),
+    "SpecDis .vc.bil file": ("SpecDis .vc.bil file", "Temperature sweep files"),
+    "SpecDis .ir.bil file": ("SpecDis .ir.bil file", "Temperature sweep files"),
+    "SpecDis .or.bil file": ("SpecDis .or.bil file", "Temperature sweep files"),
+    "Write .xyz file": ("Write .xyz file",),
+    "Energies and coordinates table": ("Word document",),
+    "NMR/ECD/VCD/OR table": ("Word document",),
+    "UV in ECD table": ("Word document",),
+}
+
+
 def on_drop(event):
     """Gets dropped filepaths and starts analysis on these selected files."""
 
@@ -67,6 +160,7 @@ def on_drop(event):
             + findall(r"(.+?\.log) ?", files)
             + findall(r"(.+?\.xyz) ?", files)
             + findall(r"(.+?\.sdf) ?", files)
+            + findall(r"(.+?\.smi) ?", files)
         )
     main(list_of_filenames)
 
@@ -152,6 +246,192 @@ def imag_freq_error_window(settings, list_of_filenames, error_message, imag_freq
     return program_error_result
 
 
+def geometry_issue_window(geometry_issue_conf_list):
+    """Opens a dialogue window, triggered by any implausible conformer geometries (atom clashes, fragmentation or
+    changed connectivity), where the user can decide to proceed or abort analysis."""
+
+    def proceed_with_exclusion():
+        global program_error_result
+        program_error_result = "proceed"
+        geometry_issue_window.destroy()
+        return program_error_result
+
+    def abort_run():
+        global program_error_result
+        program_error_result = "abort"
+        geometry_issue_window.destroy()
+        return program_error_result
+
+    def proceed_without_exclusion():
+        global program_error_result
+        program_error_result = "proceed without exclusion"
+        geometry_issue_window.destroy()
+        return program_error_result
+
+    geometry_issue_window = Toplevel(root)
+    geometry_issue_window.geometry("450x200")
+    geometry_issue_window.title("Error: Implausible geometries")
+    geometry_issue_window.iconbitmap(icon_path)
+    label1 = Label(
+        geometry_issue_window,
+        text="Atom clashes or broken/new bonds (compared with most conformers)\nwere detected for:\n"
+        + geometry_issue_conf_list
+        + ".",
+        wraplength=430,
+    )
+    label1.config(fg="red")
+    label1.pack()
+    label2 = Label(geometry_issue_window, text=" ")
+    label2.pack()
+    Button1 = Button(geometry_issue_window, text=" Don't proceed (recommended) ", command=abort_run)
+    Button2 = Button(geometry_issue_window, text=" Exclude these conformer(s) ", command=proceed_with_exclusion)
+    Button3 = Button(geometry_issue_window, text=" Keep these conformer(s) ", command=proceed_without_exclusion)
+    Button1.pack()
+    Button2.pack()
+    Button3.pack()
+    geometry_issue_window.protocol("WM_DELETE_WINDOW", abort_run)
+    geometry_issue_window.wait_window(geometry_issue_window)
+    return program_error_result
+
+
+def xyz_input_file_creation(geometry_ensemble, suggested_filename, status_note=""):
+    """Opens the input file template window for conformers from .xyz/.sdf files (or generated by RDKit), then writes
+    the input file(s) and any redundant conformer details. A status note (e.g. a tip) is shown after the input files
+    are created."""
+
+    status_text = "Please enter information for input file(s) in the new window."
+    status_bar.config(text=status_text, foreground="black")
+    status_bar2.config(text="", foreground="black")
+    root.update()
+    user_decision = input_file_writer_window(settings, geometry_ensemble, suggested_filename, "", False, "", "")
+    if user_decision[0] == "Create input file.":  # User has decided to create input file.
+
+        # Write a text file with details about redundant conformers
+
+        duplicate_clusters = geometry_ensemble.duplicate_clusters
+        pruning_text = mad_pair_pruning_text(geometry_ensemble.mad_pair_statistics)
+        if (duplicate_clusters["representatives"] or pruning_text) and settings["Duplicate conformer details"] is True:
+            status_text = "Writing redundant conformer details to .txt file..."
+            status_bar.config(text=status_text)
+            root.update()
+            dup_conf_file = dup_conf_txt_writer(geometry_ensemble, settings)
+            if dup_conf_file[0] == "Error detected":
+                status_text = "ERROR: " + dup_conf_file[1]
+                status_bar.config(text=status_text, foreground="red")
+                return
+        duplicate_conformers = geometry_ensemble.duplicate_conformers
+        if duplicate_conformers:
+            if (
+                duplicate_conformers[1].count(",") > 3
+            ):  # Avoid overfiling the status bar with many conformer numbers
+                status_text2 = (
+                    "Excluded " + duplicate_conformers[0] + " redundant conformer" + duplicate_conformers[2] + "."
+                )
+            else:
+                status_text2 = (
+                    "Excluded "
+                    + duplicate_conformers[0]
+                    + " redundant conformer"
+                    + duplicate_conformers[2]
+                    + " ("
+                    + duplicate_conformers[1]
+                    + ")."
+                )
+            status_bar2.config(text=status_text2)
+        elif len(duplicate_conformers) == 0 and settings["Check for dup confs in XYZ/SDF files"] is True:
+            status_text2 = "No redundant conformers detected."
+            status_bar2.config(text=status_text2)
+        if any(stage.endswith("clustering") for stage in duplicate_clusters["stages"].values()):
+            status_text2 = (
+                status_bar2.cget("text")
+                + " Kept "
+                + str(len(geometry_ensemble.elements))
+                + " representative conformers."
+            )
+            status_bar2.config(text=status_text2.strip())
+        if pruning_text:
+            status_bar2.config(text=(status_bar2.cget("text") + " " + pruning_text).strip())
+        if geometry_ensemble.unconverged_conformers:
+            status_text2 = (
+                status_bar2.cget("text")
+                + " Excluded "
+                + str(geometry_ensemble.unconverged_conformers)
+                + " conformer"
+                + ("s" if geometry_ensemble.unconverged_conformers > 1 else "")
+                + " with unconverged MMFF optimisation."
+            )
+            status_bar2.config(text=status_text2.strip())
+        status_text = "Writing input file(s)..."
+        status_bar.config(text=status_text, foreground="black")
+        root.update()
+        input_filename = user_decision[1]
+        input_file = input_file_writer(geometry_ensemble, settings, input_filename)
+        if input_file[0] == "Error detected":
+            status_text = "ERROR: " + input_file[1]
+            status_bar.config(text=status_text, foreground="red")
+            status_text2 = ""
+            status_bar2.config(text=status_text2)
+            return
+        plural = ""
+        if input_file[3] > 1:
+            plural = "s"
+
+        # Add the conformers just written to input files to the compound's conformer library, so that these aren't
+        # submitted again in later runs
+
+        if settings["Conformer library"] is True and settings["Check for dup confs in XYZ/SDF files"] is True:
+            source_name = os_path.basename(geometry_ensemble.results_directory)
+            conformer_labels = [
+                source_name + " " + duplicate_clusters["labels"][conf_number] + " conformer"
+                for conf_number in kept_conformer_numbers(duplicate_clusters)
+            ]
+            library_file = conformer_library_updater(
+                conformer_library_folder,
+                geometry_ensemble.elements,
+                geometry_ensemble.x_coords,
+                geometry_ensemble.y_coords,
+                geometry_ensemble.z_coords,
+                conformer_labels,
+                settings,
+            )
+            if library_file[0] == "Error detected":
+                status_text = "Created input file" + plural + ". ERROR: " + library_file[1]
+                status_bar.config(text=status_text, foreground="red")
+                return
+        status_text = "Created input file" + plural + ". " + status_note
+        status_bar.config(text=status_text, fg="green")
+        root.update()
+        return
+    else:  # User has exited window and decided not to create input file.
+        status_text = ""
+        status_bar.config(text=status_text, fg="black")
+        root.update()
+        return
+
+
+def rdkit_conformer_creation(structure, results_directory, suggested_filename):
+    """Generates conformers with RDKit from a SMILES string or .smi/.sdf file, then creates input file(s)
+    for these conformers."""
+
+    if settings["Check for dup confs in XYZ/SDF files"] is True:
+        status_text = "Generating and checking conformers with RDKit..."
+        status_text2 = "(If this step is really slow, reduce the number of conformers to generate)"
+        status_bar2.config(text=status_text2, foreground="black")
+    else:
+        status_text = "Generating conformers with RDKit..."
+    status_bar.config(text=status_text, foreground="black")
+    root.update()
+    geometry_ensemble, parser_error_check, error_message = rdkit_conformer_generator(
+        structure, results_directory, settings, conformer_library_folder
+    )
+    if parser_error_check == "Error detected":
+        status_text = "ERROR: " + error_message
+        status_bar.config(text=status_text, foreground="red")
+        status_bar2.config(text="", foreground="black")
+        return
+    xyz_input_file_creation(geometry_ensemble, suggested_filename)
+
+
 def main(list_of_filenames):
     """Main function of SpectroIBIS - for analysing user-selected files and deciding what to do with them."""
 
@@ -163,6 +443,15 @@ def main(list_of_filenames):
     other_files_text = ""
     if len(list_of_filenames) > 1:
         other_files_text = " and " + str((len(list_of_filenames) - 1)) + " other files"
+    # If user has submitted a .smi file, generate conformers with RDKit and produce input file(s) instead
+
+    if any(filename.endswith(".smi") for filename in list_of_filenames):
+        if len(list_of_filenames) > 1:
+            status_text = "ERROR: Please select only one .smi file at once."
+            status_bar.config(text=status_text, foreground="red")
+            return
+        rdkit_conformer_creation(list_of_filenames[0], "", first_file_name.removesuffix(".smi"))
+        return
     # Detect if all files are .xyz or .sdf, or a combination of both.
 
     xyz_present = 0
@@ -209,76 +498,21 @@ def main(list_of_filenames):
 
         status_bar.config(text=status_text, foreground="black")
         root.update()
-        parsed_xyz_sdf_data = xyz_sdf_parser(list_of_filenames, settings)
-        if parsed_xyz_sdf_data[1] == "Error detected":
-            status_text = "ERROR: " + parsed_xyz_sdf_data[2]
+        geometry_ensemble, parser_error_check, error_message = xyz_sdf_parser(
+            list_of_filenames, settings, conformer_library_folder
+        )
+        if parser_error_check == "Error detected":
+            status_text = "ERROR: " + error_message
             status_bar.config(text=status_text, foreground="red")
             status_bar2.config(text="", foreground="black")
             return
-        status_text = "Please enter information for input file(s) in the new window."
-        status_bar.config(text=status_text, foreground="black")
-        status_bar2.config(text="", foreground="black")
-        root.update()
-        user_decision = input_file_writer_window(settings, parsed_xyz_sdf_data, suggested_filename, "", False, "", "")
-        if user_decision[0] == "Create input file.":  # User has decided to create input file.
-
-            # Write a text file with details about redundant conformers
+        # Dropped .sdf files are always read as conformers, so point out conformer generation for a single structure
 
-            duplicate_conf_details = parsed_xyz_sdf_data[4]
-            if duplicate_conf_details and settings["Duplicate conformer details"] is True:
-                status_text = "Writing redundant conformer details to .txt file..."
-                status_bar.config(text=status_text)
-                root.update()
-                dup_conf_file = dup_conf_txt_writer(parsed_xyz_sdf_data, settings)
-                if dup_conf_file[0] == "Error detected":
-                    status_text = "ERROR: " + dup_conf_file[1]
-                    status_bar.config(text=status_text, foreground="red")
-                    return
-            duplicate_conformers = parsed_xyz_sdf_data[5]
-            if duplicate_conformers:
-                if (
-                    duplicate_conformers[1].count(",") > 3
-                ):  # Avoid overfiling the status bar with many conformer numbers
-                    status_text2 = (
-                        "Excluded " + duplicate_conformers[0] + " redundant conformer" + duplicate_conformers[2] + "."
-                    )
-                else:
-                    status_text2 = (
-                        "Excluded "
-                        + duplicate_conformers[0]
-                        + " redundant conformer"
-                        + duplicate_conformers[2]
-                        + " ("
-                        + duplicate_conformers[1]
-                        + ")."
-                    )
-                status_bar2.config(text=status_text2)
-            elif len(duplicate_conformers) == 0 and settings["Check for dup confs in XYZ/SDF files"] is True:
-                status_text2 = "No redundant conformers detected."
-                status_bar2.config(text=status_text2)
-            status_text = "Writing input file(s)..."
-            status_bar.config(text=status_text, foreground="black")
-            root.update()
-            input_filename = user_decision[1]
-            input_file = input_file_writer(parsed_xyz_sdf_data, settings, input_filename)
-            if input_file[0] == "Error detected":
-                status_text = "ERROR: " + input_file[1]
-                status_bar.config(text=status_text, foreground="red")
-                status_text2 = ""
-                status_bar2.config(text=status_text2)
-                return
-            plural = ""
-            if input_file[3] > 1:
-                plural = "s"
-            status_text = "Created input file" + plural + ". "
-            status_bar.config(text=status_text, fg="green")
-            root.update()
-            return
-        else:  # User has exited window and decided not to create input file.
-            status_text = ""
-            status_bar.config(text=status_text, fg="black")
-            root.update()
-            return
+        status_note = ""
+        if sdf_present and len(geometry_ensemble.elements) == 1 and not geometry_ensemble.duplicate_conformers:
+            status_note = "To generate conformers from this structure, use File --> Generate Conformers (RDKit)."
+        xyz_input_file_creation(geometry_ensemble, suggested_filename, status_note)
+        return
     # Extract key data from comp chem output files
 
     settings["Skip excluding duplicate conformers from input files made from output files"] = False  # Set this setting
@@ -287,32 +521,30 @@ def main(list_of_filenames):
     status_text = "Extracting data from " + first_file_name + other_files_text + "..."
     status_bar.config(text=status_text, foreground="black")
     root.update()
-    parsed_data = parse(list_of_filenames, settings)
-    status_text = "Extracted data for " + str(len(parsed_data[0])) + " conformers..."
-    status_bar.config(text=status_text)
-    root.update()
-
-    if parsed_data[26] == "Error detected":
-        status_text = "ERROR: " + parsed_data[28]
+    (
+        parsed_ensemble,
+        parser_error_check,
+        error_message,
+        imaginary_freq_confs_text,
+        geometry_issue_confs_text,
+    ) = parse(list_of_filenames, settings)
+    if parser_error_check == "Error detected":
+        status_text = "ERROR: " + error_message
         status_bar.config(text=status_text, foreground="red")
-        # error_window(parsed_data[34])
-
         return
-    # Record geometries for possible use in later input file creation, if dubious conformers are to be not removed.
+    status_text = "Extracted data for " + str(len(parsed_ensemble)) + " conformers..."
+    status_bar.config(text=status_text)
+    root.update()
+    # The parsed ensemble is kept unchanged (analysis works on subsets), for possible use in later input file creation
+    # if dubious conformers are to be not removed.
 
-    parsed_elements = parsed_data[1].copy()
-    parsed_x_coords = parsed_data[2].copy()
-    parsed_y_coords = parsed_data[3].copy()
-    parsed_z_coords = parsed_data[4].copy()
-    parsed_conf_suffixes = parsed_data[25].copy()
-    parsed_chk_conf_suffixes = parsed_data[37].copy()
-    parsed_file_content_types = parsed_data[38].copy()
+    parsed_file_content_types = parsed_ensemble.file_contents
 
-    if parsed_data[26] == "Imaginary frequency/ies detected":
+    if parser_error_check == "Imaginary frequency/ies detected":
         status_text = "Imaginary frequency detected!"
         status_bar.config(text=status_text, foreground="red")
         imag_freq_error_window_response = imag_freq_error_window(
-            settings, list_of_filenames, "Imaginary frequencies", parsed_data[27]
+            settings, list_of_filenames, "Imaginary frequencies", imaginary_freq_confs_text
         )
         if imag_freq_error_window_response == "abort":
             if settings["Mode"] == "Analyse output files":
@@ -326,14 +558,37 @@ def main(list_of_filenames):
             or imag_freq_error_window_response == "proceed without exclusion"
         ):
             status_bar.config(foreground="black")
+    if parsed_ensemble.implausible_geometries.any():
+        status_text = "Implausible conformer geometry detected!"
+        status_bar.config(text=status_text, foreground="red")
+        geometry_issue_window_response = geometry_issue_window(geometry_issue_confs_text)
+        if geometry_issue_window_response == "abort":
+            if settings["Mode"] == "Analyse output files":
+                status_text = "Aborted analysis of " + first_file_name + other_files_text + "."
+            if settings["Mode"] == "Create input files":
+                status_text = "Aborted creating input files from " + first_file_name + other_files_text + "."
+            status_bar.config(text=status_text, foreground="black")
+            return
+        elif geometry_issue_window_response == "proceed without exclusion":
+            parsed_ensemble = replace(
+                parsed_ensemble, implausible_geometries=np.zeros(len(parsed_ensemble), dtype=bool)
+            )  # Don't exclude these conformers during analysis
+        status_bar.config(foreground="black")
     # Process this data
 
     status_text = "Checking conformers from " + first_file_name + other_files_text + "..."  # main bottleneck
     status_bar.config(text=status_text)
     root.update()
-    analysed_data = analyse(parsed_data, settings)
-    if analysed_data[33] == "Error detected":
-        status_text = "ERROR: " + analysed_data[34]
+    deduplicated_data, data_analysis_error_check, error_message = conformer_deduplicator(
+        parsed_ensemble, settings, mad_cache_path
+    )
+    if data_analysis_error_check == "Error detected":
+        status_text = "ERROR: " + error_message
+        status_bar.config(text=status_text, foreground="red")
+        return
+    analysed_data, data_analysis_error_check, error_message = boltzmann_analyser(deduplicated_data, settings)
+    if data_analysis_error_check == "Error detected":
+        status_text = "ERROR: " + error_message
         status_bar.config(text=status_text, foreground="red")
         return
     # If user has selected the input file creation mode, create input files from .out/.log files instead
@@ -355,7 +610,7 @@ def main(list_of_filenames):
             multi_out_file_flag = "Multiple output files"
         else:
             multi_out_file_flag = ""
-        if parsed_conf_suffixes == parsed_chk_conf_suffixes == []:
+        if not len(parsed_ensemble.conformer_suffixes) and not len(parsed_ensemble.chk_conformer_suffixes):
             conformer_renumber_flag = True
         else:
             conformer_renumber_flag = False
@@ -375,121 +630,9 @@ def main(list_of_filenames):
         if user_decision[0] == "Create input file.":  # User has decided to create input file.
             if "imag_freq_error_window_response" in locals():
                 if imag_freq_error_window_response == "proceed without exclusion":
-                    analysed_data = (
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        list_of_filenames[0],
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        "",
-                        parsed_elements,
-                        parsed_x_coords,
-                        parsed_y_coords,
-                        parsed_z_coords,
-                        parsed_conf_suffixes,
-                        "",
-                        "",
-                        "",
-                        parsed_chk_conf_suffixes,
-                    )
+                    analysed_data = unanalysed_ensemble(parsed_ensemble)
             if settings["Skip excluding duplicate conformers from input files made from output files"] is True:
-                analysed_data = (
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    list_of_filenames[0],
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    parsed_elements,
-                    parsed_x_coords,
-                    parsed_y_coords,
-                    parsed_z_coords,
-                    parsed_conf_suffixes,
-                    "",
-                    "",
-                    "",
-                    parsed_chk_conf_suffixes,
-                )
+                analysed_data = unanalysed_ensemble(parsed_ensemble)
                 save_new_settings()
             status_text = "Writing input file(s)..."
             status_bar.config(text=status_text, foreground="black")
@@ -498,8 +641,10 @@ def main(list_of_filenames):
             # Write a text file with details about redundant conformers
 
             if settings["Skip excluding duplicate conformers from input files made from output files"] is False:
-                duplicate_conf_details = analysed_data[44]
-                if duplicate_conf_details and settings["Duplicate conformer details"] is True:
+                duplicate_clusters = analysed_data.duplicate_clusters
+                if (
+                    duplicate_clusters["representatives"] or mad_pair_pruning_text(analysed_data.mad_pair_statistics)
+                ) and settings["Duplicate conformer details"] is True:
                     status_text = "Writing redundant conformer details to .txt file..."
                     status_bar.config(text=status_text)
                     root.update()
@@ -556,7 +701,7 @@ def main(list_of_filenames):
             status_bar.config(text=status_text, fg="green")
             root.update()
 
-            duplicate_conformers = analysed_data[32]
+            duplicate_conformers = analysed_data.duplicate_conformers
             if duplicate_conformers:
                 if (
                     duplicate_conformers[1].count(",") > 3
@@ -580,6 +725,10 @@ def main(list_of_filenames):
                 status_text2 = "No redundant conformers detected."
                 status_bar2.config(text=status_text2)
                 root.update()
+            pruning_text = mad_pair_pruning_text(analysed_data.mad_pair_statistics)
+            if pruning_text:
+                status_bar2.config(text=status_bar2.cget("text") + " " + pruning_text)
+                root.update()
             return
         else:  # User has exited window and decided not to create input file.
             status_text = "Exited input file template window."
@@ -588,10 +737,34 @@ def main(list_of_filenames):
             status_bar2.config(text=status_text2, fg="black")
             root.update()
             return
+    # Keep this run's data in memory, so that File --> Recompute can rerun only the analysis stages affected by
+    # changed settings
+
+    session_cache.clear()
+    session_cache.update(
+        {
+            "filenames": list_of_filenames,
+            "files text": first_file_name + other_files_text,
+            "settings": dict(settings),
+            "parsed ensemble": parsed_ensemble,
+            "deduplicated data": deduplicated_data,
+            "analysed data": analysed_data,
+        }
+    )
+    analysis_file_writer(analysed_data, analysis_outputs, "Finished for " + first_file_name + other_files_text + ".")
+
+
+def analysis_file_writer(analysed_data, outputs, finished_text):
+    """Writes the selected output files (from analysis_outputs) with analysed data from output files, then shows
+    the finished text in the status bar."""
+
     # Make csv file with Boltzmann-averaged shielding tensors
 
-    boltz_shielding_tensors = analysed_data[10]
-    if boltz_shielding_tensors and settings["NMR csv file"] is True:
+    if (
+        "NMR csv file" in outputs
+        and "shielding_tensors" in analysed_data.boltzmann_averages
+        and settings["NMR csv file"] is True
+    ):
         status_text = "Writing NMR results to csv file..."
         status_bar.config(text=status_text)
         root.update()
@@ -602,8 +775,11 @@ def main(list_of_filenames):
             return
     # Make csv file with Boltzmann-averaged frequencies
 
-    boltz_frequencies = analysed_data[29]
-    if boltz_frequencies and settings["Freq csv file"] is True:
+    if (
+        "Freq csv file" in outputs
+        and "frequencies" in analysed_data.boltzmann_averages
+        and settings["Freq csv file"] is True
+    ):
         status_text = "Writing frequencies to csv file..."
         status_bar.config(text=status_text)
         root.update()
@@ -614,8 +790,11 @@ def main(list_of_filenames):
             return
     # Make .cd.bil file with Boltzmann-averaged ECD data for SpecDis
 
-    boltz_wavelengths = analysed_data[13]
-    if boltz_wavelengths and settings["SpecDis .cd.bil file"] is True:
+    if (
+        "SpecDis .cd.bil file" in outputs
+        and "wavelengths" in analysed_data.boltzmann_averages
+        and settings["SpecDis .cd.bil file"] is True
+    ):
         status_text = "Writing ECD results to SpecDis .cd.bil file..."
         status_bar.config(text=status_text)
         root.update()
@@ -626,8 +805,11 @@ def main(list_of_filenames):
             return
     # Make .uv.bil file with Boltzmann-averaged UV data for SpecDis
 
-    boltz_wavelengths = analysed_data[13]
-    if boltz_wavelengths and settings["SpecDis .uv.bil file"] is True:
+    if (
+        "SpecDis .uv.bil file" in outputs
+        and "wavelengths" in analysed_data.boltzmann_averages
+        and settings["SpecDis .uv.bil file"] is True
+    ):
         status_text = "Writing UV results to SpecDis .uv.bil file..."
         status_bar.config(text=status_text)
         root.update()
@@ -638,8 +820,11 @@ def main(list_of_filenames):
             return
     # Make .vc.bil file with Boltzmann-averaged VCD data for SpecDis
 
-    boltz_frequency_rotatory_strengths = analysed_data[35]
-    if boltz_frequency_rotatory_strengths and settings["SpecDis .vc.bil file"] is True:
+    if (
+        "SpecDis .vc.bil file" in outputs
+        and "frequency_rotatory_strengths" in analysed_data.boltzmann_averages
+        and settings["SpecDis .vc.bil file"]
+    ):
         status_text = "Writing VCD results to SpecDis .vc.bil file..."
         status_bar.config(text=status_text)
         root.update()
@@ -650,8 +835,11 @@ def main(list_of_filenames):
             return
     # Make .ir.bil file with Boltzmann-averaged IR data for SpecDis
 
-    boltz_frequency_dipole_strengths = analysed_data[40]
-    if boltz_frequency_dipole_strengths and settings["SpecDis .ir.bil file"] is True:
+    if (
+        "SpecDis .ir.bil file" in outputs
+        and "frequency_dipole_strengths" in analysed_data.boltzmann_averages
+        and settings["SpecDis .ir.bil file"] is True
+    ):
         status_text = "Writing IR results to SpecDis .ir.bil file..."
         status_bar.config(text=status_text)
         root.update()
@@ -662,8 +850,11 @@ def main(list_of_filenames):
             return
     # Make .or.bil file with Boltzmann-averaged VCD data for SpecDis
 
-    ordered_optrot_wavelengths_list = analysed_data[36]
-    if ordered_optrot_wavelengths_list and settings["SpecDis .or.bil file"] is True:
+    if (
+        "SpecDis .or.bil file" in outputs
+        and analysed_data.ensemble.has_property("optrot_wavelengths")
+        and settings["SpecDis .or.bil file"] is True
+    ):
         status_text = "Writing optical rotation results to SpecDis .or.bil file..."
         status_bar.config(text=status_text)
         root.update()
@@ -672,9 +863,54 @@ def main(list_of_filenames):
             status_text = "ERROR: " + or_bil[1]
             status_bar.config(text=status_text, foreground="red")
             return
+    # Make Boltzmann-averaged data files for each temperature of a temperature sweep, and a table comparing them
+
+    if "Temperature sweep files" in outputs and len(analysed_data.sweep_temperatures):
+        sweep_settings = dict(settings)
+        for output in analysis_outputs[:7]:  # Files written for each temperature (.csv and SpecDis .bil files)
+            if output not in outputs:
+                sweep_settings[output] = False
+        for temperature_number, temperature in enumerate(analysed_data.sweep_temperatures.tolist()):
+            status_text = "Writing Boltzmann-averaged data at " + f"{temperature:g}" + " K..."
+            status_bar.config(text=status_text)
+            root.update()
+            sweep_files = sweep_temperature_file_writer(
+                analysed_data.sweep_temperature_analysis(temperature_number), sweep_settings
+            )
+            if sweep_files[0] == "Error detected":
+                status_text = "ERROR: " + sweep_files[1]
+                status_bar.config(text=status_text, foreground="red")
+                return
+        sweep_csv = temperature_sweep_csv_writer(analysed_data, settings)
+        if sweep_csv[0] == "Error detected":
+            status_text = "ERROR: " + sweep_csv[1]
+            status_bar.config(text=status_text, foreground="red")
+            return
+    # Make a csv file with the uncertainty of Boltzmann-averaged data caused by conformer energy errors
+
+    if "Energy uncertainty file" in outputs and analysed_data.energy_uncertainty:
+        status_text = "Writing energy uncertainty results to csv file..."
+        status_bar.config(text=status_text)
+        root.update()
+        uncertainty_csv = energy_uncertainty_csv_writer(analysed_data, settings)
+        if uncertainty_csv[0] == "Error detected":
+            status_text = "ERROR: " + uncertainty_csv[1]
+            status_bar.config(text=status_text, foreground="red")
+            return
+    # Make csv and npz files with the sensitivity of Boltzmann-averaged data to conformer energies
+
+    if "Energy sensitivity files" in outputs and analysed_data.energy_sensitivity:
+        status_text = "Writing energy sensitivity results to csv and npz files..."
+        status_bar.config(text=status_text)
+        root.update()
+        sensitivity_files = energy_sensitivity_writer(analysed_data, settings)
+        if sensitivity_files[0] == "Error detected":
+            status_text = "ERROR: " + sensitivity_files[1]
+            status_bar.config(text=status_text, foreground="red")
+            return
     # Make a .xyz file containing conformer energies and Cartesian coordinates
 
-    if settings["Write .xyz file"] is True:
+    if "Write .xyz file" in outputs and settings["Write .xyz file"] is True:
         status_text = "Writing conformer geometries and energies to .xyz file..."
         status_bar.config(text=status_text)
         root.update()
@@ -685,8 +921,13 @@ def main(list_of_filenames):
             return
     # Write a text file with details about redundant conformers
 
-    duplicate_conf_details = analysed_data[44]
-    if duplicate_conf_details and settings["Duplicate conformer details"] is True:
+    duplicate_clusters = analysed_data.duplicate_clusters
+    pruning_text = mad_pair_pruning_text(analysed_data.mad_pair_statistics)
+    if (
+        "Duplicate conformer details" in outputs
+        and (duplicate_clusters["representatives"] or pruning_text)
+        and settings["Duplicate conformer details"] is True
+    ):
         status_text = "Writing redundant conformer details to .txt file..."
         status_bar.config(text=status_text)
         root.update()
@@ -699,7 +940,7 @@ def main(list_of_filenames):
 
     status_text = "Writing Word document..."
     status_bar.config(text=status_text)
-    duplicate_conformers = analysed_data[32]
+    duplicate_conformers = analysed_data.duplicate_conformers
     if duplicate_conformers:
         if duplicate_conformers[1].count(",") > 3:  # Avoid overfiling the status bar with many conformer numbers
             status_text2 = "Excluded " + duplicate_conformers[0] + " redundant conformer" + duplicate_conformers[
@@ -718,19 +959,103 @@ def main(list_of_filenames):
     elif not duplicate_conformers:
         status_text2 = "No redundant conformers detected."
         status_bar2.config(text=status_text2)
+    if pruning_text:
+        status_bar2.config(text=status_bar2.cget("text") + " " + pruning_text)
     root.update()
-    docx_file = docx_writer(analysed_data, settings)
-    if docx_file[0] == "Error detected":
-        status_text = "ERROR: " + docx_file[1]
+    if "Word document" in outputs:
+        docx_file = docx_writer(analysed_data, settings)
+        if docx_file[0] == "Error detected":
+            status_text = "ERROR: " + docx_file[1]
+            status_bar.config(text=status_text, foreground="red")
+            status_text2 = ""
+            status_bar2.config(text=status_text2)
+            return
+    status_text = finished_text
+    status_bar.config(text=status_text, fg="green")
+    root.update()
+
+
+def recompute():
+    """Reanalyses the last analysed output files after settings are changed, rerunning only the earliest analysis
+    stage affected by the changed settings (see setting_stages) and later stages, then rewriting only the output files
+    affected. If no settings affecting analysis were changed, all output files are rewritten (e.g. after an output
+    file was open)."""
+
+    if not session_cache:
+        status_text = "ERROR: No analysed output files to recompute.\nPlease drag and drop your output files first."
         status_bar.config(text=status_text, foreground="red")
-        status_text2 = ""
-        status_bar2.config(text=status_text2)
+        status_bar2.config(text="")
         return
-    results_name_and_directory = analysed_data[27]
-    results_name = search("/([^/]+)$", results_name_and_directory).group(1)
-    status_text = "Finished for " + first_file_name + other_files_text + "."
-    status_bar.config(text=status_text, fg="green")
+    if settings["Mode"] == "Create input files":
+        status_text = (
+            "ERROR: Recompute is only available for analysing output files.\nThis can be changed in Settings --> "
+            "Output."
+        )
+        status_bar.config(text=status_text, foreground="red")
+        status_bar2.config(text="")
+        return
+    settings_error_check, error_message = settings_checker(settings)
+    if settings_error_check == "Error detected":
+        status_text = "ERROR: " + error_message
+        status_bar.config(text=status_text, foreground="red")
+        status_bar2.config(text="")
+        return
+    # Find the earliest analysis stage affected by changed settings, and the output files to rewrite
+
+    changed_settings = [
+        setting for setting in setting_stages if settings.get(setting) != session_cache["settings"].get(setting)
+    ]
+    changed_stages = [setting_stages[setting] for setting in changed_settings]
+    if "Temperature (K)" in changed_settings and settings["Boltz energy type"] == "Quasi-RRHO free energy":
+        changed_stages.append("deduplicate")  # Recomputed free energies are used to find redundant conformers
+    first_stage = min(changed_stages, key=analysis_stages.index, default="output")
+    if not changed_stages:
+        outputs = analysis_outputs
+    elif first_stage == "output" or first_stage == "nmr":
+        outputs = tuple(
+            output
+            for setting in changed_settings
+            if setting_stages[setting] == "output"
+            for output in output_setting_files[setting]
+        )
+        if first_stage == "nmr":
+            outputs += nmr_stage_outputs
+    else:
+        outputs = analysis_outputs
+    if first_stage == "parse":  # Parsed data has changed, so start again
+        main(session_cache["filenames"])
+        return
+    # Rerun the affected analysis stages
+
+    status_text = "Recomputing results for " + session_cache["files text"] + "..."
+    status_bar.config(text=status_text, foreground="black")
+    status_bar2.config(text="")
     root.update()
+    analysed_data = session_cache["analysed data"]
+    if first_stage == "deduplicate":
+        deduplicated_data, data_analysis_error_check, error_message = conformer_deduplicator(
+            session_cache["parsed ensemble"],
+            dict(settings, **{"Skip excluding duplicate conformers from input files made from output files": False}),
+            mad_cache_path,
+        )
+        if data_analysis_error_check == "Error detected":
+            status_text = "ERROR: " + error_message
+            status_bar.config(text=status_text, foreground="red")
+            return
+        session_cache["deduplicated data"] = deduplicated_data
+    if first_stage == "deduplicate" or first_stage == "boltzmann":
+        analysed_data, data_analysis_error_check, error_message = boltzmann_analyser(
+            session_cache["deduplicated data"], settings
+        )
+        if data_analysis_error_check == "Error detected":
+            status_text = "ERROR: " + error_message
+            status_bar.config(text=status_text, foreground="red")
+            return
+    elif first_stage == "nmr":
+        analysed_data = chemical_shift_scaler(analysed_data, settings)
+    session_cache["analysed data"] = analysed_data
+    session_cache["settings"] = dict(settings)
+    analysis_file_writer(analysed_data, outputs, "Recomputed results for " + session_cache["files text"] + ".")
 
 
 def save_new_settings():
@@ -768,6 +1093,7 @@ def read_settings():
         "UV in ECD table": False,
         "NMR csv file": True,
         "Freq csv file": False,
+        "Energy sensitivity files": False,
         "SpecDis .cd.bil file": True,
         "SpecDis .uv.bil file": True,
         "SpecDis .vc.bil file": True,
@@ -782,15 +1108,35 @@ def read_settings():
         "Geometry reopt": True,
         "Energy cutoff (kcal/mol)": "0.1",
         "MAD cutoff (A)": "0.1",
+        "MAD atoms": "All atoms",
+        "MAD elements": "C, N, O",
+        "MAD atom mapping": "By element",
+        "Redundant conformer comparison": "Cartesian MAD",
+        "Torsion cutoff (degrees)": "10.0",
+        "Confirm torsion duplicates with MAD": True,
+        "Representative conformers": "0",
+        "Representative clustering": "k-medoids",
+        "Conformer library": False,
+        "Redundant conformer check processes": "0",
+        "Geometry hash tolerance (A)": "0.01",
+        "Reuse MADs from previous runs": True,
         "H slope": "",
         "H intercept": "",
         "C slope": "",
         "C intercept": "",
         "IR freq scaling factor": "",
         "Temperature (K)": "298.15",
+        "Temperature sweep (K)": "",
+        "Energy uncertainty samples": "0",
+        "Energy uncertainty (kcal/mol)": "1.0",
+        "Energy uncertainty distribution": "Normal",
+        "Energy uncertainty memory budget (MB)": "500",
         "Boltz energy type": "Gibbs free energy",
         "Input File Conformers Together": False,
         "Skip excluding duplicate conformers from input files made from output files": False,
+        "RDKit number of conformers": "300",
+        "RDKit MMFF optimisation": True,
+        "RDKit threads": "0",
         "Input File Texts": [
             "\n--Link1--",
             "%chk=⫷⫷⫷COMPOUND NAME⫸⫸⫸_conf-⫷⫷⫷CONFORMER NUMBER⫸⫸⫸.chk "
@@ -835,6 +1181,10 @@ def read_settings():
                     DOTALL,
                 )
                 settings["Input File Texts"] = multi_job_text + input_file_calcs
+        # Add default values for any settings missing from older settings files
+
+        for key, value in default_settings.items():
+            settings.setdefault(key, value)
     elif not os_path.isfile(settings_path):  # Write default settings to new settings file, then read it.
         settings = default_settings
         save_new_settings()
@@ -871,101 +1221,17 @@ def file_selection():
     global list_of_filenames
     list_of_filenames = filedialog.askopenfilenames(
         title="Select Files",
-        filetypes=[("Output File(s)", ".out .log"), ("XYZ File(s)", ".xyz"), ("SDF File(s)", ".sdf")],
+        filetypes=[
+            ("Output File(s)", ".out .log"),
+            ("XYZ File(s)", ".xyz"),
+            ("SDF File(s)", ".sdf"),
+            ("SMILES File", ".smi"),
+        ],
     )
     list_of_filenames = list(list_of_filenames)
     main(list_of_filenames)
 
 
-# Determine if application is running as a script file or frozen executable file.
-# This is useful for finding program files when launched via a shortcut.
-
-
-if getattr(sys, "frozen", False):
-    application_path = os_path.dirname(sys.executable)
-elif __file__:
-    application_path = os_path.dirname(__file__)
-# Set file paths for icon, manual and settings.
-
-
-global icon_path
-global manual_path
-global settings_path
-files_folder_path = os_path.join(application_path, "Files For SpectroIBIS")
-icon_path = os_path.join(files_folder_path, "SpectroIBIS_icon.ico")
-manual_path = os_path.join(files_folder_path, "SpectroIBIS Manual.pdf")
-settings_path = os_path.join(files_folder_path, "SpectroIBIS Settings.txt")
-settings = read_settings()
-# Launch GUI
-
-
-root = TkinterDnD.Tk()
-root.resizable(False, False)
-root.title("SpectroIBIS")
-root.geometry("400x363")
-try:
-    root.iconbitmap(icon_path)
-except:
-    raise FileNotFoundError(
-        "SpectroIBIS.exe could not find its icon file \"SpectroIBIS_icon.ico\" in a neighboring folder \"Files for "
-        "SpectroIBIS\". Try moving this SpectroIBIS.exe file back into its original unzipped folder."
-    )
-# Create a menu bar
-
-
-menu_bar = Menu(root)
-root.config(menu=menu_bar)
-
-# Create a file menu
-
-
-file_menu = Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="File", menu=file_menu)
-file_menu.add_command(label="Open", command=file_selection)
-
-
-# Create a box for user to drag and drop their files to
-
-
-drop_box = Text(root, height=14, width=48)
-drop_box.pack()
-if settings["Mode"] == "Analyse output files":
-    drop_box_text = """
-
-To analyse data:
-Drag and drop Gaussian/ORCA output files for
-all conformers of your compound here, together.
-
-
-OR
-
-
-To create input files:
-Drag and drop XYZ or SDF files instead.
-
-"""
-else:
-    drop_box_text = """
-
-
-
-
-
-To create input files:
-Drag and drop XYZ, SDF or output files here.
-
-
-
-
-
-"""
-drop_box.insert(END, drop_box_text, "center")
-drop_box.tag_configure("center", justify="center")
-drop_box.config(state="disabled")
-drop_box.configure(font=("Segoe UI", 12))
-drop_box.configure()
-
-
 def open_manual():
     """Opens the user manual PDF file."""
 
@@ -1032,6 +1298,7 @@ def output_window():
         settings["Relative energy unit"] = var11.get()
         settings["Write .xyz file"] = var12.get()
         settings["Freq csv file"] = var13.get()
+        settings["Energy sensitivity files"] = var15.get()
         settings["Mode"] = var14.get()
         if var14.get() == "Create input files":
             checkbox1.config(state="disabled")
@@ -1046,6 +1313,7 @@ def output_window():
             checkbox10.config(state="disabled")
             checkbox11.config(state="disabled")
             checkbox12.config(state="disabled")
+            checkbox13.config(state="disabled")
             radiobutton1.config(state="disabled")
             radiobutton2.config(state="disabled")
             boltz_data_frame.config(fg="grey")
@@ -1064,6 +1332,7 @@ def output_window():
             checkbox10.config(state="normal")
             checkbox11.config(state="normal")
             checkbox12.config(state="normal")
+            checkbox13.config(state="normal")
             radiobutton1.config(state="normal")
             radiobutton2.config(state="normal")
             boltz_data_frame.config(fg="black")
@@ -1129,6 +1398,7 @@ Drag and drop XYZ, SDF or output files here.
     var12 = BooleanVar()
     var13 = BooleanVar()
     var14 = StringVar()
+    var15 = BooleanVar()
     var1.set(settings["Energies and coordinates table"])
     var4.set(settings["NMR/ECD/VCD/OR table"])
     var4b.set(settings["UV in ECD table"])
@@ -1142,6 +1412,7 @@ Drag and drop XYZ, SDF or output files here.
     var12.set(settings["Write .xyz file"])
     var13.set(settings["Freq csv file"])
     var14.set(settings["Mode"])
+    var15.set(settings["Energy sensitivity files"])
 
     mode_frame = LabelFrame(window, text="What to do with Gaussian/ORCA output files")
     mode_frame.grid(row=0, column=1, sticky="w")
@@ -1238,6 +1509,14 @@ Drag and drop XYZ, SDF or output files here.
         command=get_parameters,
     )
     checkbox11.grid(row=5, column=1, sticky="w")
+    checkbox13 = Checkbutton(
+        other_files_frame,
+        text="Sensitivity of Boltzmann-averaged data to conformer energies in csv and npz files",
+        variable=var15,
+        anchor="w",
+        command=get_parameters,
+    )
+    checkbox13.grid(row=6, column=1, sticky="w")
     checkbox12 = Checkbutton(boltz_data_frame, text="IR csv file", variable=var13, anchor="w", command=get_parameters)
     checkbox12.grid(row=3, column=2, sticky="w")
 
@@ -1256,6 +1535,7 @@ Drag and drop XYZ, SDF or output files here.
         checkbox10.config(state="disabled")
         checkbox11.config(state="disabled")
         checkbox12.config(state="disabled")
+        checkbox13.config(state="disabled")
         radiobutton1.config(state="disabled")
         radiobutton2.config(state="disabled")
         boltz_data_frame.config(fg="grey")
@@ -1274,6 +1554,7 @@ Drag and drop XYZ, SDF or output files here.
         checkbox10.config(state="normal")
         checkbox11.config(state="normal")
         checkbox12.config(state="normal")
+        checkbox13.config(state="normal")
         radiobutton1.config(state="normal")
         radiobutton2.config(state="normal")
         boltz_data_frame.config(fg="black")
@@ -1288,6 +1569,11 @@ def energy_temperature_window():
     def get_parameters():
         """Retrieves newly entered settings and saves these to the settings text file."""
         settings["Temperature (K)"] = entry1.get()
+        settings["Temperature sweep (K)"] = entry2.get()
+        settings["Energy uncertainty samples"] = entry3.get()
+        settings["Energy uncertainty (kcal/mol)"] = entry4.get()
+        settings["Energy uncertainty distribution"] = var2.get()
+        settings["Energy uncertainty memory budget (MB)"] = entry5.get()
         settings["Boltz energy type"] = var1.get()
         save_new_settings()
 
@@ -1316,6 +1602,16 @@ def energy_temperature_window():
         command=get_parameters,
     )
     radiobutton2.grid(row=1, column=1, sticky="w")
+    radiobutton3 = Radiobutton(
+        frame,
+        text="Quasi-RRHO Gibbs free energy (recalculated at\nthe temperature below from E and frequencies)",
+        variable=var1,
+        value="Quasi-RRHO free energy",
+        anchor="w",
+        justify="left",
+        command=get_parameters,
+    )
+    radiobutton3.grid(row=3, column=1, sticky="w")
     space1 = Label(window, text="")
     space1.pack()
     label1 = Label(window, text="Temperature (K) for Boltzmann weighting")
@@ -1325,6 +1621,56 @@ def energy_temperature_window():
     entry1.pack()
     space2 = Label(window, text="")
     space2.pack()
+    label2 = Label(
+        window,
+        text="Temperature sweep (K), optional\nExtra .csv/.bil files for each temperature\n(e.g. 253.15, 273.15 or "
+        "250-350:25)",
+    )
+    label2.pack()
+    entry2 = Entry(window, justify="center")
+    entry2.insert(END, settings["Temperature sweep (K)"])
+    entry2.pack()
+    space4 = Label(window, text="")
+    space4.pack()
+    uncertainty_frame = LabelFrame(window, text="Energy Uncertainty (Monte Carlo)")
+    uncertainty_frame.pack()
+    label3 = Label(uncertainty_frame, text="Samples (0 = off)")
+    label3.grid(row=0, column=0)
+    entry3 = Entry(uncertainty_frame, justify="center")
+    entry3.insert(END, settings["Energy uncertainty samples"])
+    entry3.grid(row=1, column=0)
+    label4 = Label(uncertainty_frame, text="Energy error (kcal/mol)")
+    label4.grid(row=0, column=1)
+    entry4 = Entry(uncertainty_frame, justify="center")
+    entry4.insert(END, settings["Energy uncertainty (kcal/mol)"])
+    entry4.grid(row=1, column=1)
+    var2 = StringVar()
+    var2.set(settings["Energy uncertainty distribution"])
+    radiobutton4 = Radiobutton(
+        uncertainty_frame,
+        text="Normal (error = standard deviation)",
+        variable=var2,
+        value="Normal",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton4.grid(row=2, column=0, columnspan=2, sticky="w")
+    radiobutton5 = Radiobutton(
+        uncertainty_frame,
+        text="Uniform (error = maximum)",
+        variable=var2,
+        value="Uniform",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton5.grid(row=3, column=0, columnspan=2, sticky="w")
+    label5 = Label(uncertainty_frame, text="Memory budget (MB)")
+    label5.grid(row=4, column=0)
+    entry5 = Entry(uncertainty_frame, justify="center")
+    entry5.insert(END, settings["Energy uncertainty memory budget (MB)"])
+    entry5.grid(row=5, column=0)
+    space5 = Label(window, text="")
+    space5.pack()
     save_button = Button(window, text=" Save ", command=get_parameters)
     save_button.pack()
     space3 = Label(window, text="")
@@ -1390,8 +1736,20 @@ def duplicate_conformer_thresholds_window():
         """Retrieves newly entered settings and saves these to the settings text file."""
         settings["Energy cutoff (kcal/mol)"] = entry1.get()
         settings["MAD cutoff (A)"] = entry2.get()
+        settings["MAD atoms"] = var4.get()
+        settings["MAD elements"] = entry5.get()
+        settings["MAD atom mapping"] = var5.get()
+        settings["Redundant conformer comparison"] = var6.get()
+        settings["Torsion cutoff (degrees)"] = entry6.get()
+        settings["Confirm torsion duplicates with MAD"] = var7.get()
+        settings["Representative conformers"] = entry7.get()
+        settings["Representative clustering"] = var8.get()
+        settings["Conformer library"] = var9.get()
         settings["Duplicate conformer details"] = var1.get()
         settings["Check for dup confs in XYZ/SDF files"] = var2.get()
+        settings["Redundant conformer check processes"] = entry3.get()
+        settings["Geometry hash tolerance (A)"] = entry4.get()
+        settings["Reuse MADs from previous runs"] = var3.get()
         save_new_settings()
 
     window = Toplevel(root)
@@ -1411,6 +1769,85 @@ def duplicate_conformer_thresholds_window():
     entry2 = Entry(window, justify="center")
     entry2.insert(END, settings["MAD cutoff (A)"])
     entry2.grid(row=7, column=1)
+    frame1 = LabelFrame(window, text="Atoms compared")
+    frame1.grid(row=6, column=2, rowspan=2, padx=5)
+    var4 = StringVar()
+    var4.set(settings["MAD atoms"])
+    radiobutton1 = Radiobutton(
+        frame1, text="All atoms", variable=var4, value="All atoms", anchor="w", command=get_parameters
+    )
+    radiobutton1.grid(row=1, column=1, sticky="w")
+    radiobutton2 = Radiobutton(
+        frame1, text="Heavy atoms only", variable=var4, value="Heavy atoms", anchor="w", command=get_parameters
+    )
+    radiobutton2.grid(row=2, column=1, sticky="w")
+    radiobutton3 = Radiobutton(
+        frame1, text="Only these elements:", variable=var4, value="Element subset", anchor="w", command=get_parameters
+    )
+    radiobutton3.grid(row=3, column=1, sticky="w")
+    entry5 = Entry(frame1, justify="center")
+    entry5.insert(END, settings["MAD elements"])
+    entry5.grid(row=4, column=1)
+    frame2 = LabelFrame(window, text="Map atoms onto")
+    frame2.grid(row=3, column=2, rowspan=3, padx=5)
+    var5 = StringVar()
+    var5.set(settings["MAD atom mapping"])
+    radiobutton4 = Radiobutton(
+        frame2,
+        text="Any atom of the same element",
+        variable=var5,
+        value="By element",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton4.grid(row=1, column=1, sticky="w")
+    radiobutton5 = Radiobutton(
+        frame2,
+        text="Symmetry-equivalent atoms only\n(from bonding)",
+        variable=var5,
+        value="By bonding symmetry",
+        anchor="w",
+        justify="left",
+        command=get_parameters,
+    )
+    radiobutton5.grid(row=2, column=1, sticky="w")
+    frame3 = LabelFrame(window, text="Compare conformers by")
+    frame3.grid(row=11, column=2, rowspan=4, padx=5)
+    var6 = StringVar()
+    var6.set(settings["Redundant conformer comparison"])
+    radiobutton6 = Radiobutton(
+        frame3,
+        text="Aligned geometries (MAD)",
+        variable=var6,
+        value="Cartesian MAD",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton6.grid(row=1, column=1, sticky="w")
+    radiobutton7 = Radiobutton(
+        frame3,
+        text="Rotatable torsions",
+        variable=var6,
+        value="Torsion fingerprint",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton7.grid(row=2, column=1, sticky="w")
+    label7 = Label(frame3, text="Torsion cutoff (degrees)")
+    label7.grid(row=3, column=1)
+    entry6 = Entry(frame3, justify="center")
+    entry6.insert(END, settings["Torsion cutoff (degrees)"])
+    entry6.grid(row=4, column=1)
+    var7 = BooleanVar()
+    var7.set(settings["Confirm torsion duplicates with MAD"])
+    checkbox4 = Checkbutton(
+        frame3,
+        text="Confirm torsion duplicates by MAD",
+        variable=var7,
+        anchor="w",
+        command=get_parameters,
+    )
+    checkbox4.grid(row=5, column=1, sticky="w")
     space2 = Label(window, text="")
     space2.grid(row=8, column=1)
     var1 = BooleanVar()
@@ -1433,6 +1870,58 @@ def duplicate_conformer_thresholds_window():
         command=get_parameters,
     )
     checkbox2.grid(row=12, column=1, sticky="w")
+    label5 = Label(window, text="CPU processes for .xyz/.sdf files\n(0 = all available)")
+    label5.grid(row=13, column=1)
+    entry3 = Entry(window, justify="center")
+    entry3.insert(END, settings["Redundant conformer check processes"])
+    entry3.grid(row=14, column=1)
+    label6 = Label(window, text="Tolerance for quick check of\nidentical geometries\n(angstroms, 0 = off)")
+    label6.grid(row=15, column=1)
+    entry4 = Entry(window, justify="center")
+    entry4.insert(END, settings["Geometry hash tolerance (A)"])
+    entry4.grid(row=16, column=1)
+    var3 = BooleanVar()
+    var3.set(settings["Reuse MADs from previous runs"])
+    checkbox3 = Checkbutton(
+        window,
+        text="Reuse MADs calculated in previous runs\n(faster reruns with new thresholds)",
+        variable=var3,
+        anchor="w",
+        command=get_parameters,
+    )
+    checkbox3.grid(row=17, column=1, sticky="w")
+    label8 = Label(window, text="Representative conformers to keep\nfrom .xyz/.sdf files (0 = all)")
+    label8.grid(row=18, column=1)
+    entry7 = Entry(window, justify="center")
+    entry7.insert(END, settings["Representative conformers"])
+    entry7.grid(row=19, column=1)
+    frame4 = LabelFrame(window, text="Pick representatives by")
+    frame4.grid(row=18, column=2, rowspan=2, padx=5)
+    var8 = StringVar()
+    var8.set(settings["Representative clustering"])
+    radiobutton8 = Radiobutton(
+        frame4, text="k-medoids", variable=var8, value="k-medoids", anchor="w", command=get_parameters
+    )
+    radiobutton8.grid(row=1, column=1, sticky="w")
+    radiobutton9 = Radiobutton(
+        frame4,
+        text="Hierarchical clustering (average linkage)",
+        variable=var8,
+        value="Hierarchical",
+        anchor="w",
+        command=get_parameters,
+    )
+    radiobutton9.grid(row=2, column=1, sticky="w")
+    var9 = BooleanVar()
+    var9.set(settings["Conformer library"])
+    checkbox5 = Checkbutton(
+        window,
+        text="Skip .xyz/.sdf conformers already written to\ninput files (per-compound conformer library)",
+        variable=var9,
+        anchor="w",
+        command=get_parameters,
+    )
+    checkbox5.grid(row=20, column=1, sticky="w")
     space3 = Label(window, text="")
     space3.grid(row=10, column=1)
     save_button = Button(window, text=" Save ", command=get_parameters)
@@ -1478,7 +1967,7 @@ def input_file_writer_window(
         settings["Input File Texts"] = input_file_texts
         global compound_name
         compound_name = filename_entry.get()
-        if len(data) != 6:  # This means data is from .out/.log files
+        if isinstance(data, EnsembleAnalysis):  # This means data is from .out/.log files
             settings["Geometry reopt relative energy threshold"] = entry0_var.get()
             settings["Geometry reopt relative energy unit"] = var_unit.get()
             settings["Geometry reopt"] = var_reopt.get()
@@ -1533,8 +2022,8 @@ def input_file_writer_window(
             return
         if var1.get() is True:
             filename_label.configure(text="Compound name: ")
-            if len(data) != 6 and var_reopt.get() is True:  # This means data is from output files and an energy window
-                # is selected
+            if isinstance(data, EnsembleAnalysis) and var_reopt.get() is True:  # This means data is from output files
+                # and an energy window is selected
 
                 filename_label2_text = filename_entry.get() + "_" + str(entry0.get()) + str(var_unit.get()) + ".inp"
             else:
@@ -1545,8 +2034,8 @@ def input_file_writer_window(
             Button2.configure(text=" Save template & create input file ")
         elif var1.get() is False:
             filename_label_text = "Filenames: "
-            if len(data) != 6 and var_reopt.get() is True:  # This means data is from output files and an energy window
-                # is selected
+            if isinstance(data, EnsembleAnalysis) and var_reopt.get() is True:  # This means data is from output files
+                # and an energy window is selected
 
                 filename_label2_text = (
                     filename_entry.get()
@@ -1560,7 +2049,7 @@ def input_file_writer_window(
             filename_label2.configure(text=filename_label2_text)
             filename_label3.configure(text=filename_label_text)
             Button2.configure(text=" Save template & create input files ")
-        if len(data) != 6:  # This means data is from .out/.log files
+        if isinstance(data, EnsembleAnalysis):  # This means data is from .out/.log files
             # Find number of confs below energy threshold
 
             rel_energy_threshold = float(entry0_var.get())
@@ -1574,7 +2063,7 @@ def input_file_writer_window(
                 and settings["Relative energy unit"] == "kJ/mol"
             ):
                 rel_energy_threshold = rel_energy_threshold * 4.184
-            number_confs_above_threshold = str(sum(i > rel_energy_threshold for i in data[1]))
+            number_confs_above_threshold = str(sum(data.ensemble.relative_energies > rel_energy_threshold))
             if number_confs_above_threshold == "1":
                 reopt_tick.configure(
                     text=number_confs_above_threshold + " unique conformer with relative energy above this\nvalue will "
@@ -1599,7 +2088,7 @@ def input_file_writer_window(
             no_dup_conf_exclusion_box.pack_forget()
             message_height = 0
             if keep_imag_freq_flag != "proceed without exclusion":
-                if not data[50] or var1.get() is True:
+                if not len(data.ensemble.conformer_suffixes) or var1.get() is True:
                     if multi_out_file_flag == "Multiple output files" and var1.get() is False:
                         incompatibility_frame.grid(row=199, column=1)
                         incompatibility_label.pack()
@@ -1648,7 +2137,8 @@ def input_file_writer_window(
                         incompatibility_label.configure(text=incompatibility_text)
                         message_height = 95
                     elif (
-                        data[32] or settings["Geometry reopt"] is True and int(number_confs_above_threshold) > 0
+                        data.duplicate_conformers
+                        or settings["Geometry reopt"] is True and int(number_confs_above_threshold) > 0
                     ):  # If dup or high-energy conformers are going to be
                         # removed (i.e., conf ordering changed)
 
@@ -1656,13 +2146,15 @@ def input_file_writer_window(
                         incompatibility_label.pack()
                         incompatibility_text = "CAUTION: Backwards-incompatible!\nExcluding "
                         a = ""
-                        if data[32]:  # Dup confs to be removed
-                            if int(data[32][0]) == 1:
-                                a += str(data[32][0]) + " redundant conformer "
-                            elif int(data[32][0]) > 1:
-                                a += str(data[32][0]) + " redundant conformers "
+                        if data.duplicate_conformers:  # Dup confs to be removed
+                            if int(data.duplicate_conformers[0]) == 1:
+                                a += str(data.duplicate_conformers[0]) + " redundant conformer "
+                            elif int(data.duplicate_conformers[0]) > 1:
+                                a += str(data.duplicate_conformers[0]) + " redundant conformers "
                         if (
-                            data[32] and settings["Geometry reopt"] is True and int(number_confs_above_threshold) > 0
+                            data.duplicate_conformers
+                            and settings["Geometry reopt"] is True
+                            and int(number_confs_above_threshold) > 0
                         ):  # both
                             a += "and "
                         if (
@@ -1741,7 +2233,7 @@ def input_file_writer_window(
             del all_entries[-1]
             add_calc_count -= 5
         inp_window_height = 440 + 192 * (int(add_calc_count / 5) - 1)
-        if len(data) != 6:  # This means data is from .out/.log files
+        if isinstance(data, EnsembleAnalysis):  # This means data is from .out/.log files
             inp_window_height += 96 + message_height
         inp_window_geom = "703x" + str(inp_window_height)
         inp_writer_window.geometry(inp_window_geom)
@@ -1774,7 +2266,7 @@ def input_file_writer_window(
         calc_section = [frame]
         calc_sections.append(calc_section)
         inp_window_height = 440 + 192 * (int(add_calc_count / 5) - 1)
-        if len(data) != 6:  # This means data is from .out/.log files
+        if isinstance(data, EnsembleAnalysis):  # This means data is from .out/.log files
             inp_window_height += 96 + message_height
         inp_window_geom = "703x" + str(inp_window_height)
         inp_writer_window.geometry(inp_window_geom)
@@ -1808,25 +2300,27 @@ def input_file_writer_window(
 
     # Add option to exclude high-energy conformers
 
-    if len(data) != 6:  # This means data is from .out/.log files
-        intro_message = str(len(data[0])) + " total"
+    if isinstance(data, EnsembleAnalysis):  # This means data is from .out/.log files
+        intro_message = str(len(data.ensemble)) + " total"
         global program_error_result
         if "program_error_result" in globals():
             if program_error_result == "proceed without exclusion":  # This means imag freq confs were detected and user
                 # has selected to not exclude them.
 
-                number_imag_freq_confs = data[53]
-                intro_message = str(len(data[0]) + number_imag_freq_confs) + " total"
-        if data[32]:  # dup confs present
-            if data[32][0] == "1":
-                intro_message += ", excluding " + str(data[32][0]) + " redundant conformer"
+                number_imag_freq_confs = data.imaginary_frequency_removals
+                intro_message = str(len(data.ensemble) + number_imag_freq_confs) + " total"
+        if data.duplicate_conformers:  # dup confs present
+            if data.duplicate_conformers[0] == "1":
+                intro_message += ", excluding " + str(data.duplicate_conformers[0]) + " redundant conformer"
             else:
-                intro_message += ", excluding " + str(data[32][0]) + " redundant conformers"
+                intro_message += ", excluding " + str(data.duplicate_conformers[0]) + " redundant conformers"
         if keep_imag_freq_flag == "proceed without exclusion":
-            if data[32]:  # dup confs present
-                intro_message = str(len(data[0]) + number_imag_freq_confs + int(data[32][0])) + " total"
+            if data.duplicate_conformers:  # dup confs present
+                intro_message = (
+                    str(len(data.ensemble) + number_imag_freq_confs + int(data.duplicate_conformers[0])) + " total"
+                )
             else:
-                intro_message = str(len(data[0]) + number_imag_freq_confs) + " total"
+                intro_message = str(len(data.ensemble) + number_imag_freq_confs) + " total"
         var_reopt = BooleanVar()
         var_reopt.set(settings["Geometry reopt"])
         var_unit = StringVar()
@@ -1864,7 +2358,7 @@ def input_file_writer_window(
             "Relative energy unit"] == "kJ/mol"
         ):
             rel_energy_threshold = rel_energy_threshold * 4.184
-        number_confs_above_threshold = str(sum(i > rel_energy_threshold for i in data[1]))
+        number_confs_above_threshold = str(sum(data.ensemble.relative_energies > rel_energy_threshold))
         reopt_tick = Checkbutton(
             reopt_frame3,
             variable=var_reopt,
@@ -1914,13 +2408,13 @@ def input_file_writer_window(
         conformer_renumber_frame = LabelFrame(inp_inner_frame, borderwidth=0, highlightthickness=0)
         conformer_renumber_text = ""
         conformer_renumber_label = Label(conformer_renumber_frame, text=conformer_renumber_text)
-    if len(data) == 6:  # This means data is from .xyz/.sdf files
-        intro_message = str(len(data[0][0])) + " total"
-        if data[5]:  # dup confs present
-            if data[5][0] == "1":
-                intro_message += ", excluding " + str(data[5][0]) + " redundant conformer"
+    if isinstance(data, GeometryEnsemble):  # This means data is from .xyz/.sdf files
+        intro_message = str(len(data.elements)) + " total"
+        if data.duplicate_conformers:  # dup confs present
+            if data.duplicate_conformers[0] == "1":
+                intro_message += ", excluding " + str(data.duplicate_conformers[0]) + " redundant conformer"
             else:
-                intro_message += ", excluding " + str(data[5][0]) + " redundant conformers"
+                intro_message += ", excluding " + str(data.duplicate_conformers[0]) + " redundant conformers"
     intro_label = Label(
         inp_inner_frame,
         text="Please enter input file details into the template below.\nThis template will be used "
@@ -2000,51 +2494,233 @@ def input_file_writer_window(
     return inp_window_user_decision, compound_name
 
 
-# Create an info menu
+def conformer_generation_window():
+    """Opens a window where the user can generate conformers with RDKit (from a SMILES string or a single-structure
+    .sdf/.smi file), then create input files for these conformers."""
+
+    def get_parameters():
+        """Retrieves newly entered settings and saves these to the settings text file."""
+        settings["RDKit number of conformers"] = entry2.get()
+        settings["RDKit threads"] = entry3.get()
+        settings["RDKit MMFF optimisation"] = var1.get()
+        save_new_settings()
+
+    def browse_structure_file():
+        """Opens a file selection window for a .sdf/.smi structure file."""
+        structure_file = filedialog.askopenfilename(
+            title="Select File", filetypes=[("SDF File", ".sdf"), ("SMILES File", ".smi")]
+        )
+        if structure_file:
+            entry1.delete(0, END)
+            entry1.insert(END, structure_file)
+
+    def generate_conformers():
+        """Starts conformer generation and input file creation."""
+        get_parameters()
+        structure = entry1.get().strip()
+        if structure == "":
+            return
+        if structure.endswith(".sdf") or structure.endswith(".smi"):
+            results_directory = ""
+            suggested_filename = search("/([^/]+)$", structure).group(1).removesuffix(".sdf").removesuffix(".smi")
+        else:  # SMILES string, so ask the user where to save input file(s)
+            directory = filedialog.askdirectory(title="Select Folder For Input File(s)")
+            if not directory:
+                return
+            results_directory = directory + "/Molecule"
+            suggested_filename = ""
+        window.destroy()
+        rdkit_conformer_creation(structure, results_directory, suggested_filename)
+
+    window = Toplevel(root)
+    window.title("Generate Conformers (RDKit)")
+    window.iconbitmap(icon_path)
+    label1 = Label(window, text="SMILES string, or single-structure .sdf/.smi file")
+    label1.grid(row=1, column=1, columnspan=2)
+    entry1 = Entry(window, width=50)
+    entry1.grid(row=2, column=1)
+    browse_button = Button(window, text=" Browse... ", command=browse_structure_file)
+    browse_button.grid(row=2, column=2)
+    space1 = Label(window, text="")
+    space1.grid(row=3, column=1)
+    label2 = Label(window, text="Number of conformers to embed (ETKDG)")
+    label2.grid(row=4, column=1, columnspan=2)
+    entry2 = Entry(window, justify="center")
+    entry2.insert(END, settings["RDKit number of conformers"])
+    entry2.grid(row=5, column=1, columnspan=2)
+    label3 = Label(window, text="Number of CPU threads (0 = all available)")
+    label3.grid(row=6, column=1, columnspan=2)
+    entry3 = Entry(window, justify="center")
+    entry3.insert(END, settings["RDKit threads"])
+    entry3.grid(row=7, column=1, columnspan=2)
+    var1 = BooleanVar()
+    var1.set(settings["RDKit MMFF optimisation"])
+    checkbox1 = Checkbutton(
+        window,
+        text="Optimise conformers with MMFF",
+        variable=var1,
+        anchor="w",
+        command=get_parameters,
+    )
+    checkbox1.grid(row=8, column=1, columnspan=2)
+    space2 = Label(window, text="")
+    space2.grid(row=9, column=1)
+    generate_button = Button(window, text=" Generate conformers and create input files ", command=generate_conformers)
+    generate_button.grid(row=10, column=1, columnspan=2)
+    space3 = Label(window, text="")
+    space3.grid(row=11, column=1)
+
+
+# Launch SpectroIBIS. The main guard stops worker processes (used for redundant conformer checks) from launching the
+# GUI again, as they re-import this file when started with "spawn" (e.g. on Windows).
+
 
+if __name__ == "__main__":
+    freeze_support()  # Needed for worker processes in the frozen SpectroIBIS.exe
+    # Determine if application is running as a script file or frozen executable file.
+    # This is useful for finding program files when launched via a shortcut.
 
-info_menu = Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="Info", menu=info_menu)
-info_menu.add_command(label="User Manual (PDF)", command=open_manual)
-info_menu.add_command(label="About", command=open_about_window)
 
-# Create a settings menu
+    if getattr(sys, "frozen", False):
+        application_path = os_path.dirname(sys.executable)
+    elif __file__:
+        application_path = os_path.dirname(__file__)
+    # Set file paths for icon, manual and settings.
 
 
-settings_menu = Menu(menu_bar, tearoff=0)
-menu_bar.add_cascade(label="Settings", menu=settings_menu)
-settings_menu.add_command(label="Output", command=output_window)
-settings_menu.add_command(label="Redundant Conformers", command=duplicate_conformer_thresholds_window)
-settings_menu.add_command(label="Scaling Factors", command=scaling_factors_settings_window)
-settings_menu.add_command(label="Energy & Temperature", command=energy_temperature_window)
+    global icon_path
+    global manual_path
+    global settings_path
+    global mad_cache_path
+    global conformer_library_folder
+    files_folder_path = os_path.join(application_path, "Files For SpectroIBIS")
+    icon_path = os_path.join(files_folder_path, "SpectroIBIS_icon.ico")
+    manual_path = os_path.join(files_folder_path, "SpectroIBIS Manual.pdf")
+    settings_path = os_path.join(files_folder_path, "SpectroIBIS Settings.txt")
+    mad_cache_path = os_path.join(files_folder_path, "SpectroIBIS MAD Cache.sqlite")
+    conformer_library_folder = os_path.join(files_folder_path, "SpectroIBIS Conformer Library")
+    settings = read_settings()
+    session_cache = {}  # Data from the last analysis of output files, reused by File --> Recompute
+    # Launch GUI
+
+
+    root = TkinterDnD.Tk()
+    root.resizable(False, False)
+    root.title("SpectroIBIS")
+    root.geometry("400x363")
+    try:
+        root.iconbitmap(icon_path)
+    except:
+        raise FileNotFoundError(
+            "SpectroIBIS.exe could not find its icon file \"SpectroIBIS_icon.ico\" in a neighboring folder \"Files for "
+            "SpectroIBIS\". Try moving this SpectroIBIS.exe file back into its original unzipped folder."
+        )
+    # Create a menu bar
+
 
+    menu_bar = Menu(root)
+    root.config(menu=menu_bar)
 
-# Create a status bar
+    # Create a file menu
 
 
-status_text = ""
-if settings["Mode"] == "Create input files":
-    status_text = "Note: SpectroIBIS is currently set to create input file(s) from output files."
-status_bar = Label(root, text=status_text)
-status_bar.pack()
+    file_menu = Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="File", menu=file_menu)
+    file_menu.add_command(label="Open", command=file_selection)
+    file_menu.add_command(label="Recompute With Changed Settings", command=recompute)
 
-# Create a second status bar
 
+    # Create a box for user to drag and drop their files to
 
-status_text2 = ""
-if settings["Mode"] == "Create input files":
-    status_text2 = "This can be changed in Settings --> Output."  # Warn user that SpectroIBIS is set to create input
-    # files from .out/.log files
-status_bar2 = Label(root, text=status_text2)
-status_bar2.pack()
 
-# Make window drag-and-droppable
+    drop_box = Text(root, height=14, width=48)
+    drop_box.pack()
+    if settings["Mode"] == "Analyse output files":
+        drop_box_text = """
+
+To analyse data:
+Drag and drop Gaussian/ORCA output files for
+all conformers of your compound here, together.
+
+
+OR
+
+
+To create input files:
+Drag and drop XYZ or SDF files instead.
+
+"""
+    else:
+        drop_box_text = """
+
+
+
+
+
+To create input files:
+Drag and drop XYZ, SDF or output files here.
+
+
+
+
+
+"""
+    drop_box.insert(END, drop_box_text, "center")
+    drop_box.tag_configure("center", justify="center")
+    drop_box.config(state="disabled")
+    drop_box.configure(font=("Segoe UI", 12))
+    drop_box.configure()
+
+    # Add conformer generation to the file menu
+
+
+    file_menu.add_command(label="Generate Conformers (RDKit)", command=conformer_generation_window)
+
+    # Create an info menu
+
+
+    info_menu = Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="Info", menu=info_menu)
+    info_menu.add_command(label="User Manual (PDF)", command=open_manual)
+    info_menu.add_command(label="About", command=open_about_window)
+
+    # Create a settings menu
+
+
+    settings_menu = Menu(menu_bar, tearoff=0)
+    menu_bar.add_cascade(label="Settings", menu=settings_menu)
+    settings_menu.add_command(label="Output", command=output_window)
+    settings_menu.add_command(label="Redundant Conformers", command=duplicate_conformer_thresholds_window)
+    settings_menu.add_command(label="Scaling Factors", command=scaling_factors_settings_window)
+    settings_menu.add_command(label="Energy & Temperature", command=energy_temperature_window)
+
+
+    # Create a status bar
+
+
+    status_text = ""
+    if settings["Mode"] == "Create input files":
+        status_text = "Note: SpectroIBIS is currently set to create input file(s) from output files."
+    status_bar = Label(root, text=status_text)
+    status_bar.pack()
+
+    # Create a second status bar
+
+
+    status_text2 = ""
+    if settings["Mode"] == "Create input files":
+        status_text2 = "This can be changed in Settings --> Output."  # Warn user that SpectroIBIS is set to create input
+        # files from .out/.log files
+    status_bar2 = Label(root, text=status_text2)
+    status_bar2.pack()
+
+    # Make window drag-and-droppable
 
 
-root.drop_target_register(DND_FILES)
-root.dnd_bind("<<Drop>>", on_drop)
+    root.drop_target_register(DND_FILES)
+    root.dnd_bind("<<Drop>>", on_drop)
 
-# Start the tkinter main loop
+    # Start the tkinter main loop
 
 
-root.mainloop()
+    root.mainloop()
@@ -3,10 +3,39 @@
 
 
 from re import search, findall, sub, IGNORECASE, DOTALL, MULTILINE
-from rdkit.Chem import MolFromXYZBlock, rdMolTransforms  # Version 2025.9.3
+from rdkit.Chem import GetPeriodicTable  # Version 2025.9.3
 import numpy as np  # Version 2.2.6
-from scipy.optimize import linear_sum_assignment  # Version 1.15.3
-from scipy.spatial import distance as scipy_distance
+from scipy.sparse import csr_matrix  # Version 1.15.3
+from scipy.sparse.csgraph import connected_components
+from conformer_comparison import (
+    mad_atom_subset,
+    symmetry_permutation_store,
+    aligned_geometry_store,
+    mad_lower_bound_store,
+    geometry_hash_duplicate_finder,
+    geometry_fingerprint_store,
+    fingerprint_candidate_pairs,
+    pair_mad_lower_bounds,
+    torsion_fingerprint_store,
+    torsion_candidate_pairs,
+    parallel_duplicate_pair_finder,
+    pairwise_mad_matrix,
+    k_medoids_clustering,
+    hierarchical_clustering,
+    condensed_matrix_rows,
+    library_conformer_adder,
+    conformer_library_file,
+    conformer_library_loader,
+    library_duplicate_finder,
+    ordinal_conformer_number,
+    duplicate_cluster_store,
+    conformer_cluster_root,
+    duplicate_cluster_merger,
+    kept_conformer_numbers,
+    duplicate_conformer_summary,
+)
+from conformer_ensemble import conformer_ensemble_builder, GeometryEnsemble
+from data_analysis import sweep_temperature_list
 
 
 # Parses Gaussian or ORCA output files. Uses a list of filenames as input.
@@ -159,37 +188,7 @@ def parse(list_of_filepaths, settings):
         if filename.endswith(".out") is False and filename.endswith(".log") is False:
             parser_error_check = "Error detected"
             error_message = "Incorrect file format, or mixed file formats (e.g. *.out and *.xyz)."
-            return (
-                "",
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                0,
-                parser_error_check,
-                0,
-                error_message,
-            )
+            return None, parser_error_check, error_message, "", ""
     # Produce a list of filenames ordered by conformer, if separate comp chem output files for the same conformer are
     # present.
 
@@ -381,37 +380,7 @@ def parse(list_of_filepaths, settings):
                     "Could not recognise contents of output file(s).\nCheck file contents are standard for "
                     "Gaussian/ORCA output files. "
                 )
-                return (
-                    "",
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    parser_error_check,
-                    0,
-                    error_message,
-                )
+                return None, parser_error_check, error_message, "", ""
         # Check if dedicated single-point energy calcs are present, extract theory level and energies
 
         sp_calc_details = findall(sp_calc_details_regex, data, IGNORECASE | DOTALL)
@@ -660,7 +629,7 @@ def parse(list_of_filepaths, settings):
                 x = float(i)
                 energies.append(x)
                 opt_freq_energies.append(x)
-        if opt_calc_details and settings["Boltz energy type"] == "Electronic energy":
+        if opt_calc_details and settings["Boltz energy type"] in ("Electronic energy", "Quasi-RRHO free energy"):
             data_no_EOL = data.replace("\n ", "")
             if gaussian:
                 end_sections = findall(r"1\\1\\.*?\\\\@|1\|1\|.*?\|\|@", data_no_EOL, DOTALL)
@@ -1067,7 +1036,7 @@ def parse(list_of_filepaths, settings):
                 conformer_optrot_data = findall(optrot_regex, section, DOTALL)
                 for rotation in conformer_optrot_data:
                     wavelength_angstroms = rotation[0]
-                    wavelength_nm = str(float(wavelength_angstroms) / 10)
+                    wavelength_nm = float(wavelength_angstroms) / 10
                     conformer_optrot_wavelengths.append(wavelength_nm)
                     optrot_strength = rotation[1]
                     conformer_optrot_strengths.append(optrot_strength)
@@ -1145,41 +1114,11 @@ def parse(list_of_filepaths, settings):
                         + str(len(Gibbs_corrections))
                         + " thermal corrections."
                 )
-                return (
-                    "",
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    0,
-                    parser_error_check,
-                    0,
-                    error_message,
-                )
+                return None, parser_error_check, error_message, "", ""
             for conformer_number, Gibbs_correction in enumerate(Gibbs_corrections):
                 energy = sp_energies[conformer_number] + float(Gibbs_correction)
                 energies.append(energy)
-        elif settings["Boltz energy type"] == "Electronic energy":
+        elif settings["Boltz energy type"] in ("Electronic energy", "Quasi-RRHO free energy"):
             energies = sp_energies
     # Create a filename for the final, analysed data to be saved as files under.
 
@@ -1526,7 +1465,7 @@ def parse(list_of_filepaths, settings):
         error_message = (
             "No geometries or vibrational frequencies found in file(s).\nPlease include opt & freq calculations for all conformers. "
         )
-    if not energies and settings["Boltz energy type"] == "Electronic energy":
+    if not energies and settings["Boltz energy type"] in ("Electronic energy", "Quasi-RRHO free energy"):
         parser_error_check = "Error detected"
         error_message = "No electronic energies found in file(s)."
     if list_of_conformer_suffixes and are_there_files_without_conf_suffix is True:
@@ -1576,14 +1515,107 @@ def parse(list_of_filepaths, settings):
     ):
         parser_error_check = "Error detected"
         error_message = "No relevant output files are selected in the output settings menu."
-    if not settings["Temperature (K)"].replace(".", "", 1).isdigit():
+    settings_error_check, settings_error_message = settings_checker(settings)
+    if settings_error_check == "Error detected":
+        parser_error_check = settings_error_check
+        error_message = settings_error_message
+    # Check every calculated spectroscopic property was extracted for every conformer
+
+    property_values = {
+        "frequencies": frequencies,
+        "ir_intensities": ir_intensities,
+        "wavelengths": wavelength_list,
+        "rotatory_strengths": rotatory_strength_list,
+        "oscillator_strengths": oscillator_strength_list,
+        "shielding_tensors": shielding_tensors,
+        "frequency_rotatory_strengths": frequency_rotatory_strengths,
+        "frequency_dipole_strengths": frequency_dipole_strengths,
+        "optrot_wavelengths": optrot_wavelengths,
+        "optrot_strengths": optrot_strengths,
+    }
+    if parser_error_check != "Error detected" and any(
+        values and len(values) != len(energies) for values in property_values.values()
+    ):
+        parser_error_check = "Error detected"
+        error_message = (
+            "Not all required spectroscopic data was extracted for every conformer.\nTry checking all calcs have "
+            "finished successfully."
+        )
+    if parser_error_check == "Error detected":
+        return None, parser_error_check, error_message, "", ""
+    ensemble = conformer_ensemble_builder(
+        energies,
+        element_list,
+        x_cartesian_coords_list,
+        y_cartesian_coords_list,
+        z_cartesian_coords_list,
+        property_values,
+        list_of_conformer_suffixes,
+        chk_conf_suffixes,
+        {
+            "sp": (sp_functional_and_basis_set, sp_solvent, sp_dispersion),
+            "opt freq": (opt_functional_and_basis_set, opt_solvent, opt_dispersion),
+            "nmr": (nmr_functional_and_basis_set, nmr_solvent, nmr_dispersion),
+            "tddft": (tddft_functional_and_basis_set, tddft_solvent, tddft_dispersion),
+            "or": (or_functional_and_basis_set, or_solvent, or_dispersion),
+        },
+        results_directory,
+        calc_software,
+        list_of_file_contents,
+    )
+
+    # Check conformer geometries for atom clashes, fragmentation and changed connectivity
+
+    geometry_issue_confs_text = ""
+    geometry_issue_confs, geometry_issues = geometry_checker(
+        ensemble.element_lists(),
+        ensemble.coordinates[:, :, 0],
+        ensemble.coordinates[:, :, 1],
+        ensemble.coordinates[:, :, 2],
+    )
+    ensemble.implausible_geometries[geometry_issue_confs] = True
+    for conf_index, geometry_issue in zip(geometry_issue_confs, geometry_issues):
+        if list_of_conformer_suffixes:
+            geometry_issue_conf_name = list_of_conformer_suffixes[conf_index]
+        else:
+            geometry_issue_conf_name = ordinal_conformer_number(conf_index + 1) + " conformer"
+        if geometry_issue_confs_text:
+            geometry_issue_confs_text += ", "
+        geometry_issue_confs_text += geometry_issue_conf_name + " (" + geometry_issue + ")"
+    if len(geometry_issue_confs) == len(ensemble):
         parser_error_check = "Error detected"
+        error_message = "All conformers have implausible geometries (atom clashes or broken bonds)!"
+    return ensemble, parser_error_check, error_message, imaginary_freq_confs_text, geometry_issue_confs_text
+
+
+def settings_checker(settings):
+    """Checks that number settings used in analysis (temperatures, energy uncertainty, redundant conformer cutoffs and
+    NMR scaling factors) are valid. Used by parse, and before rerunning analysis stages with changed settings."""
+
+    settings_error_check = "No error detected"
+    error_message = ""
+    if not settings["Temperature (K)"].replace(".", "", 1).isdigit():
+        settings_error_check = "Error detected"
         error_message = "The temperature setting contains a non-number value."
+    if (
+            not settings["Energy uncertainty samples"].isdigit()
+            or not settings["Energy uncertainty (kcal/mol)"].replace(".", "", 1).isdigit()
+            or not settings["Energy uncertainty memory budget (MB)"].replace(".", "", 1).isdigit()
+    ):
+        settings_error_check = "Error detected"
+        error_message = "The energy uncertainty settings contain a non-number value."
+    if sweep_temperature_list(settings["Temperature sweep (K)"]) is None:
+        settings_error_check = "Error detected"
+        error_message = (
+            "The temperature sweep setting is not a list or range of temperatures\n(e.g. 253.15, 273.15 or 250-350:25)."
+        )
     if (
             not settings["Energy cutoff (kcal/mol)"].replace(".", "", 1).isdigit()
             or not settings["MAD cutoff (A)"].replace(".", "", 1).isdigit()
+            or not settings["Geometry hash tolerance (A)"].replace(".", "", 1).isdigit()
+            or not settings["Torsion cutoff (degrees)"].replace(".", "", 1).isdigit()
     ):
-        parser_error_check = "Error detected"
+        settings_error_check = "Error detected"
         error_message = "The redundant conformer cutoff settings contain a non-number value."
     if (
             not settings["H slope"].replace(".", "", 1).replace("-", "", 1).isdigit()
@@ -1597,66 +1629,47 @@ def parse(list_of_filepaths, settings):
                 and settings["C slope"] == ""
                 and settings["C intercept"] == ""
         ):
-            parser_error_check = "Error detected"
+            settings_error_check = "Error detected"
             error_message = "The NMR scaling factor settings contain a non-number value."
-    return (
-        energies,
-        element_list,
-        x_cartesian_coords_list,
-        y_cartesian_coords_list,
-        z_cartesian_coords_list,
-        wavelength_list,
-        rotatory_strength_list,
-        shielding_tensors,
-        frequencies,
-        coordinates_block_list,
-        sp_functional_and_basis_set,
-        sp_solvent,
-        sp_dispersion,
-        opt_functional_and_basis_set,
-        opt_solvent,
-        opt_dispersion,
-        nmr_functional_and_basis_set,
-        nmr_solvent,
-        nmr_dispersion,
-        tddft_functional_and_basis_set,
-        tddft_solvent,
-        tddft_dispersion,
-        all_coordinates_texts,
-        results_directory,
-        oscillator_strength_list,
-        list_of_conformer_suffixes,
-        parser_error_check,
-        imaginary_freq_confs_text,
-        error_message,
-        frequency_rotatory_strengths,
-        optrot_wavelengths,
-        optrot_strengths,
-        frequency_dipole_strengths,
-        or_functional_and_basis_set,
-        or_solvent,
-        or_dispersion,
-        ir_intensities,
-        chk_conf_suffixes,
-        list_of_file_contents,
-        calc_software,
-    )
+    return settings_error_check, error_message
+
+
+def redundant_conformer_settings_checker(settings):
+    """Checks that settings used in redundant conformer checks of .xyz/.sdf (or RDKit-generated) conformers are
+    valid. Used by xyz_sdf_parser and rdkit_conformer_generator."""
+
+    settings_error_check = "No error detected"
+    error_message = ""
+    if not settings["Redundant conformer check processes"].isdigit():
+        settings_error_check = "Error detected"
+        error_message = "The redundant conformer CPU processes setting must be a whole number."
+    elif not settings["Geometry hash tolerance (A)"].replace(".", "", 1).isdigit():
+        settings_error_check = "Error detected"
+        error_message = "The geometry hash tolerance setting contains a non-number value."
+    elif not settings["Torsion cutoff (degrees)"].replace(".", "", 1).isdigit():
+        settings_error_check = "Error detected"
+        error_message = "The torsion cutoff setting contains a non-number value."
+    elif not settings["Representative conformers"].isdigit():
+        settings_error_check = "Error detected"
+        error_message = "The number of representative conformers must be a whole number (0 keeps all)."
+    return settings_error_check, error_message
 
 
 # Parses XYZ and SDF files, extracts conformer Cartesian coordinates (+ other data for input file creation)
 # and checks for redundant conformers and some common (user) errors
 
 
-def xyz_sdf_parser(list_of_filepaths, settings):
+def xyz_sdf_parser(list_of_filepaths, settings, conformer_library_folder=""):
     """Extracts atom coordinates from XYZ/SDF files (as a list of file paths),
-    then performs some error checks and removes redundant conformers."""
+    then performs some error checks and removes redundant conformers (and conformers already in the conformer
+    library, if used). Returns a GeometryEnsemble (None if an error was detected), an error status and an error
+    message."""
     # Define lists
 
     elements = []
     x_coords = []
     y_coords = []
     z_coords = []
-    parsed_geometry_data = []
     total_number_atoms = []
 
     # Set default value for error status
@@ -1688,7 +1701,7 @@ def xyz_sdf_parser(list_of_filepaths, settings):
                     "Conformer order in .xyz file is different to its original .out/.log file.\nUse"
                     " a different .xyz/.sdf/.out/.log file to avoid mismatching conformer data."
                 )
-                return [], parser_error_check, error_message
+                return None, parser_error_check, error_message
             with open(filename, "r") as f:
                 new_text = f.read()
                 if filename.endswith(".xyz"):
@@ -1696,7 +1709,7 @@ def xyz_sdf_parser(list_of_filepaths, settings):
                     if len(set(number_atoms)) != 1:
                         parser_error_check = "Error detected"
                         error_message = "Inconsistent number of atoms in conformers in .xyz file."
-                        return [], parser_error_check, error_message
+                        return None, parser_error_check, error_message
                     num_atoms = number_atoms[0]
                     conformer_regex = (
                         r"(?:\n[ \t]*\w+[ \t]+-?\d+\.\d+[ \t]+-?\d+\.\d+[ \t]+-?\d+\.\d+){" + str(num_atoms) + "}"
@@ -1709,7 +1722,7 @@ def xyz_sdf_parser(list_of_filepaths, settings):
                     if len(set(number_atoms)) != 1:
                         parser_error_check = "Error detected"
                         error_message = "Inconsistent number of atoms in conformers in .sdf file."
-                        return [], parser_error_check, error_message
+                        return None, parser_error_check, error_message
                     conformer_regex = (
                         r"(?:[ \t]+-?\d+\.\d+[ \t]+-?\d+\.\d+[ \t]+-?\d+\.\d+[ \t]+\w+(?:[ \t]+-?\d+)*\n)+ "
                     )
@@ -1726,7 +1739,7 @@ def xyz_sdf_parser(list_of_filepaths, settings):
                 "Inconsistent number of atoms in selected .xyz/.sdf file(s).\nCheck selected file(s) "
                 "contain the same compound. "
             )
-            return [], parser_error_check, error_message
+            return None, parser_error_check, error_message
         # Extract conformer geometries
 
         conformers = findall(conformer_regex, text)
@@ -1753,7 +1766,11 @@ def xyz_sdf_parser(list_of_filepaths, settings):
             y_coords.insert(index, conf_y_coords)
             z_coords.insert(index, conf_z_coords)
     except:
-        return "Error detected", "Unable to read *.xyz / *.sdf file(s).\n Please check for issues in these file(s)."
+        return (
+            None,
+            "Error detected",
+            "Unable to read *.xyz / *.sdf file(s).\n Please check for issues in these file(s).",
+        )
     a = []
     for h, i in enumerate(elements):
         if h > 0:
@@ -1763,200 +1780,390 @@ def xyz_sdf_parser(list_of_filepaths, settings):
                     "Inconsistent chemical element lists in selected file(s).\nCheck selected file(s) "
                     "contain the same compound. "
                 )
-                return [], parser_error_check, error_message
+                return None, parser_error_check, error_message
         a = i
 
-    # Define function for building XYZ file format strings for a given conformer number, then creating an RDKit molecule
-
-
-    def RDKitMoleculeMaker(conformer_number):
-        """Function for building XYZ file format strings for a given conformer number,
-        then creating an RDKit molecule."""  # For convenience, this code was simply ported from data_analysis.py
-        xyz_block = ""
-        for i in range(-2, len(elements[conformer_number])):
-            if i == -2:
-                xyz_block += str(len(elements[conformer_number]))
-            elif i == -1:
-                xyz_block += "\nMolecule"
-            elif i > -1:
-                if float(x_coords[conformer_number][i]) >= 0:
-                    x = "      " + str(x_coords[conformer_number][i])
-                else:
-                    x = "     " + str(x_coords[conformer_number][i])
-                if float(y_coords[conformer_number][i]) >= 0:
-                    y = "      " + str(y_coords[conformer_number][i])
-                else:
-                    y = "     " + str(y_coords[conformer_number][i])
-                if float(z_coords[conformer_number][i]) >= 0:
-                    z = "      " + str(z_coords[conformer_number][i])
-                else:
-                    z = "     " + str(z_coords[conformer_number][i])
-                x += "0" * abs(18 - len(x))
-                y += "0" * abs(18 - len(y))
-                z += "0" * abs(18 - len(z))
-                xyz_block += "\n  " + str(elements[conformer_number][i]) + x + y + z
-        mol = MolFromXYZBlock(xyz_block)
-        return mol
-
-    # Define function for finding optimal atom mapping for aligned conformers, using the Hungarian algorithm
-
-
-    def maximum_atom_deviation_calculator(conf_a, conf_b):
-        """Function to find the maximum atom deviation between two conformers.
-        1) Aligns conformers by principal coordinates, based on their moments of inertia.
-        2) Finds optimal atom mapping (lowest atom deviations) for two aligned conformers
-        (considering all 8 axis reflections), using the Hungarian algorithm.
-        3) Returns the maximum atom deviation for this optimal atom mapping."""
-        # Align conformers by principal coordinates, based on their moments of inertia
-
-        mol_a = RDKitMoleculeMaker(conf_number_a)
-        mol_b = RDKitMoleculeMaker(conf_number_b)
-        rdMolTransforms.CanonicalizeMol(mol_a)
-        rdMolTransforms.CanonicalizeMol(mol_b)
-
-        # Construct a list of lists of atom coordinates for conformer A - one list per element.
-
-        unique_elements = set(atom.GetSymbol() for atom in mol_a.GetAtoms())
-        mol_a_all_element_coords_list = []
-        for element in unique_elements:
-            element_coords_list = []
-            for l, atom in enumerate(mol_a.GetAtoms()):
-                position = mol_a.GetConformer().GetAtomPosition(l)
-                if atom.GetSymbol() == element:
-                    element_coords_list.append([position.x, position.y, position.z])
-            mol_a_all_element_coords_list.append(element_coords_list)
-
-        # Calculate atomic distances between aligned geometries using Hungarian algorithm, considering axis reflections
-
-        all_mads = []
-        for i in range(1, -2, -2):
-            for j in range(1, -2, -2):
-                for k in range(1, -2, -2):
-                    aligned_conformer_atom_deviations = []
-                    for x, element in enumerate(unique_elements):
-                        mol_b_coords_list = []
-                        for l, atom in enumerate(mol_b.GetAtoms()):
-                            position = mol_b.GetConformer().GetAtomPosition(l)
-                            if atom.GetSymbol() == element:
-                                mol_b_coords_list.append([(position.x * i), (position.y * j), (position.z * k)])
-                        mol_a_coords_array = np.array(mol_a_all_element_coords_list[x])
-                        mol_b_coords_array = np.array(mol_b_coords_list)
-                        distance_matrix = scipy_distance.cdist(mol_a_coords_array, mol_b_coords_array, 'euclidean')
-                        row_ind, col_ind = linear_sum_assignment(distance_matrix)
-                        atom_deviations = distance_matrix[row_ind, col_ind]
-                        aligned_conformer_atom_deviations.extend(atom_deviations.tolist())
-                    all_mads.append(max(aligned_conformer_atom_deviations))
-        return min(all_mads)
-
     # Check for redundant conformers (purely based on Cartesian coordinates, energies not considered).
 
     if settings["Check for dup confs in XYZ/SDF files"] is True:
-        # Find pairs of conformers with similar or identical geometries
-
-        number_of_confs = len(elements)
-        mad_threshold = float(settings["MAD cutoff (A)"])
-        duplicate_conformers = []
-        dup_conf_numbers = []
-        duplicate_conf_details = []
-        for conf_number_a, element in enumerate(elements):
-            removals = 0
-            for conf_number_b in range(number_of_confs):
-                conf_number_b = conf_number_b - removals
-                if conf_number_b + 1 > len(elements):
-                    break
-                if conf_number_a < conf_number_b:
-                    maximum_atom_deviation = maximum_atom_deviation_calculator(conf_number_a, conf_number_b)
-                    if maximum_atom_deviation < mad_threshold:
-                        # Record which conformer(s) were duplicates
-
-                        restart_loop = True  # Count the number of removed confs with lower conf numbers
-                        new_dup_conf_number = conf_number_b + 1
-                        y = []
-                        while restart_loop is True:
-                            x = 0
-                            for number in dup_conf_numbers:
-                                if number not in y and number <= new_dup_conf_number:
-                                    y.append(number)
-                                    new_dup_conf_number += 1
-                                    x += 1
-                                    restart_loop = True
-                                    break
-                            if x == 0:
-                                restart_loop = False
-                        restart_loop = True  # Count the number of removed confs with lower conf numbers
-                        new_duplicated_conf_number = conf_number_a + 1
-                        y = []
-                        while restart_loop is True:
-                            x = 0
-                            for number in dup_conf_numbers:
-                                if number not in y and number <= new_duplicated_conf_number:
-                                    y.append(number)
-                                    new_duplicated_conf_number += 1
-                                    x += 1
-                                    restart_loop = True
-                                    break
-                            if x == 0:
-                                restart_loop = False
-                        dup_conf_name = new_dup_conf_number
-                        dup_conf_numbers.append(dup_conf_name)
-                        duplicated_conf_name = new_duplicated_conf_number
-                        if str(dup_conf_name).endswith("1") and not str(dup_conf_name).endswith("11"):
-                            dup_conf_name = str(dup_conf_name) + "st"
-                        elif str(dup_conf_name).endswith("2") and not str(dup_conf_name).endswith("12"):
-                            dup_conf_name = str(dup_conf_name) + "nd"
-                        elif str(dup_conf_name).endswith("3") and not str(dup_conf_name).endswith("13"):
-                            dup_conf_name = str(dup_conf_name) + "rd"
-                        else:
-                            dup_conf_name = str(dup_conf_name) + "th"
-                        if str(duplicated_conf_name).endswith("1") and not str(duplicated_conf_name).endswith("11"):
-                            duplicated_conf_name = str(duplicated_conf_name) + "st"
-                        elif str(duplicated_conf_name).endswith("2") and not str(duplicated_conf_name).endswith("12"):
-                            duplicated_conf_name = str(duplicated_conf_name) + "nd"
-                        elif str(duplicated_conf_name).endswith("3") and not str(duplicated_conf_name).endswith("13"):
-                            duplicated_conf_name = str(duplicated_conf_name) + "rd"
-                        else:
-                            duplicated_conf_name = str(duplicated_conf_name) + "th"
-                        duplicate_conformers.append(dup_conf_name)
-                        if settings["Duplicate conformer details"] is True:
-                            dup_conf_text = (
-                                str(dup_conf_name)
-                                + " conformer is a duplicate of "
-                                + str(duplicated_conf_name)
-                                + ":\nMAD = "
-                                + str(maximum_atom_deviation)
-                                + " angstroms\n"
-                            )
-                            duplicate_conf_details.append(dup_conf_text)
-                        # Remove duplicate conformer from data
-
-                        del elements[conf_number_b]
-                        del x_coords[conf_number_b]
-                        del y_coords[conf_number_b]
-                        del z_coords[conf_number_b]
-                        removals += 1  # This is because indices of remaining conformers are now reduced by 1,
-                        # by removing the last conformer
-        a = len(duplicate_conformers)
-        if a > 0:
-            b = ""
-            c = ""
-            for i, dup in enumerate(duplicate_conformers):
-                dup = dup.removesuffix(".out")
-                dup = dup.removesuffix(".log")
-                b += dup
-                if i + 1 != a:
-                    b += ", "
-            if a > 1:
-                c = "s"
-            duplicate_conformers = [str(a), b, c]
-        parsed_geometry_data.extend([elements, x_coords, y_coords, z_coords])
+        parser_error_check, error_message = redundant_conformer_settings_checker(settings)
+        if parser_error_check == "Error detected":
+            return None, parser_error_check, error_message
+        (
+            elements,
+            x_coords,
+            y_coords,
+            z_coords,
+            duplicate_clusters,
+            duplicate_conformers,
+            mad_pair_statistics,
+        ) = duplicate_conformer_remover(elements, x_coords, y_coords, z_coords, settings)
+        elements, x_coords, y_coords, z_coords = library_duplicate_remover(
+            elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, conformer_library_folder
+        )
+        duplicate_conformers = duplicate_conformer_summary(duplicate_clusters)
+        parser_error_check, error_message, elements, x_coords, y_coords, z_coords = representative_conformer_selector(
+            elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, results_directory
+        )
+        if parser_error_check == "Error detected":
+            return None, parser_error_check, error_message
         return (
-            parsed_geometry_data,
+            GeometryEnsemble(
+                elements,
+                x_coords,
+                y_coords,
+                z_coords,
+                results_directory,
+                duplicate_clusters,
+                duplicate_conformers,
+                mad_pair_statistics,
+            ),
             parser_error_check,
             error_message,
-            results_directory,
-            duplicate_conf_details,
-            duplicate_conformers,
         )
+    return (
+        GeometryEnsemble(elements, x_coords, y_coords, z_coords, results_directory),
+        parser_error_check,
+        error_message,
+    )
+
+
+# Checks for redundant conformers (purely based on Cartesian coordinates, energies not considered). Used for
+# conformers extracted from .xyz/.sdf files and for conformers generated with RDKit.
+
+
+def duplicate_conformer_remover(elements, x_coords, y_coords, z_coords, settings):
+    """Finds pairs of conformers with similar or identical geometries and removes the redundant conformers
+    from the element and coordinate lists."""
+
+    # Align each conformer once (using only the atoms chosen for MAD calculations), and store its atom coordinates by
+    # element for MAD calculations
+
+    mad_elements, mad_x_coords, mad_y_coords, mad_z_coords = mad_atom_subset(
+        elements, x_coords, y_coords, z_coords, settings
+    )
+    aligned_geometries = aligned_geometry_store(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+    symmetry_permutations = None
+    if settings["MAD atom mapping"] == "By bonding symmetry":
+        symmetry_permutations = symmetry_permutation_store(elements, x_coords, y_coords, z_coords, settings)
+    number_of_confs = len(elements)
+    mad_threshold = float(settings["MAD cutoff (A)"])
+    early_exit_mad_threshold = None  # Exact MADs are only needed for the redundant conformer .txt file
+    if settings["Duplicate conformer details"] is False:
+        early_exit_mad_threshold = mad_threshold
+    duplicate_clusters = duplicate_cluster_store(
+        [ordinal_conformer_number(conf_number + 1) for conf_number in range(number_of_confs)]
+    )
+
+    # Remove exact and near-exact duplicates first with a geometry hash, so these don't need MAD calculations
+
+    for conf_number_a, conf_number_b, maximum_atom_deviation in geometry_hash_duplicate_finder(
+        aligned_geometries, float(settings["Geometry hash tolerance (A)"]), mad_threshold
+    ):
+        duplicate_cluster_merger(
+            duplicate_clusters,
+            conf_number_a,
+            conf_number_b,
+            maximum_atom_deviation,
+            duplicate_check_stage="geometry hash",
+        )
+    remaining_confs = kept_conformer_numbers(duplicate_clusters)
+    remaining_aligned_geometries = [aligned_geometries[conf_number] for conf_number in remaining_confs]
+    lower_bound_descriptors = mad_lower_bound_store(mad_elements, remaining_aligned_geometries)
+
+    # Find candidate pairs of the remaining conformers from a spatial index over geometry fingerprints, skipping pairs
+    # ruled out by cheap lower bounds on their MADs (without looping over all conformer pairs). If conformers are
+    # compared by rotatable torsions, candidate pairs are pairs with similar torsion fingerprints instead
+
+    torsion_angles = None
+    if settings["Redundant conformer comparison"] == "Torsion fingerprint":
+        torsion_angles = torsion_fingerprint_store(elements, x_coords, y_coords, z_coords)
+    if torsion_angles is not None:
+        candidate_pairs, torsion_differences = torsion_candidate_pairs(
+            torsion_angles[remaining_confs], float(settings["Torsion cutoff (degrees)"])
+        )
+        number_of_compared_pairs = len(candidate_pairs)
+        if settings["Confirm torsion duplicates with MAD"] is True:
+            candidate_pairs = candidate_pairs[
+                pair_mad_lower_bounds(lower_bound_descriptors, candidate_pairs, symmetry_permutations is not None)
+                < mad_threshold
+            ]
+    else:
+        fingerprints = geometry_fingerprint_store(mad_elements, lower_bound_descriptors)
+        candidate_pairs = fingerprint_candidate_pairs(
+            lower_bound_descriptors, fingerprints, mad_threshold, symmetry_permutations is not None
+        )
+        number_of_compared_pairs = len(remaining_confs) * (len(remaining_confs) - 1) // 2
+    number_of_pruned_pairs = number_of_compared_pairs - len(candidate_pairs)
+
+    # Find pairs of conformers with similar or identical geometries (split across processes for large ensembles).
+    # Without MAD confirmation, pairs with similar torsion fingerprints are duplicates, and no MADs are calculated
+
+    if torsion_angles is not None and settings["Confirm torsion duplicates with MAD"] is False:
+        duplicate_pairs = [
+            (int(remaining_conf_a), int(remaining_conf_b), float(torsion_difference), "torsion fingerprint")
+            for (remaining_conf_a, remaining_conf_b), torsion_difference in zip(candidate_pairs, torsion_differences)
+        ]
+        number_of_compared_pairs = 0
+        number_of_pruned_pairs = 0
+    else:
+        duplicate_pairs = parallel_duplicate_pair_finder(
+            remaining_aligned_geometries,
+            candidate_pairs,
+            mad_threshold,
+            early_exit_mad_threshold,
+            int(settings["Redundant conformer check processes"]),
+            symmetry_permutations,
+        )
+
+    # Go through duplicate pairs in order of appearance, so that the first conformer of a pair is kept. Duplicates are
+    # grouped by original conformer number, so conformers can be named without renumbering after removals
+
+    for remaining_conf_a, remaining_conf_b, maximum_atom_deviation, duplicate_check_stage in duplicate_pairs:
+        conf_number_a = remaining_confs[remaining_conf_a]
+        conf_number_b = remaining_confs[remaining_conf_b]
+        if (
+            conformer_cluster_root(duplicate_clusters, conf_number_a) != conf_number_a
+            or conformer_cluster_root(duplicate_clusters, conf_number_b) != conf_number_b
+        ):
+            continue
+        duplicate_cluster_merger(
+            duplicate_clusters,
+            conf_number_a,
+            conf_number_b,
+            maximum_atom_deviation,
+            duplicate_check_stage=duplicate_check_stage,
+        )
+
+    # Remove duplicate conformers from data
+
+    kept_confs = kept_conformer_numbers(duplicate_clusters)
+    elements = [elements[conf_number] for conf_number in kept_confs]
+    x_coords = [x_coords[conf_number] for conf_number in kept_confs]
+    y_coords = [y_coords[conf_number] for conf_number in kept_confs]
+    z_coords = [z_coords[conf_number] for conf_number in kept_confs]
+    duplicate_conformers = duplicate_conformer_summary(duplicate_clusters)
+    mad_pair_statistics = [number_of_compared_pairs, number_of_pruned_pairs]
+    return elements, x_coords, y_coords, z_coords, duplicate_clusters, duplicate_conformers, mad_pair_statistics
+
+
+# Removes conformers that are duplicates of conformers already in the compound's conformer library (e.g. conformers
+# submitted in a previous project iteration). Used for conformers extracted from .xyz/.sdf files and for conformers
+# generated with RDKit.
+
+
+def library_duplicate_remover(
+    elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, conformer_library_folder
+):
+    """Checks non-redundant conformers against the compound's conformer library (only against the library, as
+    conformers within the ensemble have already been compared), then removes conformers already in the library.
+    These conformers are recorded in duplicate_clusters as duplicates of the library conformer."""
+
+    if not conformer_library_folder or settings["Conformer library"] is False or not elements:
+        return elements, x_coords, y_coords, z_coords
+    library = conformer_library_loader(
+        conformer_library_file(conformer_library_folder, elements, x_coords, y_coords, z_coords), elements, settings
+    )[0]
+    if library is None:  # An unusable library file is reported when conformers are added (conformer_library_updater)
+        return elements, x_coords, y_coords, z_coords
+
+    # Align new conformers as for duplicate checks, then find duplicates among nearby library conformers
+
+    mad_elements, mad_x_coords, mad_y_coords, mad_z_coords = mad_atom_subset(
+        elements, x_coords, y_coords, z_coords, settings
+    )
+    aligned_geometries = aligned_geometry_store(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+    lower_bound_descriptors = mad_lower_bound_store(mad_elements, aligned_geometries)
+    symmetry_permutations = None
+    if settings["MAD atom mapping"] == "By bonding symmetry":
+        symmetry_permutations = symmetry_permutation_store(elements, x_coords, y_coords, z_coords, settings)
+    library_duplicates = library_duplicate_finder(
+        library,
+        aligned_geometries,
+        lower_bound_descriptors,
+        geometry_fingerprint_store(mad_elements, lower_bound_descriptors),
+        float(settings["MAD cutoff (A)"]),
+        symmetry_permutations,
+    )
+
+    # Record library duplicates by their original conformer numbers, then remove them from data
+
+    original_conf_numbers = kept_conformer_numbers(duplicate_clusters)
+    library_conformers = {}
+    for conf_number, library_conf_number, maximum_atom_deviation, duplicate_check_stage in library_duplicates:
+        if library_conf_number not in library_conformers:
+            library_conformers[library_conf_number] = library_conformer_adder(
+                duplicate_clusters, str(library["labels"][library_conf_number]) + " (conformer library)"
+            )
+        duplicate_cluster_merger(
+            duplicate_clusters,
+            library_conformers[library_conf_number],
+            original_conf_numbers[conf_number],
+            maximum_atom_deviation,
+            duplicate_check_stage="conformer library, " + duplicate_check_stage,
+        )
+    new_confs = sorted(set(range(len(elements))) - {conf_number for conf_number, *rest in library_duplicates})
+    elements = [elements[conf_number] for conf_number in new_confs]
+    x_coords = [x_coords[conf_number] for conf_number in new_confs]
+    y_coords = [y_coords[conf_number] for conf_number in new_confs]
+    z_coords = [z_coords[conf_number] for conf_number in new_confs]
+    return elements, x_coords, y_coords, z_coords
+
+
+# Picks representative conformers (cluster medoids) from a pairwise MAD matrix, so that fewer input files are needed.
+# Used for conformers extracted from .xyz/.sdf files and for conformers generated with RDKit.
+
+
+def representative_conformer_selector(
+    elements, x_coords, y_coords, z_coords, settings, duplicate_clusters, results_directory
+):
+    """Calculates the pairwise MAD matrix of all non-redundant conformers (saved as a .npy file), clusters the
+    conformers with k-medoids or hierarchical clustering, then keeps only the cluster medoids. Other conformers are
+    recorded in duplicate_clusters as represented by their medoid (with their MAD to it)."""
+
+    number_of_representatives = int(settings["Representative conformers"])
+    if number_of_representatives < 1 or len(elements) <= number_of_representatives:
+        return "No error detected", "", elements, x_coords, y_coords, z_coords
+
+    # Calculate the pairwise MAD matrix (split across processes), stored in a memory-mapped file
+
+    mad_elements, mad_x_coords, mad_y_coords, mad_z_coords = mad_atom_subset(
+        elements, x_coords, y_coords, z_coords, settings
+    )
+    aligned_geometries = aligned_geometry_store(mad_elements, mad_x_coords, mad_y_coords, mad_z_coords)
+    symmetry_permutations = None
+    if settings["MAD atom mapping"] == "By bonding symmetry":
+        symmetry_permutations = symmetry_permutation_store(elements, x_coords, y_coords, z_coords, settings)
+    try:
+        mad_matrix = pairwise_mad_matrix(
+            aligned_geometries,
+            results_directory + " MAD Matrix.npy",
+            int(settings["Redundant conformer check processes"]),
+            symmetry_permutations,
+        )
+    except OSError:
+        return (
+            "Error detected",
+            "Unable to save the pairwise MAD matrix .npy file.\nTry closing this file, then drag and drop your files "
+            "again.",
+            elements,
+            x_coords,
+            y_coords,
+            z_coords,
+        )
+
+    # Cluster conformers, then keep only cluster medoids. Conformers are named by their original conformer numbers
+
+    if settings["Representative clustering"] == "Hierarchical":
+        medoids, conformer_medoids = hierarchical_clustering(mad_matrix, len(elements), number_of_representatives)
+        clustering_stage = "hierarchical clustering"
     else:
-        parsed_geometry_data.extend([elements, x_coords, y_coords, z_coords])
-        return parsed_geometry_data, parser_error_check, error_message, results_directory, [], []
+        medoids, conformer_medoids = k_medoids_clustering(mad_matrix, len(elements), number_of_representatives)
+        clustering_stage = "k-medoids clustering"
+    original_conf_numbers = kept_conformer_numbers(duplicate_clusters)
+    medoid_mads = dict(zip(medoids, condensed_matrix_rows(mad_matrix, len(elements), medoids)))
+    for conf_number, medoid in enumerate(conformer_medoids):
+        if conf_number != medoid:
+            duplicate_cluster_merger(
+                duplicate_clusters,
+                original_conf_numbers[medoid],
+                original_conf_numbers[conf_number],
+                round(float(medoid_mads[medoid][conf_number]), 6),  # MADs are stored as float32
+                duplicate_check_stage=clustering_stage,
+            )
+    del mad_matrix
+    elements = [elements[conf_number] for conf_number in medoids]
+    x_coords = [x_coords[conf_number] for conf_number in medoids]
+    y_coords = [y_coords[conf_number] for conf_number in medoids]
+    z_coords = [z_coords[conf_number] for conf_number in medoids]
+    return "No error detected", "", elements, x_coords, y_coords, z_coords
+
+
+# Checks conformer geometries for atom clashes, fragmentation and changes in connectivity (bonding), all conformers at
+# once. Used for conformers extracted from Gaussian/ORCA output files.
+
+
+def geometry_checker(element_list, x_coords, y_coords, z_coords):
+    """Flags conformers with physically implausible geometries. Bonds are assigned from covalent radii, using
+    interatomic distance matrices calculated for all conformers in batched NumPy operations. The most common bonding
+    pattern across all conformers is used as the reference topology. Returns a list of flagged conformer indices
+    and a matching list of descriptions of the problem(s) found for each of these conformers."""
+
+    flagged_confs = []
+    flagged_conf_problems = []
+    if not element_list or len(set(tuple(conformer) for conformer in element_list)) > 1:
+        return flagged_confs, flagged_conf_problems
+    try:
+        coords = np.stack(
+            (
+                np.array(x_coords, dtype=np.float64),
+                np.array(y_coords, dtype=np.float64),
+                np.array(z_coords, dtype=np.float64),
+            ),
+            axis=-1,
+        )
+        covalent_radii = np.array([GetPeriodicTable().GetRcovalent(element) for element in element_list[0]])
+    except (ValueError, RuntimeError):  # Ragged coordinate lists or unknown elements - other checks deal with these
+        return flagged_confs, flagged_conf_problems
+    number_of_confs, number_of_atoms = coords.shape[0], coords.shape[1]
+    if number_of_atoms < 2:
+        return flagged_confs, flagged_conf_problems
+
+    # Define squared distance thresholds for bonded and clashing atom pairs
+
+    radii_sums = covalent_radii[:, None] + covalent_radii[None, :]
+    bond_thresholds = (1.25 * radii_sums) ** 2
+    clash_thresholds = (0.6 * radii_sums) ** 2
+    np.fill_diagonal(clash_thresholds, -1.0)  # Never compare atoms with themselves
+    atom_i, atom_j = np.triu_indices(number_of_atoms, 1)
+
+    # Calculate squared interatomic distances for blocks of conformers (to limit memory use), then pack bonds into bits
+
+    coords -= coords.mean(axis=1, keepdims=True)
+    block_size = max(1, 4_000_000 // (number_of_atoms * number_of_atoms))
+    packed_bonds = np.empty((number_of_confs, (len(atom_i) + 7) // 8), dtype=np.uint8)
+    clashes = np.zeros(number_of_confs, dtype=bool)
+    for start in range(0, number_of_confs, block_size):
+        block = coords[start:start + block_size]
+        squared_norms = np.einsum("cai,cai->ca", block, block)
+        squared_distances = np.matmul(block, block.transpose(0, 2, 1))
+        squared_distances *= -2
+        squared_distances += squared_norms[:, :, None]
+        squared_distances += squared_norms[:, None, :]
+        packed_bonds[start:start + block_size] = np.packbits(
+            (squared_distances < bond_thresholds)[:, atom_i, atom_j], axis=1
+        )
+        clashes[start:start + block_size] = (squared_distances < clash_thresholds).any(axis=(1, 2))
+
+    # Find the reference topology (most common bonding pattern) and count molecular fragments for each unique topology
+
+    topology_numbers = {}
+    topology_of_conf = np.empty(number_of_confs, dtype=np.intp)
+    for conf_index, conf_bonds in enumerate(packed_bonds):
+        topology_of_conf[conf_index] = topology_numbers.setdefault(conf_bonds.tobytes(), len(topology_numbers))
+    reference_topology = int(np.argmax(np.bincount(topology_of_conf)))
+    number_of_fragments = []
+    for topology in topology_numbers:
+        bonds = np.unpackbits(np.frombuffer(topology, dtype=np.uint8), count=len(atom_i)).astype(bool)
+        adjacency = csr_matrix(
+            (np.ones(int(bonds.sum()), dtype=np.int8), (atom_i[bonds], atom_j[bonds])),
+            shape=(number_of_atoms, number_of_atoms),
+        )
+        number_of_fragments.append(connected_components(adjacency, directed=False)[0])
+    number_of_fragments = np.array(number_of_fragments)
+    fragmented = number_of_fragments[topology_of_conf] > number_of_fragments[reference_topology]
+    connectivity_changed = (topology_of_conf != reference_topology) & ~fragmented
+
+    # Record flagged conformers
+
+    for conf_index in np.flatnonzero(clashes | fragmented | connectivity_changed):
+        problems = []
+        if clashes[conf_index]:
+            problems.append("atom clash")
+        if fragmented[conf_index]:
+            problems.append("fragmented")
+        if connectivity_changed[conf_index]:
+            problems.append("changed connectivity")
+        flagged_confs.append(int(conf_index))
+        flagged_conf_problems.append(" & ".join(problems))
+    return flagged_confs, flagged_conf_problems
@@ -0,0 +1,126 @@
+# Module containing functions which recompute conformer thermochemistry (Gibbs free energy corrections) from parsed
+# geometries and vibrational frequencies, so Gibbs free energies can be found at any temperature without rerunning
+# frequency calculations. Vibrational entropies use Grimme's quasi-rigid-rotor-harmonic-oscillator (quasi-RRHO)
+# approximation (Chem. Eur. J. 2012, 18, 9955), which treats low-frequency modes as free rotors.
+
+# Import modules
+
+
+from rdkit.Chem import GetPeriodicTable
+import numpy as np
+
+
+# Define physical constants (CODATA 2018, SI units)
+
+planck_constant = 6.62607015e-34  # J s
+boltzmann_constant = 1.380649e-23  # J/K
+avogadro_constant = 6.02214076e23  # 1/mol
+speed_of_light = 2.99792458e10  # cm/s
+atomic_mass_unit = 1.66053906660e-27  # kg
+gas_constant = boltzmann_constant * avogadro_constant  # J/(mol K)
+standard_pressure = 101325.0  # Pa (1 atm, as used by Gaussian and ORCA)
+hartree_to_Jmol = 2625499.6394799
+average_moment_of_inertia = 1e-44  # kg m^2, limits free rotor moments of inertia (Grimme's B_av)
+
+
+def atomic_masses(elements):
+    """Returns the mass (kg) of the most common isotope of each element, as used in Gaussian/ORCA frequency
+    calculations."""
+
+    periodic_table = GetPeriodicTable()
+    return np.array([periodic_table.GetMostCommonIsotopeMass(str(element)) for element in elements]) * atomic_mass_unit
+
+
+def principal_moments_of_inertia(masses, coordinates):
+    """Calculates the principal moments of inertia (kg m^2, in increasing order) of every conformer at once, from
+    atom masses (kg) and coordinates (Angstroms) of shape (conformers, atoms, 3)."""
+
+    coordinates = coordinates * 1e-10  # Convert from Angstroms to metres
+    centre_of_mass = np.einsum("a,cai->ci", masses, coordinates) / masses.sum()
+    coordinates = coordinates - centre_of_mass[:, np.newaxis, :]
+    second_moments = np.einsum("a,cai,caj->cij", masses, coordinates, coordinates)
+    inertia_tensors = np.trace(second_moments, axis1=1, axis2=2)[:, np.newaxis, np.newaxis] * np.eye(3) - second_moments
+    return np.linalg.eigvalsh(inertia_tensors)
+
+
+def quasi_rrho_free_energy_corrections(
+    elements, coordinates, frequencies, temperatures, symmetry_number=1, cutoff_frequency=100.0
+):
+    """Calculates thermal corrections to Gibbs free energies (G - E, in hartrees) of all conformers at all given
+    temperatures (K) at once, returned with shape (temperatures, conformers). Includes zero-point energy and
+    translational, rotational and vibrational enthalpies and entropies of an ideal gas at 1 atm. Vibrational entropies
+    use the quasi-RRHO approximation: each mode is a mix of a harmonic oscillator and a free rotor, weighted towards the
+    free rotor below the cutoff frequency (cm^-1). Imaginary frequencies (and NaN padding) are ignored. Conformers are
+    assumed to be closed-shell singlets with rotational symmetry number 1 (C1), unless a symmetry number is given."""
+
+    temperatures = np.asarray(temperatures, dtype=np.float64).reshape(-1, 1)  # Shape (temperatures, 1)
+    masses = atomic_masses(elements)
+    RT = gas_constant * temperatures
+
+    # Translational contributions (Sackur-Tetrode equation)
+
+    thermal_wavelength_term = (2 * np.pi * masses.sum() * boltzmann_constant * temperatures / planck_constant**2) ** 1.5
+    translational_entropy = gas_constant * (
+        np.log(thermal_wavelength_term * boltzmann_constant * temperatures / standard_pressure) + 2.5
+    )
+    translational_energy = 1.5 * RT
+
+    # Rotational contributions (rigid rotor), for non-linear and linear conformers (single atoms have none)
+
+    moments_of_inertia = principal_moments_of_inertia(masses, coordinates)  # Shape (conformers, 3)
+    rotational_temperatures = planck_constant**2 / (
+        8 * np.pi**2 * np.maximum(moments_of_inertia, 1e-70) * boltzmann_constant
+    )
+    linear = moments_of_inertia[:, 0] < 1e-3 * moments_of_inertia[:, 2]
+    single_atom = moments_of_inertia[:, 2] < 1e-70
+    nonlinear_rotational_entropy = gas_constant * (
+        np.log(np.sqrt(np.pi) / symmetry_number * np.sqrt(temperatures**3 / rotational_temperatures.prod(axis=1)))
+        + 1.5
+    )
+    linear_rotational_entropy = gas_constant * (
+        np.log(temperatures / (symmetry_number * rotational_temperatures[:, 2])) + 1
+    )
+    rotational_entropy = np.where(linear, linear_rotational_entropy, nonlinear_rotational_entropy)
+    rotational_energy = np.where(linear, RT, 1.5 * RT)
+    rotational_entropy = np.where(single_atom, 0.0, rotational_entropy)
+    rotational_energy = np.where(single_atom, 0.0, rotational_energy)
+
+    # Vibrational contributions, with arrays of shape (temperatures, conformers, modes)
+
+    real_modes = np.nan_to_num(frequencies, nan=-1.0) > 0
+    wavenumbers = np.where(real_modes, frequencies, 1.0)
+    vibrational_temperatures = planck_constant * speed_of_light * wavenumbers / boltzmann_constant
+    zero_point_energy = np.where(real_modes, 0.5 * gas_constant * vibrational_temperatures, 0.0).sum(axis=1)
+    x = vibrational_temperatures / temperatures[:, :, np.newaxis]
+    with np.errstate(over="ignore"):
+        vibrational_energy = gas_constant * vibrational_temperatures / np.expm1(x)
+        harmonic_entropy = gas_constant * (x / np.expm1(x) - np.log(-np.expm1(-x)))
+    vibrational_moments_of_inertia = planck_constant / (8 * np.pi**2 * speed_of_light * wavenumbers)
+    reduced_moments_of_inertia = (
+        vibrational_moments_of_inertia
+        * average_moment_of_inertia
+        / (vibrational_moments_of_inertia + average_moment_of_inertia)
+    )
+    free_rotor_entropy = gas_constant * (
+        0.5
+        + np.log(
+            np.sqrt(
+                8
+                * np.pi**3
+                * reduced_moments_of_inertia
+                * boltzmann_constant
+                * temperatures[:, :, np.newaxis]
+                / planck_constant**2
+            )
+        )
+    )
+    harmonic_weights = 1 / (1 + (cutoff_frequency / wavenumbers) ** 4)
+    vibrational_entropy = harmonic_weights * harmonic_entropy + (1 - harmonic_weights) * free_rotor_entropy
+    vibrational_energy = np.where(real_modes, vibrational_energy, 0.0).sum(axis=2)
+    vibrational_entropy = np.where(real_modes, vibrational_entropy, 0.0).sum(axis=2)
+
+    # Combine contributions (H = ZPE + thermal energy + RT, G = H - TS), then convert from J/mol to hartrees
+
+    enthalpy_correction = zero_point_energy + translational_energy + rotational_energy + vibrational_energy + RT
+    entropy = translational_entropy + rotational_entropy + vibrational_entropy
+    return (enthalpy_correction - temperatures * entropy) / hartree_to_Jmol
@@ -10,6 +10,8 @@ from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT, WD_TABLE_ALIGNMENT
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
+import numpy as np  # Version 2.2.6
+from conformer_ensemble import uncertainty_percentiles, GeometryEnsemble
 
 
 def nmr_csv_writer(analysed_data):
@@ -18,9 +20,9 @@ def nmr_csv_writer(analysed_data):
 
     # Define input data
 
-    c_nmr = analysed_data[11]
-    h_nmr = analysed_data[12]
-    results_name_and_directory = analysed_data[27]
+    c_nmr = analysed_data.c_nmr
+    h_nmr = analysed_data.h_nmr
+    results_name_and_directory = analysed_data.ensemble.results_directory
     # Write CSV file
 
     csv_name = results_name_and_directory + " Boltzmann-Averaged NMR Data.csv"
@@ -52,13 +54,12 @@ def ir_csv_writer(analysed_data, settings):
 
     # Define input data
 
-    boltz_frequencies = analysed_data[29]
-    ordered_frequencies = analysed_data[30]
-    boltz_ir_intensities = analysed_data[51]
-    
-    ordered_ir_intensities = analysed_data[52]
-    ordered_boltz_weights = analysed_data[2]
-    results_name_and_directory = analysed_data[27]
+    boltz_frequencies = analysed_data.boltzmann_averages["frequencies"].tolist()
+    ordered_frequencies = analysed_data.ensemble.reported_values("frequencies")
+    boltz_ir_intensities = analysed_data.boltzmann_averages["ir_intensities"].tolist()
+    ordered_ir_intensities = analysed_data.ensemble.reported_values("ir_intensities")
+    ordered_boltz_weights = analysed_data.ensemble.boltzmann_weights.tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
 
     # Compile data into rows for CSV file
 
@@ -152,9 +153,9 @@ def cd_bil_writer(analysed_data):
 
     # Define input data
 
-    boltz_wavelengths = analysed_data[13]
-    boltz_rotatory_strengths = analysed_data[14]
-    results_name_and_directory = analysed_data[27]
+    boltz_wavelengths = analysed_data.boltzmann_averages["wavelengths"].tolist()
+    boltz_rotatory_strengths = analysed_data.boltzmann_averages["rotatory_strengths"].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
     ecd_file_name = results_name_and_directory + " Boltzmann-Averaged ECD Data.cd.bil"
     # Write .cd.bil file
 
@@ -181,9 +182,9 @@ def uv_bil_writer(analysed_data):
 
     # Define input data
 
-    boltz_wavelengths = analysed_data[13]
-    boltz_oscillator_strengths = analysed_data[28]
-    results_name_and_directory = analysed_data[27]
+    boltz_wavelengths = analysed_data.boltzmann_averages["wavelengths"].tolist()
+    boltz_oscillator_strengths = analysed_data.boltzmann_averages["oscillator_strengths"].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
     uv_file_name = results_name_and_directory + " Boltzmann-Averaged UV Data.uv.bil"
     # Write .uv.bil file
 
@@ -208,10 +209,10 @@ def ir_bil_writer(analysed_data):
 
     # Define input data
 
-    boltz_frequencies = analysed_data[29]
-    boltz_frequency_dipole_strengths = analysed_data[40]
-    results_name_and_directory = analysed_data[27]
-    calc_software = analysed_data[55]
+    boltz_frequencies = analysed_data.boltzmann_averages["frequencies"].tolist()
+    boltz_frequency_dipole_strengths = analysed_data.boltzmann_averages["frequency_dipole_strengths"].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
+    calc_software = analysed_data.ensemble.calc_software
     ir_file_name = results_name_and_directory + " Boltzmann-Averaged IR Data.ir.bil"
     # Write .ir.bil file
 
@@ -239,9 +240,9 @@ def vc_bil_writer(analysed_data):
 
     # Define input data
 
-    boltz_frequencies = analysed_data[29]
-    boltz_frequency_rotatory_strengths = analysed_data[35]
-    results_name_and_directory = analysed_data[27]
+    boltz_frequencies = analysed_data.boltzmann_averages["frequencies"].tolist()
+    boltz_frequency_rotatory_strengths = analysed_data.boltzmann_averages["frequency_rotatory_strengths"].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
     vc_file_name = results_name_and_directory + " Boltzmann-Averaged VCD Data.vc.bil"
     # Write .vc.bil file
 
@@ -266,9 +267,9 @@ def or_bil_writer(analysed_data):
 
     # Define input data
 
-    ordered_optrot_wavelengths_list = analysed_data[36]
-    boltz_optrot_strengths = analysed_data[38]
-    results_name_and_directory = analysed_data[27]
+    ordered_optrot_wavelengths_list = analysed_data.ensemble.reported_values("optrot_wavelengths")
+    boltz_optrot_strengths = analysed_data.boltzmann_averages["optrot_strengths"].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
     or_file_name = results_name_and_directory + " Boltzmann-Averaged OR Data.or.bil"
     # Write .or.bil file
 
@@ -291,17 +292,294 @@ def or_bil_writer(analysed_data):
         )
 
 
+def sweep_temperature_file_writer(analysed_data, settings):
+    """Writes the Boltzmann-averaged data files selected in the output settings (.csv and SpecDis .bil files) for one
+    temperature of a temperature sweep (from EnsembleAnalysis.sweep_temperature_analysis)."""
+
+    boltzmann_averages = analysed_data.boltzmann_averages
+    written_files = []
+    if "shielding_tensors" in boltzmann_averages and settings["NMR csv file"] is True:
+        written_files.append(nmr_csv_writer(analysed_data))
+    if "frequencies" in boltzmann_averages and settings["Freq csv file"] is True:
+        written_files.append(ir_csv_writer(analysed_data, settings))
+    if "wavelengths" in boltzmann_averages and settings["SpecDis .cd.bil file"] is True:
+        written_files.append(cd_bil_writer(analysed_data))
+    if "wavelengths" in boltzmann_averages and settings["SpecDis .uv.bil file"] is True:
+        written_files.append(uv_bil_writer(analysed_data))
+    if "frequency_rotatory_strengths" in boltzmann_averages and settings["SpecDis .vc.bil file"] is True:
+        written_files.append(vc_bil_writer(analysed_data))
+    if "frequency_dipole_strengths" in boltzmann_averages and settings["SpecDis .ir.bil file"] is True:
+        written_files.append(ir_bil_writer(analysed_data))
+    if "optrot_strengths" in boltzmann_averages and settings["SpecDis .or.bil file"] is True:
+        written_files.append(or_bil_writer(analysed_data))
+    for written_file in written_files:
+        if written_file[0] == "Error detected":
+            return written_file
+    return "", ""
+
+
+def temperature_sweep_csv_writer(analysed_data, settings):
+    """Creates a CSV file comparing all temperatures of a temperature sweep: the Boltzmann population of each
+    conformer (in order of increasing energy) and, if calculated, Boltzmann-averaged NMR data at each temperature."""
+
+    # Define input data
+
+    sweep_temperatures = analysed_data.sweep_temperatures.tolist()
+    sweep_boltz_weights = analysed_data.sweep_boltzmann_weights.T.tolist()
+    sweep_relative_energies = analysed_data.sweep_relative_energies.T.tolist()
+    relative_energies = analysed_data.ensemble.relative_energies.tolist()
+    if len(analysed_data.ensemble.conformer_suffixes):
+        conformer_names = analysed_data.ensemble.conformer_suffixes.tolist()
+    else:
+        conformer_names = [str(conformer_number + 1) for conformer_number in analysed_data.ensemble.conformer_numbers]
+    results_name_and_directory = analysed_data.ensemble.results_directory
+    temperature_headings = [f"{temperature:g} K" for temperature in sweep_temperatures]
+
+    # Compile data into rows for CSV file
+
+    column_headings = ["Conformer", "Relative energy (" + settings["Relative energy unit"] + ")"] + temperature_headings
+    if settings["Boltz energy type"] == "Quasi-RRHO free energy":  # Relative free energies change with temperature
+        column_headings += [
+            "Relative free energy at " + heading + " (" + settings["Relative energy unit"] + ")"
+            for heading in temperature_headings
+        ]
+    data = [["Conformer Boltzmann Populations"], column_headings]
+    for conformer in range(len(conformer_names)):
+        row = [conformer_names[conformer], relative_energies[conformer]]
+        row += [str(weight * 100) + "%" for weight in sweep_boltz_weights[conformer]]
+        if settings["Boltz energy type"] == "Quasi-RRHO free energy":
+            row += sweep_relative_energies[conformer]
+        data.append(row)
+    if analysed_data.sweep_c_nmr:
+        column_headings = ["Element & Atom Number", "Element & Number in Group"]
+        column_headings += ["Shielding tensor at " + heading for heading in temperature_headings]
+        if len(analysed_data.c_nmr[0]) == 4 or len(analysed_data.h_nmr[0]) == 4:  # Detect if have chemical shifts too
+            column_headings += ["Scaled chemical shift (ppm) at " + heading for heading in temperature_headings]
+        data.append("")
+        data.append(["Boltzmann-Averaged NMR Data"])
+        data.append(column_headings)
+        for sweep_nmr_rows in (analysed_data.sweep_c_nmr, analysed_data.sweep_h_nmr):
+            for atom in range(len(sweep_nmr_rows[0])):
+                row = sweep_nmr_rows[0][atom][:2]
+                for nmr_column in range(2, len(sweep_nmr_rows[0][atom])):
+                    row += [nmr_rows[atom][nmr_column] for nmr_rows in sweep_nmr_rows]
+                data.append(row)
+            data.append("")
+    # Write CSV file
+
+    csv_name = results_name_and_directory + " Temperature Sweep.csv"
+    try:
+        with open(csv_name, "w", newline="") as file:
+            writer = csv_writer(file, quoting=QUOTE_ALL)
+            for line in data:
+                writer.writerow(line)
+        return "", ""
+    except:
+        return (
+            "Error detected",
+            "Unable to save temperature sweep .CSV file.\n Try closing this .CSV file, then drag and drop your files "
+            "again.",
+        )
+
+
+def averaged_data_sections(calc_software):
+    """Returns the Boltzmann-averaged data reported in uncertainty and sensitivity .CSV files (property name, title and
+    row label heading), with spectral data in the same order as SpecDis .bil files."""
+
+    if calc_software == "orca":
+        ir_title = "IR molar extinction coefficients (L mol**-1 cm**-1)"
+    else:
+        ir_title = "IR dipole strengths (10**-40 esu**2-cm**2)"
+    return (
+        ("wavelengths", "Excited state wavelengths (nm)", "Wavelength (nm)"),
+        ("rotatory_strengths", "ECD rotational strengths (10**-40 esu**2-cm**2)", "Wavelength (nm)"),
+        ("oscillator_strengths", "UV oscillator strengths", "Wavelength (nm)"),
+        ("frequencies", "Vibrational frequencies (cm**-1)", "Wavenumber (cm**-1)"),
+        ("frequency_rotatory_strengths", "VCD rotational strengths (10**-44 esu**2-cm**2)", "Wavenumber (cm**-1)"),
+        ("frequency_dipole_strengths", ir_title, "Wavenumber (cm**-1)"),
+        ("optrot_strengths", "Optical rotations (deg.)", "Wavelength (nm)"),
+        ("shielding_tensors", "NMR shielding tensors", "Element & Atom Number"),
+        ("chemical_shifts", "NMR scaled chemical shifts (ppm)", "Element & Atom Number"),
+    )
+
+
+def averaged_data_rows(analysed_data, property_name, row_label_heading):
+    """Returns the value numbers, row labels and Boltzmann-averaged values of one property for rows of uncertainty and
+    sensitivity .CSV files. Spectral data is in order of decreasing wavelength/increasing wavenumber (as in SpecDis .bil
+    files), and NMR data is for C and H atoms (as in the NMR .csv file)."""
+
+    boltzmann_averages = analysed_data.boltzmann_averages
+    if row_label_heading == "Element & Atom Number":
+        value_numbers = [int(row[0][1:]) - 1 for row in analysed_data.c_nmr + analysed_data.h_nmr]
+        row_labels = [analysed_data.ensemble.elements[atom] + str(atom + 1) for atom in value_numbers]
+    else:
+        if property_name == "optrot_strengths":
+            row_label_values = analysed_data.ensemble.reported_values("optrot_wavelengths")[0]
+        elif row_label_heading == "Wavelength (nm)":
+            row_label_values = boltzmann_averages["wavelengths"].tolist()
+        else:
+            row_label_values = boltzmann_averages["frequencies"].tolist()
+        value_numbers = list(range(len(row_label_values) - 1, -1, -1))
+        row_labels = [row_label_values[value_number] for value_number in value_numbers]
+    if property_name == "chemical_shifts":
+        boltzmann_averaged = [row[3] if len(row) == 4 else "" for row in analysed_data.c_nmr + analysed_data.h_nmr]
+    else:
+        boltzmann_averaged = boltzmann_averages[property_name][value_numbers].tolist()
+    return value_numbers, row_labels, boltzmann_averaged
+
+
+def energy_uncertainty_csv_writer(analysed_data, settings):
+    """Creates a CSV file with the uncertainty of Boltzmann-averaged data (SpecDis .bil data, NMR shielding tensors and
+    chemical shifts, and optical rotations) caused by errors in conformer energies: the mean, standard deviation and
+    percentiles of averages from Monte Carlo samples of energy errors."""
+
+    # Define input data
+
+    energy_uncertainty = analysed_data.energy_uncertainty
+    results_name_and_directory = analysed_data.ensemble.results_directory
+    statistics_headings = ["Boltzmann-averaged", "Mean", "Standard deviation"] + [
+        f"{percentile:g}th percentile" for percentile in uncertainty_percentiles
+    ]
+
+    # Compile data into rows for CSV file (spectral data in the same order as SpecDis .bil files)
+
+    data = [
+        ["Uncertainty of Boltzmann-Averaged Data from Conformer Energy Errors"],
+        [
+            settings["Energy uncertainty samples"]
+            + " samples of energy errors ("
+            + settings["Energy uncertainty distribution"].lower()
+            + " distribution, "
+            + settings["Energy uncertainty (kcal/mol)"]
+            + " kcal/mol)"
+        ],
+    ]
+    for property_name, title, row_label_heading in averaged_data_sections(analysed_data.ensemble.calc_software):
+        if property_name not in energy_uncertainty:
+            continue
+        statistics = energy_uncertainty[property_name]
+        value_numbers, row_labels, boltzmann_averaged = averaged_data_rows(
+            analysed_data, property_name, row_label_heading
+        )
+        data.append("")
+        data.append([title])
+        data.append([row_label_heading] + statistics_headings)
+        for row_number, value_number in enumerate(value_numbers):
+            if np.isnan(statistics["mean"][value_number]):  # No chemical shift scaling factors for this element
+                continue
+            data.append(
+                [row_labels[row_number], boltzmann_averaged[row_number]]
+                + [
+                    statistics["mean"][value_number].item(),
+                    statistics["standard deviation"][value_number].item(),
+                ]
+                + statistics["percentiles"][:, value_number].tolist()
+            )
+    # Write CSV file
+
+    csv_name = results_name_and_directory + " Energy Uncertainty.csv"
+    try:
+        with open(csv_name, "w", newline="") as file:
+            writer = csv_writer(file, quoting=QUOTE_ALL)
+            for line in data:
+                writer.writerow(line)
+        return "", ""
+    except:
+        return (
+            "Error detected",
+            "Unable to save energy uncertainty .CSV file.\n Try closing this .CSV file, then drag and drop your files "
+            "again.",
+        )
+
+
+def energy_sensitivity_writer(analysed_data, settings):
+    """Creates a CSV file and a NumPy .npz file with the sensitivity of Boltzmann-averaged data to each conformer's
+    relative energy (derivatives of each averaged value with respect to each relative energy), and each conformer's
+    contribution share of each averaged value. The conformers which most affect each averaged value can then be found
+    without rerunning the analysis with altered energies."""
+
+    # Define input data
+
+    energy_sensitivity = analysed_data.energy_sensitivity
+    results_name_and_directory = analysed_data.ensemble.results_directory
+    energy_unit = settings["Relative energy unit"]
+    if len(analysed_data.ensemble.conformer_suffixes):
+        conformer_names = analysed_data.ensemble.conformer_suffixes.tolist()
+    else:
+        conformer_names = [str(conformer_number + 1) for conformer_number in analysed_data.ensemble.conformer_numbers]
+
+    # Compile data into rows for CSV file (conformers in order of increasing energy)
+
+    data = [
+        ["Sensitivity of Boltzmann-Averaged Data to Conformer Energies"],
+        ["Conformer"] + conformer_names,
+        ["Relative energy (" + energy_unit + ")"] + analysed_data.ensemble.relative_energies.tolist(),
+        ["Boltzmann population (%)"] + (analysed_data.ensemble.boltzmann_weights * 100).tolist(),
+    ]
+    tables = (
+        ("jacobian", "change per " + energy_unit + " increase in conformer energy", "Most sensitive to"),
+        ("contribution shares", "conformer contribution shares", "Largest contributor"),
+    )
+    for property_name, title, row_label_heading in averaged_data_sections(analysed_data.ensemble.calc_software):
+        if property_name not in energy_sensitivity:
+            continue
+        value_numbers, row_labels, boltzmann_averaged = averaged_data_rows(
+            analysed_data, property_name, row_label_heading
+        )
+        for table_name, table_title, largest_heading in tables:
+            values = energy_sensitivity[property_name][table_name]
+            data.append("")
+            data.append([title + ", " + table_title])
+            data.append([row_label_heading, "Boltzmann-averaged", largest_heading] + conformer_names)
+            for row_number, value_number in enumerate(value_numbers):
+                conformer_values = values[:, value_number]
+                if np.isnan(conformer_values).all():  # No chemical shift scaling factors for this element
+                    continue
+                data.append(
+                    [
+                        row_labels[row_number],
+                        boltzmann_averaged[row_number],
+                        conformer_names[np.argmax(np.abs(conformer_values))],
+                    ]
+                    + conformer_values.tolist()
+                )
+
+    # Write CSV file and .npz file (all arrays, with values in the same order as the averaged data arrays)
+
+    arrays = {
+        "conformer_names": np.array(conformer_names),
+        "relative_energies": analysed_data.ensemble.relative_energies,
+        "boltzmann_weights": analysed_data.ensemble.boltzmann_weights,
+    }
+    for property_name, sensitivity in energy_sensitivity.items():
+        for table_name, values in sensitivity.items():
+            arrays[property_name + "_" + table_name.replace(" ", "_")] = values
+    try:
+        with open(results_name_and_directory + " Energy Sensitivity.csv", "w", newline="") as file:
+            writer = csv_writer(file, quoting=QUOTE_ALL)
+            for line in data:
+                writer.writerow(line)
+        np.savez(results_name_and_directory + " Energy Sensitivity.npz", **arrays)
+        return "", ""
+    except:
+        return (
+            "Error detected",
+            "Unable to save energy sensitivity files.\n Try closing this .CSV file, then drag and drop your files "
+            "again.",
+        )
+
+
 def xyz_writer(analysed_data):
     """Writes an XYZ file containing conformer geometries and energies, arranged in order of increasing energy."""
 
     # Define input data
 
-    energies = analysed_data[0]
-    element_list = analysed_data[3]
-    x_cartesian_coords_list = analysed_data[4]
-    y_cartesian_coords_list = analysed_data[5]
-    z_cartesian_coords_list = analysed_data[6]
-    results_name_and_directory = analysed_data[27]
+    energies = analysed_data.ensemble.energies.tolist()
+    element_list = analysed_data.ensemble.element_lists()
+    x_cartesian_coords_list = analysed_data.ensemble.coordinates[:, :, 0].tolist()
+    y_cartesian_coords_list = analysed_data.ensemble.coordinates[:, :, 1].tolist()
+    z_cartesian_coords_list = analysed_data.ensemble.coordinates[:, :, 2].tolist()
+    results_name_and_directory = analysed_data.ensemble.results_directory
     xyz_file_name = results_name_and_directory + " Geometries and Energies.xyz"
     # Write .xyz file
 
@@ -331,28 +609,38 @@ def xyz_writer(analysed_data):
 
 
 def dup_conf_txt_writer(analysed_data, settings):
-    """Creates a .txt file containing the energy differences and MADs of redundant conformers."""
+    """Creates a .txt file containing the energy differences and MADs of redundant conformers, and how many MAD
+    calculations were skipped by quick geometry checks (also written if no redundant conformers were found)."""
 
     # Define input data
 
-    if len(analysed_data) == 6:  # This means data is from xyz/sdf files
-        duplicate_conf_details = analysed_data[4]
-        results_name_and_directory = analysed_data[3]
+    if isinstance(analysed_data, GeometryEnsemble):  # This means data is from xyz/sdf files
+        duplicate_clusters = analysed_data.duplicate_clusters
+        results_name_and_directory = analysed_data.results_directory
+        mad_pair_statistics = analysed_data.mad_pair_statistics
+        conformer_text = " conformer"
+        duplicated_conformer_text = ""
         numbering_message = ""
         thresholds_message = (
             "Redundant conformer detection threshold:\nMAD = " + str(settings["MAD cutoff (A)"]) + " angstroms\n\n "
         )
     else:  # This means data is from .out/.log files
-        if not analysed_data[50]:  # This means conformer suffixes are not present
+        if not len(analysed_data.ensemble.conformer_suffixes):  # This means conformer suffixes are not present
+            conformer_text = " conformer"
+            duplicated_conformer_text = " conformer"
             numbering_message = "Conformers are numbered by their order of appearance in the selected files"
-            if analysed_data[53] > 0:  # This means conformers with imaginary frequencies were removed
-                numbering_message += ". Conformers with imaginary frequencies are excluded.\n"
-            else:
-                numbering_message += ".\n"
-        else:
+            if analysed_data.imaginary_frequency_removals > 0:  # This means conformers with imaginary frequencies were removed
+                numbering_message += ". Conformers with imaginary frequencies are excluded"
+            if analysed_data.geometry_issue_removals > 0:  # This means conformers with implausible geometries were removed
+                numbering_message += ". Conformers with implausible geometries are excluded"
+            numbering_message += ".\n"
+        else:  # Conformer suffixes are used as conformer names
+            conformer_text = ""
+            duplicated_conformer_text = ""
             numbering_message = ""
-        duplicate_conf_details = analysed_data[44]
-        results_name_and_directory = analysed_data[27]
+        duplicate_clusters = analysed_data.duplicate_clusters
+        results_name_and_directory = analysed_data.ensemble.results_directory
+        mad_pair_statistics = analysed_data.mad_pair_statistics
         thresholds_message = (
             "Redundant conformer detection thresholds:\nEnergy difference = "
             + str(settings["Energy cutoff (kcal/mol)"])
@@ -360,10 +648,80 @@ def dup_conf_txt_writer(analysed_data, settings):
             + str(settings["MAD cutoff (A)"])
             + " angstroms.\n\n"
         )
+    if settings["MAD atoms"] == "Heavy atoms":
+        thresholds_message += "MADs were calculated over heavy atoms only.\n\n"
+    elif settings["MAD atoms"] == "Element subset":
+        thresholds_message += "MADs were calculated over these elements only: " + settings["MAD elements"] + ".\n\n"
+    if settings["Redundant conformer comparison"] == "Torsion fingerprint":
+        thresholds_message += (
+            "Conformers were compared by rotatable torsions first (torsion cutoff = "
+            + str(settings["Torsion cutoff (degrees)"])
+            + " degrees)"
+        )
+        if settings["Confirm torsion duplicates with MAD"] is True:
+            thresholds_message += ", then confirmed by MAD"
+        thresholds_message += ", unless no rotatable bonds were found.\n\n"
+    if settings["MAD atom mapping"] == "By bonding symmetry":
+        thresholds_message += (
+            "Atoms were only mapped onto symmetry-equivalent atoms (from bonding) for MAD calculations, unless bonds "
+            "could not be determined.\n\n"
+        )
+    if any(stage.endswith("clustering") for stage in duplicate_clusters["stages"].values()):
+        thresholds_message += (
+            "Only "
+            + str(settings["Representative conformers"])
+            + " representative conformers (cluster medoids, from the pairwise MAD matrix) were kept.\n\n"
+        )
+    if mad_pair_statistics and mad_pair_statistics[1] > 0:
+        thresholds_message += (
+            "MAD calculations were skipped for "
+            + str(mad_pair_statistics[1])
+            + " of "
+            + str(mad_pair_statistics[0])
+            + " conformer pairs (shown to be above the MAD threshold by quick geometry checks).\n\n"
+        )
+
+    # Describe each duplicate conformer and the conformer it duplicates, by their original conformer numbers
+
+    labels = duplicate_clusters["labels"]
+    if settings["Boltz energy type"] in ("Gibbs free energy", "Quasi-RRHO free energy"):
+        energy_text = ":\nΔG = "
+    else:
+        energy_text = ":\nΔE = "
     dup_conf_text = ""
-    for text in duplicate_conf_details:
-        dup_conf_text += text + "\n"
-    if len(duplicate_conf_details) > 1:
+    for dup_conf_number, representative_conf_number in duplicate_clusters["representatives"].items():
+        relationship_text = " is a duplicate of "
+        if duplicate_clusters["stages"][dup_conf_number].endswith("clustering"):  # Not redundant, only represented
+            relationship_text = " is represented by "
+        dup_conf_text += (
+            str(labels[dup_conf_number])
+            + conformer_text
+            + relationship_text
+            + str(labels[representative_conf_number])
+            + duplicated_conformer_text
+        )
+        if dup_conf_number in duplicate_clusters["energy differences"]:
+            dup_conf_text += (
+                energy_text + str(duplicate_clusters["energy differences"][dup_conf_number]) + " kcal/mol\nMAD = "
+            )
+        else:
+            dup_conf_text += ":\nMAD = "
+        unit_text = " angstroms"
+        if duplicate_clusters["stages"][dup_conf_number] == "geometry hash":  # Atom deviations without atom remapping
+            dup_conf_text = dup_conf_text.removesuffix("MAD = ") + "MAD ≤ "
+        elif duplicate_clusters["stages"][dup_conf_number] == "torsion fingerprint":  # No MAD calculated
+            dup_conf_text = dup_conf_text.removesuffix("MAD = ") + "Maximum torsion difference = "
+            unit_text = " degrees"
+        dup_conf_text += (
+            str(duplicate_clusters["MADs"][dup_conf_number])
+            + unit_text
+            + "\nFound by: "
+            + duplicate_clusters["stages"][dup_conf_number]
+            + "\n\n"
+        )
+    if not dup_conf_text:  # Only written for the MAD calculations skipped
+        dup_conf_text = "No redundant conformers were found.\n"
+    if len(duplicate_clusters["representatives"]) > 1:
         dup_conf_txt_file_name = results_name_and_directory + " Redundant Conformers.txt"
     else:
         dup_conf_txt_file_name = results_name_and_directory + " Redundant Conformer.txt"
@@ -384,18 +742,33 @@ def dup_conf_txt_writer(analysed_data, settings):
         )
 
 
+def mad_pair_pruning_text(mad_pair_statistics):
+    """Returns a status message giving how many conformer pairs skipped MAD calculations because quick geometry checks
+    showed they are above the MAD threshold, or an empty string if none were skipped."""
+
+    if not mad_pair_statistics or mad_pair_statistics[1] == 0:
+        return ""
+    return (
+        "Skipped MAD calculations for "
+        + str(mad_pair_statistics[1])
+        + " of "
+        + str(mad_pair_statistics[0])
+        + " conformer pairs."
+    )
+
+
 def input_file_writer(data, settings, filename):
     """Writes quantum chemistry calculation input files (e.g. for Gaussian or ORCA)."""
 
     # Define input data
 
     removals = 0
-    if len(data) == 6:  # This means data is from xyz/sdf files
-        element_list = data[0][0]
-        x_cartesian_coords_list = data[0][1]
-        y_cartesian_coords_list = data[0][2]
-        z_cartesian_coords_list = data[0][3]
-        results_name_and_directory = data[3]
+    if isinstance(data, GeometryEnsemble):  # This means data is from xyz/sdf files
+        element_list = data.elements
+        x_cartesian_coords_list = data.x_coords
+        y_cartesian_coords_list = data.y_coords
+        z_cartesian_coords_list = data.z_coords
+        results_name_and_directory = data.results_directory
         directory = sub(r"/.[^/]*$", r"/", results_name_and_directory)
         results_name_and_directory = directory + filename
         conformer_numbers_list = []
@@ -408,23 +781,20 @@ def input_file_writer(data, settings, filename):
             return parser_error_check, error_message
         rel_energy_threshold = float(settings["Geometry reopt relative energy threshold"])
         rel_energy_threshold_unit = settings["Geometry reopt relative energy unit"]
-        relative_energies = data[45]
-        element_list = data[46]
-        x_cartesian_coords_list = data[47]
-        y_cartesian_coords_list = data[48]
-        z_cartesian_coords_list = data[49]
-        if data[54]:
-            pre_conformer_suffixes_list = data[54]
+        conformers = data.conformers_in_order_of_appearance()
+        if len(conformers.chk_conformer_suffixes):
+            pre_conformer_suffixes_list = conformers.chk_conformer_suffixes.tolist()
         else:
-            pre_conformer_suffixes_list = data[50]
+            pre_conformer_suffixes_list = conformers.conformer_suffixes.tolist()
         conformer_numbers_list = []
         for i in range(0, len(pre_conformer_suffixes_list)):
             conformer_suffix = pre_conformer_suffixes_list[i].removesuffix(".log").removesuffix(".out")
             conformer_numbers_list.append(findall(r"\d+", conformer_suffix)[0])
         if not conformer_numbers_list:
-            for i in range(1, (len(element_list) + 1)):
+            for i in range(1, (len(conformers) + 1)):
                 conformer_numbers_list.append(i)
-        results_name_and_directory = data[27]
+        conformer_numbers_list = np.array(conformer_numbers_list, dtype=object)
+        results_name_and_directory = conformers.results_directory
         directory = sub(r"/.[^/]*$", r"/", results_name_and_directory)
         results_name_and_directory = directory + filename
         # Remove conformers above relative energy threshold
@@ -432,6 +802,7 @@ def input_file_writer(data, settings, filename):
         if (
             settings["Geometry reopt"] is True
             and settings["Skip excluding duplicate conformers from input files made from output files"] is False
+            and len(conformers.relative_energies)
         ):
             if str(rel_energy_threshold).endswith(".0"):
                 rel_energy_threshold = int(rel_energy_threshold)
@@ -443,18 +814,15 @@ def input_file_writer(data, settings, filename):
                 rel_energy_threshold = rel_energy_threshold / 4.184
             elif rel_energy_threshold_unit == "kcalmol-1" and settings["Relative energy unit"] == "kJ/mol":
                 rel_energy_threshold = rel_energy_threshold * 4.184
-            for conf_number, energy in enumerate(relative_energies):
-                conf_number = conf_number - removals
-                if energy > rel_energy_threshold:
-                    # Delete conformer data
-
-                    del element_list[conf_number]
-                    del x_cartesian_coords_list[conf_number]
-                    del y_cartesian_coords_list[conf_number]
-                    del z_cartesian_coords_list[conf_number]
-                    del conformer_numbers_list[conf_number]
-                    removals += 1  # This is because indices of remaining conformers are now reduced by 1,
-                    # by removing the last conformer
+            kept_confs = conformers.relative_energies <= rel_energy_threshold
+            removals = int((~kept_confs).sum())
+            conformers = conformers.subset(kept_confs)
+            conformer_numbers_list = conformer_numbers_list[kept_confs]
+        element_list = conformers.element_lists()
+        x_cartesian_coords_list = conformers.coordinates[:, :, 0].tolist()
+        y_cartesian_coords_list = conformers.coordinates[:, :, 1].tolist()
+        z_cartesian_coords_list = conformers.coordinates[:, :, 2].tolist()
+        conformer_numbers_list = conformer_numbers_list.tolist()
     input_files = []
     if settings["Input File Conformers Together"] is True:
         input_files.append(results_name_and_directory + ".inp")
@@ -523,33 +891,45 @@ def docx_writer(analysed_data, settings):
         return "", ""
     # Define input data
 
-    ordered_energies = analysed_data[0]
-    ordered_relative_energies = analysed_data[1]
-    ordered_boltz_weights = analysed_data[2]
-    ordered_element_list = analysed_data[3]
-    ordered_x_cartesian_coords_list = analysed_data[4]
-    ordered_y_cartesian_coords_list = analysed_data[5]
-    ordered_z_cartesian_coords_list = analysed_data[6]
-    ordered_wavelength_list = analysed_data[7]
-    ordered_rotatory_strength_list = analysed_data[8]
-    ordered_shielding_tensors = analysed_data[9]
-    sp_functional_and_basis_set = analysed_data[15]
-    sp_solvent = analysed_data[16]
-    opt_freq_functional_and_basis_set = analysed_data[18]
-    opt_freq_solvent = analysed_data[19]
-    nmr_functional_and_basis_set = analysed_data[21]
-    nmr_solvent = analysed_data[22]
-    tddft_functional_and_basis_set = analysed_data[24]
-    tddft_solvent = analysed_data[25]
-    results_name_and_directory = analysed_data[27]
-    ordered_frequencies = analysed_data[30]
-    ordered_oscillator_strengths = analysed_data[31]
-    ordered_frequency_rotatory_strengths_list = analysed_data[34]
-    ordered_optrot_wavelengths_list = analysed_data[36]
-    ordered_optrot_list = analysed_data[37]
-    ordered_frequency_dipole_strengths_list = analysed_data[39]
-    or_functional_and_basis_set = analysed_data[41]
-    or_solvent = analysed_data[42]
+    ensemble = analysed_data.ensemble
+    ordered_energies = ensemble.energies.tolist()
+    ordered_relative_energies = [
+        0 if relative_energy == 0 else relative_energy for relative_energy in ensemble.relative_energies.tolist()
+    ]  # The lowest-energy conformer is shown with a relative energy of 0
+    ordered_boltz_weights = ensemble.boltzmann_weights.tolist()
+    ordered_element_list = ensemble.element_lists()
+    ordered_x_cartesian_coords_list = ensemble.coordinates[:, :, 0].tolist()
+    ordered_y_cartesian_coords_list = ensemble.coordinates[:, :, 1].tolist()
+    ordered_z_cartesian_coords_list = ensemble.coordinates[:, :, 2].tolist()
+    ordered_wavelength_list = []
+    ordered_rotatory_strength_list = []
+    ordered_oscillator_strengths = []
+    if ensemble.has_property("wavelengths"):
+        ordered_wavelength_list = ensemble.reported_values("wavelengths")
+        ordered_rotatory_strength_list = ensemble.reported_values("rotatory_strengths")
+        ordered_oscillator_strengths = ensemble.reported_values("oscillator_strengths")
+    ordered_shielding_tensors = []
+    if ensemble.has_property("shielding_tensors"):
+        ordered_shielding_tensors = ensemble.reported_values("shielding_tensors")
+    ordered_frequencies = ensemble.reported_values("frequencies")
+    ordered_frequency_rotatory_strengths_list = []
+    ordered_frequency_dipole_strengths_list = []
+    if ensemble.has_property("frequency_rotatory_strengths"):
+        ordered_frequency_rotatory_strengths_list = ensemble.reported_values("frequency_rotatory_strengths")
+        ordered_frequency_dipole_strengths_list = ensemble.reported_values("frequency_dipole_strengths")
+    ordered_optrot_wavelengths_list = []
+    ordered_optrot_list = []
+    if ensemble.has_property("optrot_wavelengths"):
+        ordered_optrot_wavelengths_list = [
+            [str(wavelength) for wavelength in conformer] for conformer in ensemble.reported_values("optrot_wavelengths")
+        ]
+        ordered_optrot_list = ensemble.reported_values("optrot_strengths")
+    sp_functional_and_basis_set, sp_solvent = ensemble.theory_levels["sp"][:2]
+    opt_freq_functional_and_basis_set, opt_freq_solvent = ensemble.theory_levels["opt freq"][:2]
+    nmr_functional_and_basis_set, nmr_solvent = ensemble.theory_levels["nmr"][:2]
+    tddft_functional_and_basis_set, tddft_solvent = ensemble.theory_levels["tddft"][:2]
+    or_functional_and_basis_set, or_solvent = ensemble.theory_levels["or"][:2]
+    results_name_and_directory = ensemble.results_directory
     doc_text = ""
 
     # Define new lists
@@ -876,6 +1256,10 @@ def docx_writer(analysed_data, settings):
             paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
             if settings["Boltz energy type"] == "Gibbs free energy":
                 run = paragraph.add_run("Gibbs free energy (hartrees)")
+            elif settings["Boltz energy type"] == "Quasi-RRHO free energy":
+                run = paragraph.add_run(
+                    "Quasi-RRHO Gibbs free energy at " + settings["Temperature (K)"] + " K (hartrees)"
+                )
             elif settings["Boltz energy type"] == "Electronic energy":
                 run = paragraph.add_run("Electronic energy (hartrees)")
             run.font.size = Pt(8)
@@ -900,9 +1284,9 @@ def docx_writer(analysed_data, settings):
             row = table.add_row().cells
             paragraph = row[0].paragraphs[0]
             paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-            if settings["Relative energy unit"] == "kcal/mol" and settings["Boltz energy type"] == "Gibbs free energy":
+            if settings["Relative energy unit"] == "kcal/mol" and settings["Boltz energy type"] != "Electronic energy":
                 run = paragraph.add_run("ΔG (kcal/mol)")
-            elif settings["Relative energy unit"] == "kJ/mol" and settings["Boltz energy type"] == "Gibbs free energy":
+            elif settings["Relative energy unit"] == "kJ/mol" and settings["Boltz energy type"] != "Electronic energy":
                 run = paragraph.add_run("ΔG (kJ/mol)")
             elif (
                 settings["Relative energy unit"] == "kcal/mol" and settings["Boltz energy type"] == "Electronic energy"
@@ -1535,7 +1919,7 @@ def docx_writer(analysed_data, settings):
         doc_text += "+NMR"
     # Create table for VCD data, if present
 
-    calc_software = analysed_data[55]
+    calc_software = ensemble.calc_software
     if ordered_frequency_rotatory_strengths_list:
         if settings["Energies and coordinates table"] is False:
             doc = Document()